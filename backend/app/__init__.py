@@ -0,0 +1,4 @@
+import time
+
+# Reference point for measuring how long importing the application takes
+IMPORT_STARTED = time.perf_counter()
@@ -0,0 +1,191 @@
+"""Rolling-origin backtests of forecast models on historical data.
+
+The feature matrix of a model is built once over the whole backtest range
+(and cached by `build_features`). The samples after an initial training
+period are split into consecutive test folds. Each fold is forecast by a
+model fitted only on samples whose labels end before the fold starts,
+either on all earlier samples or on a sliding window of `train` samples.
+
+All folds are fitted together: the Gram matrices of the training windows
+are differences of cumulative sums over the design matrix, and the ridge
+systems of all folds are solved in one batched call. Building the segment
+sums and scoring the folds runs on a thread pool, as NumPy releases the GIL
+in its matrix kernels.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .features import FeatureMatrix, build_features
+from .regression import RIDGE, add_intercept, check_model_type, solve
+from .series import format_timestamps
+
+BACKTEST_WORKERS: int = int(os.getenv("BACKTEST_WORKERS", str(os.cpu_count() or 1)))
+
+# Absolute targets below this are left out of the MAPE
+_MAPE_EPSILON = 1e-9
+
+
+def _sums(
+    prediction: np.ndarray,
+    actual: np.ndarray,
+    baseline: np.ndarray,
+    n_target: int,
+    lead: int,
+) -> Dict[str, np.ndarray]:
+    error = prediction - actual
+    relevant = np.abs(actual) > _MAPE_EPSILON
+    # Columns are ordered target-major, lead-minor
+    horizon = np.abs(error).reshape(len(error), n_target, lead).sum(axis=(0, 1))
+    return {
+        "count": np.float64(error.size),
+        "abs": np.abs(error).sum(),
+        "squared": (error * error).sum(),
+        "error": error.sum(),
+        "baseline_abs": np.abs(baseline - actual).sum(),
+        "ape": (np.abs(error[relevant]) / np.abs(actual[relevant])).sum(),
+        "ape_count": np.float64(relevant.sum()),
+        "horizon_abs": horizon,
+        "horizon_count": np.float64(error.size / lead),
+    }
+
+
+def _metrics(sums: Dict[str, np.ndarray]) -> Dict[str, Optional[float]]:
+    def ratio(numerator, denominator):
+        return float(numerator / denominator) if denominator else None
+
+    mae = ratio(sums["abs"], sums["count"])
+    baseline = ratio(sums["baseline_abs"], sums["count"])
+    mse = ratio(sums["squared"], sums["count"])
+    return {
+        "mae": mae,
+        "rmse": None if mse is None else mse**0.5,
+        "mape": ratio(sums["ape"], sums["ape_count"]),
+        "bias": ratio(sums["error"], sums["count"]),
+        "persistence_mae": baseline,
+        # Improvement over repeating the last observed value
+        "skill": None if not baseline or mae is None else 1 - mae / baseline,
+    }
+
+
+def backtest(
+    features: FeatureMatrix,
+    folds: int = 10,
+    train: int = 0,
+    ridge: float = RIDGE,
+    workers: Optional[int] = None,
+) -> Dict:
+    """Evaluate a linear forecaster over `folds` rolling origins.
+
+    `train` is the length of the sliding training window in samples; with 0
+    every fold trains on all earlier samples, starting with the first half.
+    """
+    X, y = features.design_matrix(dropna=False)
+    n, lead = len(X), features.lead
+    valid = ~(np.isnan(X).any(axis=1) | np.isnan(y).any(axis=1))
+    # Incomplete samples take part in no sum
+    X = add_intercept(np.where(valid[:, None], X, 0.0)) * valid[:, None]
+    y = np.where(valid[:, None], y, 0.0)
+
+    # The first fold gets a full training window
+    initial = train + lead - 1 if train > 0 else n // 2
+    if folds <= 0 or n - initial < folds or initial < lead:
+        raise ValueError(f"Not enough samples ({n}) for {folds} folds")
+    size = (n - initial) // folds
+    starts = initial + size * np.arange(folds)
+    ends = np.append(starts[1:], n)
+    # A training sample's labels must end before its fold's first origin
+    train_ends = starts - (lead - 1)
+    train_starts = (
+        np.maximum(train_ends - train, 0) if train > 0 else np.zeros_like(starts)
+    )
+
+    boundaries = np.unique(np.concatenate([[0], train_starts, train_ends]))
+
+    def segment(bounds):
+        rows = slice(*bounds)
+        return X[rows].T @ X[rows], X[rows].T @ y[rows]
+
+    with ThreadPoolExecutor(max_workers=workers or BACKTEST_WORKERS) as pool:
+        # Gram matrices of all samples before each boundary
+        segments = list(pool.map(segment, zip(boundaries[:-1], boundaries[1:])))
+        p, q = X.shape[1], y.shape[1]
+        xtx = np.zeros((len(boundaries), p, p))
+        xty = np.zeros((len(boundaries), p, q))
+        xtx[1:] = np.cumsum([s[0] for s in segments], axis=0)
+        xty[1:] = np.cumsum([s[1] for s in segments], axis=0)
+        first = np.searchsorted(boundaries, train_starts)
+        last = np.searchsorted(boundaries, train_ends)
+        coefs = solve(xtx[last] - xtx[first], xty[last] - xty[first], ridge)
+
+        n_target = features.n_target
+        last_observed = features.history[:, :n_target, -1]
+
+        def score(k: int) -> Dict[str, np.ndarray]:
+            rows = np.arange(starts[k], ends[k])
+            rows = rows[valid[rows]]
+            baseline = np.repeat(last_observed[rows], lead, axis=1)
+            return _sums(X[rows] @ coefs[k], y[rows], baseline, n_target, lead)
+
+        fold_sums = list(pool.map(score, range(folds)))
+
+    origins = features.origins
+    train_samples = np.concatenate([[0], np.cumsum(valid)])
+    results: List[Dict] = []
+    for k, sums in enumerate(fold_sums):
+        results.append(
+            {
+                "start": format_timestamps(origins[starts[k] : starts[k] + 1])[0],
+                "end": format_timestamps(origins[ends[k] - 1 : ends[k]])[0],
+                "train_samples": int(
+                    train_samples[train_ends[k]] - train_samples[train_starts[k]]
+                ),
+                "test_samples": int(valid[starts[k] : ends[k]].sum()),
+                **_metrics(sums),
+            }
+        )
+
+    total = {key: sum(s[key] for s in fold_sums) for key in fold_sums[0]}
+    with np.errstate(invalid="ignore", divide="ignore"):
+        horizon = total["horizon_abs"] / total["horizon_count"]
+    return {
+        "samples": n,
+        "features": p - 1,
+        "folds": results,
+        "overall": _metrics(total),
+        "horizon_mae": [None if np.isnan(v) else float(v) for v in horizon],
+    }
+
+
+def run_backtest(
+    model: Dict,
+    start: str,
+    end: str,
+    folds: int = 10,
+    train: int = 0,
+    client=None,
+) -> Dict:
+    """Backtest a forecast model, as listed by /connect/models, over [start, end]."""
+    check_model_type(model["model_type"])
+    features = build_features(
+        model["id"],
+        model["target"],
+        model["past"],
+        model["future"],
+        int(model["interval"]),
+        int(model["lag"]),
+        int(model["lead"]),
+        start,
+        end,
+        client,
+    )
+    return {
+        "model_id": model["id"],
+        "model_type": model["model_type"],
+        "lag": features.lag,
+        "lead": features.lead,
+        **backtest(features, folds, train),
+    }
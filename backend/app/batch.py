@@ -0,0 +1,145 @@
+"""Execution of several read operations in one request.
+
+A batch is a list of sub-requests, each naming the path of a GET endpoint
+and its query parameters. Sub-requests run concurrently in a thread pool,
+calling the endpoint functions directly, so they share the ADH client, the
+caches and the upstream limiter of the process. A failing sub-request only
+fails its own entry in the response.
+"""
+
+import contextvars
+import inspect
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from fastapi import HTTPException, Response
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter, ValidationError
+from pydantic.fields import FieldInfo
+from pydantic_core import PydanticUndefined
+
+from .upstream import UpstreamUnavailable
+
+# Sub-requests executed at the same time within one batch
+BATCH_CONCURRENCY: int = int(os.getenv("BATCH_CONCURRENCY", "8"))
+BATCH_MAX_REQUESTS: int = int(os.getenv("BATCH_MAX_REQUESTS", "50"))
+
+_adapters: Dict[Any, TypeAdapter] = {}
+
+
+def _adapter(annotation) -> TypeAdapter:
+    if annotation not in _adapters:
+        _adapters[annotation] = TypeAdapter(annotation)
+    return _adapters[annotation]
+
+
+def bind_params(endpoint: Callable, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Validate query parameters against the signature of `endpoint`.
+
+    Raises ValueError for unknown, missing or invalid parameters.
+    """
+    signature = inspect.signature(endpoint)
+    unknown = set(params) - set(signature.parameters)
+    if unknown:
+        raise ValueError(f"Unknown parameters: {', '.join(sorted(unknown))}")
+
+    kwargs = {}
+    for name, parameter in signature.parameters.items():
+        default = parameter.default
+        if isinstance(default, FieldInfo):
+            default = default.default
+        if name not in params:
+            if default in (inspect.Parameter.empty, PydanticUndefined, Ellipsis):
+                raise ValueError(f"Missing parameter: {name}")
+            kwargs[name] = default
+            continue
+        annotation = parameter.annotation
+        if annotation is inspect.Parameter.empty:
+            annotation = Any
+        try:
+            kwargs[name] = _adapter(annotation).validate_python(
+                params[name], strict=False
+            )
+        except ValidationError as e:
+            raise ValueError(f"Invalid parameter {name}: {e.errors()[0]['msg']}")
+    return kwargs
+
+
+def run_one(operations: Dict[str, Callable], path: str, params: Dict) -> Dict:
+    """Run one sub-request and return its status code and body."""
+    endpoint = operations.get(path)
+    if endpoint is None:
+        return {"status": 404, "body": {"detail": f"Unknown operation: {path}"}}
+    try:
+        result = endpoint(**bind_params(endpoint, params))
+    except ValueError as e:
+        return {"status": 422, "body": {"detail": str(e)}}
+    except HTTPException as e:
+        return {"status": e.status_code, "body": {"detail": e.detail}}
+    except UpstreamUnavailable as e:
+        return {"status": 503, "body": {"detail": str(e)}}
+    except Exception as e:
+        return {"status": 500, "body": {"detail": str(e)}}
+    if isinstance(result, Response):
+        body = json.loads(result.body) if result.body else None
+        return {"status": result.status_code, "body": body}
+    return {"status": 200, "body": result}
+
+
+def run_batch(
+    operations: Dict[str, Callable],
+    requests: List[Dict],
+    concurrency: Optional[int] = None,
+) -> List[Dict]:
+    """Run sub-requests concurrently and return their results in order.
+
+    Every request is a dict with "path", optional "params" and an optional
+    "id" that is echoed in its result.
+    """
+    if len(requests) > BATCH_MAX_REQUESTS:
+        raise ValueError(f"A batch holds at most {BATCH_MAX_REQUESTS} requests")
+    if not requests:
+        return []
+
+    workers = min(concurrency or BATCH_CONCURRENCY, len(requests))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch") as pool:
+        futures = [
+            pool.submit(
+                contextvars.copy_context().run,
+                run_one,
+                operations,
+                request["path"],
+                request.get("params") or {},
+            )
+            for request in requests
+        ]
+        results = [future.result() for future in futures]
+
+    return [
+        {"id": request.get("id"), "path": request["path"], **result}
+        for request, result in zip(requests, results)
+    ]
+
+
+def get_operations(routes) -> Dict[str, Callable]:
+    """Return the synchronous GET endpoints under /connect/ by path.
+
+    Streamed downloads cannot be embedded in a batch response.
+    """
+    return {
+        route.path: route.endpoint
+        for route in routes
+        if "GET" in getattr(route, "methods", ())
+        and route.path.startswith("/connect/")
+        and not inspect.iscoroutinefunction(route.endpoint)
+        and not _is_streamed(route)
+    }
+
+
+def _is_streamed(route) -> bool:
+    response_class = getattr(route, "response_class", None)
+    return isinstance(response_class, type) and issubclass(
+        response_class, StreamingResponse
+    )
@@ -0,0 +1,63 @@
+"""Short-lived cache of namespace catalog listings.
+
+When a shared catalog snapshot is configured, listings are read from it
+first and only loaded from ADH if the snapshot has no usable copy.
+"""
+
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Tuple
+
+from .snapshot import get_snapshot_reader
+
+# Seconds a catalog listing is served before it is fetched again
+CATALOG_TTL: float = float(os.getenv("CATALOG_TTL", "30"))
+
+_entries: Dict[str, Tuple[float, Any]] = {}
+_locks: Dict[str, threading.Lock] = {}
+_locks_guard = threading.Lock()
+# Wall-clock time of the last local write that affected each listing
+_invalidated: Dict[str, float] = {}
+
+
+def _lock(kind: str) -> threading.Lock:
+    with _locks_guard:
+        return _locks.setdefault(kind, threading.Lock())
+
+
+def get_catalog(kind: str, loader: Callable[[], Any], ttl: float = None) -> Any:
+    """Return the cached `kind` listing, calling `loader` when it is stale.
+
+    Concurrent callers of a stale listing wait for a single load instead of
+    each querying ADH.
+    """
+    snapshot = get_snapshot_reader()
+    if snapshot is not None:
+        value = snapshot.get(kind, newer_than=_invalidated.get(kind, 0.0))
+        if value is not None:
+            return value
+
+    ttl = CATALOG_TTL if ttl is None else ttl
+    entry = _entries.get(kind)
+    if entry is not None and time.monotonic() - entry[0] < ttl:
+        return entry[1]
+
+    with _lock(kind):
+        entry = _entries.get(kind)
+        if entry is not None and time.monotonic() - entry[0] < ttl:
+            return entry[1]
+        value = loader()
+        _entries[kind] = (time.monotonic(), value)
+        return value
+
+
+def invalidate_catalog(*kinds: str):
+    """Drop the given listings, or all of them when no kind is given.
+
+    Snapshot copies loaded before the invalidation are ignored from then on.
+    """
+    now = time.time()
+    for kind in kinds or set(_entries) | set(_invalidated):
+        _entries.pop(kind, None)
+        _invalidated[kind] = now
@@ -1,11 +1,13 @@
 """Shared ADH client configuration."""
 
 import os
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
 
-from adh_sample_library_preview import ADHClient
 from dotenv import load_dotenv
 
+if TYPE_CHECKING:
+    from adh_sample_library_preview import ADHClient
+
 # Load environment variables from the .env file in the parent directory
 load_dotenv(os.path.join(os.path.dirname(__file__), "../.env"))
 # Environment variables with type hints
@@ -17,10 +19,10 @@ CLIENT_SECRET: Optional[str] = os.getenv("CLIENT_SECRET")
 RESOURCE: Optional[str] = os.getenv("RESOURCE")
 
 # Global client instance
-_adh_client: Optional[ADHClient] = None
+_adh_client: Optional["ADHClient"] = None
 
 
-def get_adh_client() -> ADHClient:
+def get_adh_client() -> "ADHClient":
     """Get or create ADH client singleton.
     
     Returns:
@@ -52,9 +54,15 @@ def get_adh_client() -> ADHClient:
             "Please check your .env file."
         )
     
+    # The SDK is imported on first use to keep application startup fast
+    from adh_sample_library_preview import ADHClient
+
+    from .upstream import GuardedClient
+
     try:
-        _adh_client = ADHClient(
-            API_VERSION, TENANT_ID, RESOURCE, CLIENT_ID, CLIENT_SECRET, False
+        # All SDK calls go through the concurrency limiter and circuit breaker
+        _adh_client = GuardedClient(
+            ADHClient(API_VERSION, TENANT_ID, RESOURCE, CLIENT_ID, CLIENT_SECRET, False)
         )
     except Exception as e:
         raise RuntimeError(f"Failed to initialize ADH client: {str(e)}") from e
@@ -0,0 +1,312 @@
+"""Streamed bulk export of stream values to CSV or Parquet.
+
+The streams of an export are paged from ADH by a pool of workers, each
+working through the window of one stream at a time. Pages are handed to
+the response through a bounded queue, so at most ``EXPORT_QUEUE_PAGES``
+pages are held in memory however long the range is. Rows are written in
+long format (``stream_id, timestamp, value``) in the order pages arrive:
+rows of one stream are in time order, rows of different streams
+interleave.
+
+Every export is registered with its progress (streams done, rows and bytes
+written), which /connect/export/{id} reports while the download runs.
+Parquet output needs the optional ``pyarrow`` package.
+"""
+
+import csv
+import io
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from .client import NAMESPACE_ID, get_adh_client
+from .series import events_to_arrays, format_timestamps, iter_window_pages
+from .upstream import background
+
+EXPORT_FORMATS = ("csv", "parquet")
+# Number of streams paged concurrently
+EXPORT_WORKERS: int = int(os.getenv("EXPORT_WORKERS", "4"))
+# Events per ADH page
+EXPORT_PAGE_SIZE: int = int(os.getenv("EXPORT_PAGE_SIZE", "10000"))
+# Pages buffered between the workers and the response
+EXPORT_QUEUE_PAGES: int = int(os.getenv("EXPORT_QUEUE_PAGES", "16"))
+# Rows per Parquet row group
+EXPORT_ROW_GROUP: int = int(os.getenv("EXPORT_ROW_GROUP", "100000"))
+EXPORT_MAX_STREAMS: int = int(os.getenv("EXPORT_MAX_STREAMS", "1000"))
+# Finished exports kept for progress queries
+EXPORT_HISTORY: int = int(os.getenv("EXPORT_HISTORY", "100"))
+
+_jobs: "OrderedDict[str, ExportJob]" = OrderedDict()
+_jobs_lock = threading.Lock()
+
+# Marks the end of the pages of one stream
+_DONE = object()
+
+
+class ExportJob:
+    """Progress of one export."""
+
+    def __init__(self, stream_ids: List[str], start: str, end: str, format: str):
+        self.id = uuid.uuid4().hex
+        self.stream_ids = stream_ids
+        self.start = start
+        self.end = end
+        self.format = format
+        self.status = "running"
+        self.error: Optional[str] = None
+        self.streams_done = 0
+        self.pages = 0
+        self.rows = 0
+        self.bytes = 0
+        self.started = time.time()
+        self.finished: Optional[float] = None
+
+    def finish(self, status: str, error: Optional[str] = None):
+        self.status = status
+        self.error = error
+        self.finished = time.time()
+
+    def state(self) -> Dict:
+        elapsed = (self.finished or time.time()) - self.started
+        return {
+            "id": self.id,
+            "status": self.status,
+            "error": self.error,
+            "format": self.format,
+            "start": self.start,
+            "end": self.end,
+            "streams": len(self.stream_ids),
+            "streams_done": self.streams_done,
+            "pages": self.pages,
+            "rows": self.rows,
+            "bytes": self.bytes,
+            "elapsed": elapsed,
+            "rows_per_second": self.rows / elapsed if elapsed > 0 else None,
+        }
+
+
+class CsvEncoder:
+    media_type = "text/csv"
+
+    def header(self) -> bytes:
+        return b"stream_id,timestamp,value\r\n"
+
+    def encode(
+        self, stream_id: str, timestamps: np.ndarray, values: np.ndarray
+    ) -> bytes:
+        out = io.StringIO()
+        cells = values.astype(object)
+        cells[np.isnan(values)] = ""
+        csv.writer(out).writerows(
+            zip([stream_id] * len(values), format_timestamps(timestamps), cells)
+        )
+        return out.getvalue().encode()
+
+    def close(self) -> bytes:
+        return b""
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands out what was written since the last drain.
+
+    Unlike a truncated BytesIO it keeps counting the position, which the
+    Parquet writer records as row group offsets.
+    """
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class ParquetEncoder:
+    media_type = "application/vnd.apache.parquet"
+
+    def __init__(self, row_group: int = EXPORT_ROW_GROUP):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ValueError("Parquet export requires the pyarrow package")
+        self._pa = pa
+        self.row_group = max(1, row_group)
+        self.schema = pa.schema(
+            [
+                ("stream_id", pa.string()),
+                ("timestamp", pa.timestamp("ms", tz="UTC")),
+                ("value", pa.float64()),
+            ]
+        )
+        self._sink = _ChunkSink()
+        self._writer = pq.ParquetWriter(self._sink, self.schema)
+        self._pending: List[Tuple[str, np.ndarray, np.ndarray]] = []
+        self._pending_rows = 0
+
+    def header(self) -> bytes:
+        return self._sink.drain()
+
+    def encode(
+        self, stream_id: str, timestamps: np.ndarray, values: np.ndarray
+    ) -> bytes:
+        self._pending.append((stream_id, timestamps, values))
+        self._pending_rows += len(values)
+        if self._pending_rows >= self.row_group:
+            self._write_row_group()
+        return self._sink.drain()
+
+    def _write_row_group(self):
+        if not self._pending:
+            return
+        pa = self._pa
+        stream_ids, timestamps, values = zip(*self._pending)
+        table = pa.Table.from_arrays(
+            [
+                pa.array(np.repeat(stream_ids, [len(v) for v in values])),
+                pa.array(np.concatenate(timestamps), self.schema.field(1).type),
+                # NaN values become nulls
+                pa.array(np.concatenate(values), from_pandas=True),
+            ],
+            schema=self.schema,
+        )
+        self._writer.write_table(table)
+        self._pending = []
+        self._pending_rows = 0
+
+    def close(self) -> bytes:
+        self._write_row_group()
+        self._writer.close()
+        return self._sink.drain()
+
+
+def make_encoder(format: str):
+    if format == "csv":
+        return CsvEncoder()
+    if format == "parquet":
+        return ParquetEncoder()
+    raise ValueError(
+        f"Unknown export format {format!r}, expected one of {EXPORT_FORMATS}"
+    )
+
+
+def start_export(
+    stream_ids: List[str], start: str, end: str, format: str = "csv"
+) -> Tuple[ExportJob, object]:
+    """Register an export and create its encoder, validating the request."""
+    if not stream_ids:
+        raise ValueError("No streams to export")
+    if len(stream_ids) > EXPORT_MAX_STREAMS:
+        raise ValueError(
+            f"Export of {len(stream_ids)} streams exceeds the limit of "
+            f"{EXPORT_MAX_STREAMS}"
+        )
+    encoder = make_encoder(format)
+    job = ExportJob(list(dict.fromkeys(stream_ids)), start, end, format)
+    with _jobs_lock:
+        _jobs[job.id] = job
+        while len(_jobs) > EXPORT_HISTORY:
+            _jobs.popitem(last=False)
+    return job, encoder
+
+
+def get_export(export_id: str) -> Optional[Dict]:
+    with _jobs_lock:
+        job = _jobs.get(export_id)
+    return None if job is None else job.state()
+
+
+def iter_export(
+    job: ExportJob,
+    encoder,
+    client=None,
+    workers: int = EXPORT_WORKERS,
+    page_size: int = EXPORT_PAGE_SIZE,
+    queue_pages: int = EXPORT_QUEUE_PAGES,
+) -> Iterator[bytes]:
+    """Page all streams of `job` from ADH and yield the encoded file in chunks.
+
+    Closing the iterator early (e.g. when the client disconnects) stops the
+    workers after their current page. A failing stream aborts the export.
+    """
+    client = client or get_adh_client()
+    pages: "queue.Queue" = queue.Queue(maxsize=max(1, queue_pages))
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def read(stream_id: str):
+        try:
+            with background():
+                for events in iter_window_pages(
+                    client, NAMESPACE_ID, stream_id, job.start, job.end, page_size
+                ):
+                    if not put((stream_id, *events_to_arrays(events))):
+                        return
+            put(_DONE)
+        except Exception as e:
+            put(e)
+
+    pool = ThreadPoolExecutor(max_workers=max(1, workers))
+    try:
+        for stream_id in job.stream_ids:
+            pool.submit(read, stream_id)
+
+        def emit(chunk: bytes) -> bytes:
+            job.bytes += len(chunk)
+            return chunk
+
+        yield emit(encoder.header())
+        while job.streams_done < len(job.stream_ids):
+            item = pages.get()
+            if item is _DONE:
+                job.streams_done += 1
+                continue
+            if isinstance(item, Exception):
+                raise item
+            stream_id, timestamps, values = item
+            job.pages += 1
+            job.rows += len(values)
+            chunk = encoder.encode(stream_id, timestamps, values)
+            if chunk:
+                yield emit(chunk)
+        yield emit(encoder.close())
+        job.finish("done")
+    except GeneratorExit:
+        job.finish("cancelled")
+        raise
+    except Exception as e:
+        logging.warning(f"Export {job.id} failed: {e}")
+        job.finish("failed", str(e))
+        raise
+    finally:
+        stop.set()
+        pool.shutdown(wait=False, cancel_futures=True)
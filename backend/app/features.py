@@ -0,0 +1,247 @@
+"""Lag/lead feature matrices for forecast model training.
+
+The `target`, `past` and `future` streams of a model are sampled on a common
+grid of `interval` seconds and stored column-wise in one float64 array
+(targets first, then past and future covariates). The array is cached as a
+memory-mapped ``.npy`` file keyed by asset, streams, interval and range, so
+repeated retrains reuse it without fetching or copying it again. The lagged
+and lead windows are strided views over that base array.
+
+Ranges ending within ``FEATURE_CACHE_RECENT`` seconds of now may still
+receive data and are not cached. The cache is kept under
+``FEATURE_CACHE_MAX_BYTES`` by evicting the least recently used arrays.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .client import NAMESPACE_ID, get_adh_client
+from .series import events_to_arrays, parse_timestamps
+
+FEATURE_CACHE_DIR: str = os.getenv(
+    "FEATURE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "adh_feature_cache")
+)
+FEATURE_CACHE_MAX_BYTES: int = int(os.getenv("FEATURE_CACHE_MAX_BYTES", str(2**30)))
+# Ranges ending less than this many seconds ago are fetched but not cached
+FEATURE_CACHE_RECENT: float = float(os.getenv("FEATURE_CACHE_RECENT", "3600"))
+
+
+class FeatureMatrix:
+    """Lagged history and lead windows over an aligned base array.
+
+    For every forecast origin ``t`` the matrix exposes the last `lag` samples
+    of the target and past streams, the next `lead` samples of the future
+    streams and, as labels, the next `lead` samples of the target streams.
+    All three are read-only views of `data`; nothing is copied until
+    `design_matrix` flattens them for fitting.
+    """
+
+    def __init__(
+        self,
+        timestamps: np.ndarray,
+        data: np.ndarray,
+        n_target: int,
+        n_past: int,
+        n_future: int,
+        lag: int,
+        lead: int,
+    ):
+        self.timestamps = timestamps
+        self.data = data
+        self.n_target = n_target
+        self.n_past = n_past
+        self.n_future = n_future
+        self.lag = max(1, lag)
+        self.lead = max(1, lead)
+
+    def __len__(self) -> int:
+        return max(0, len(self.data) - self.lag - self.lead + 1)
+
+    @property
+    def history(self) -> np.ndarray:
+        """Target and past values, shape (samples, target + past, lag)."""
+        columns = self.data[:, : self.n_target + self.n_past]
+        return sliding_window_view(columns, self.lag, axis=0)[: len(self)]
+
+    @property
+    def ahead(self) -> np.ndarray:
+        """Known future covariates, shape (samples, future, lead)."""
+        columns = self.data[:, self.n_target + self.n_past :]
+        return sliding_window_view(columns, self.lead, axis=0)[self.lag :][: len(self)]
+
+    @property
+    def labels(self) -> np.ndarray:
+        """Target values to forecast, shape (samples, target, lead)."""
+        columns = self.data[:, : self.n_target]
+        return sliding_window_view(columns, self.lead, axis=0)[self.lag :][: len(self)]
+
+    @property
+    def origins(self) -> np.ndarray:
+        """Timestamp of the last observed sample of every window."""
+        return self.timestamps[self.lag - 1 :][: len(self)]
+
+    def design_matrix(self, dropna: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+        """Flatten the windows into ``X`` (samples, features) and ``y`` (samples, targets).
+
+        Rows containing NaN are dropped unless `dropna` is False.
+        """
+        n = len(self)
+        X = np.concatenate(
+            [self.history.reshape(n, -1), self.ahead.reshape(n, -1)], axis=1
+        )
+        y = self.labels.reshape(n, -1)
+        if dropna:
+            keep = ~(np.isnan(X).any(axis=1) | np.isnan(y).any(axis=1))
+            return X[keep], y[keep]
+        return X, y
+
+
+def _grid(start: str, end: str, interval: int) -> np.ndarray:
+    start_ts, end_ts = parse_timestamps([start, end])
+    step = np.timedelta64(int(interval * 1000), "ms")
+    count = int((end_ts - start_ts) // step) + 1
+    return start_ts + np.arange(count) * step
+
+
+def fetch_base_arrays(
+    streams: List[str], interval: int, start: str, end: str, client=None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Sample `streams` on a common grid and return (timestamps, data)."""
+    if interval <= 0:
+        raise ValueError("interval must be positive")
+    client = client or get_adh_client()
+    timestamps = _grid(start, end, interval)
+    if len(timestamps) == 0:
+        raise ValueError("end must not be before start")
+    data = np.full((len(timestamps), len(streams)), np.nan)
+    grid_end = f"{np.datetime_as_string(timestamps[-1], unit='ms')}Z"
+    for column, stream_id in enumerate(streams):
+        events = client.Streams.getRangeValuesInterpolated(
+            NAMESPACE_ID,
+            stream_id=stream_id,
+            value_class=None,
+            start=start,
+            end=grid_end,
+            count=len(timestamps),
+        )
+        _, values = events_to_arrays(list(events))
+        data[: len(values), column] = values[: len(timestamps)]
+    return timestamps, data
+
+
+def _cache_key(asset_id: str, streams: List[str], interval: int, start: str, end: str):
+    key = json.dumps([asset_id, streams, interval, start, end])
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def _save(path: str, array: np.ndarray):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp, path)
+
+
+def _evict(cache_dir: str, max_bytes: int, keep: str):
+    """Delete least recently used arrays until the cache fits in `max_bytes`."""
+    entries = []
+    for name in os.listdir(cache_dir):
+        if not name.endswith(".index.npy"):
+            continue
+        key = name[: -len(".index.npy")]
+        paths = [
+            os.path.join(cache_dir, f"{key}{ext}") for ext in (".npy", ".index.npy")
+        ]
+        try:
+            stats = [os.stat(path) for path in paths]
+        except FileNotFoundError:
+            continue
+        entries.append((stats[0].st_mtime, key, paths, sum(s.st_size for s in stats)))
+    total = sum(entry[3] for entry in entries)
+    for _, key, paths, size in sorted(entries):
+        if total <= max_bytes:
+            break
+        if key == keep:
+            continue
+        try:
+            for path in paths:
+                os.remove(path)
+        except OSError:
+            # Still mapped on platforms that do not allow deleting it
+            continue
+        total -= size
+
+
+def load_base_arrays(
+    asset_id: str,
+    streams: List[str],
+    interval: int,
+    start: str,
+    end: str,
+    client=None,
+    cache_dir: Optional[str] = None,
+    max_bytes: Optional[int] = None,
+    cache: bool = True,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Return memory-mapped (timestamps, data), fetching them only on a cache miss.
+
+    Ranges reaching into the last ``FEATURE_CACHE_RECENT`` seconds, and all
+    ranges without `cache`, are returned in memory without being cached.
+    """
+    if not cache:
+        return fetch_base_arrays(streams, interval, start, end, client)
+    cache_dir = cache_dir or FEATURE_CACHE_DIR
+    max_bytes = FEATURE_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    key = _cache_key(asset_id, streams, interval, start, end)
+    data_path = os.path.join(cache_dir, f"{key}.npy")
+    index_path = os.path.join(cache_dir, f"{key}.index.npy")
+
+    if os.path.exists(data_path) and os.path.exists(index_path):
+        # The modification time orders the cache for eviction
+        os.utime(data_path)
+    else:
+        timestamps, data = fetch_base_arrays(streams, interval, start, end, client)
+        recent = np.datetime64(int((time.time() - FEATURE_CACHE_RECENT) * 1000), "ms")
+        if timestamps[-1] >= recent:
+            return timestamps, data
+        os.makedirs(cache_dir, exist_ok=True)
+        _save(data_path, data)
+        _save(index_path, timestamps.astype(np.int64))
+        _evict(cache_dir, max_bytes, key)
+
+    timestamps = np.load(index_path, mmap_mode="r").view("datetime64[ms]")
+    return timestamps, np.load(data_path, mmap_mode="r")
+
+
+def build_features(
+    asset_id: str,
+    target: List[str],
+    past: List[str],
+    future: List[str],
+    interval: int,
+    lag: int,
+    lead: int,
+    start: str,
+    end: str,
+    client=None,
+    cache_dir: Optional[str] = None,
+    cache: bool = True,
+) -> FeatureMatrix:
+    """Build the lag/lead feature matrix of a model over [start, end].
+
+    `interval` is the sampling interval in seconds; `lag` and `lead` are
+    numbers of samples. Ranges read only once should pass `cache=False`.
+    """
+    streams = list(target) + list(past) + list(future)
+    timestamps, data = load_base_arrays(
+        asset_id, streams, interval, start, end, client, cache_dir, cache=cache
+    )
+    return FeatureMatrix(
+        timestamps, data, len(target), len(past), len(future), lag, lead
+    )
@@ -1,24 +1,56 @@
+import asyncio
 import logging
+import math
+import time
+import tracemalloc
+from contextlib import asynccontextmanager
 from operator import itemgetter
-from typing import Dict, List
-
-from adh_sample_library_preview import (
-    Asset,
-    MetadataItem,
-    SdsExtrapolationMode,
-    SdsInterpolationMode,
-    SdsStream,
-    SdsType,
-    SdsTypeCode,
-    SdsTypeProperty,
-    TypeReference,
-)
-from fastapi import FastAPI, HTTPException
+from typing import TYPE_CHECKING, Any, Dict, List, Literal, Optional
+
+import numpy as np
+from fastapi import FastAPI, Header, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
+from starlette.routing import Match
 
+from . import IMPORT_STARTED
+from .backtest import run_backtest
+from .batch import get_operations, run_batch
+from .catalog import get_catalog, invalidate_catalog
+from .export import get_export, iter_export, start_export
 from .client import NAMESPACE_ID, get_adh_client
-from .model import ML_MODEL_ASSET_TYPE_QUERY, create_ml_asset, create_ml_type
+from .memory import (
+    MEMORY_TRACING,
+    check_budget,
+    memory_state,
+    start_tracing,
+    track,
+)
+from .model import (
+    ML_FORECAST_STREAMS,
+    ML_MODEL_ASSET_TYPE_QUERY,
+    ModelConflict,
+    ModelNotFound,
+    create_ml_asset,
+    create_ml_type,
+    model_streams,
+    update_ml_asset,
+)
+from .registry import ModelNotTrained, get_model_registry
+from .rollups import get_rollup_manager
+from .series import align_results, parse_timestamps
+from .snapshot import CATALOG_SNAPSHOT_PATH, run_publisher
+from .store import read_through
+from .summaries import get_summaries
+from .sweeper import FORECAST_SWEEP, delete_forecast_streams, run_sweeper, sweep
+from .sync import CATALOG_SYNC, get_catalog_sync
+from .upstream import UpstreamUnavailable, upstream_state
+from .warmup import STARTUP_WARMUP, record_import_time, start_warm_up, startup_state
+from .writer import ForecastWriter
+
+if TYPE_CHECKING:
+    from adh_sample_library_preview import Asset, MetadataItem, SdsType
 
 # Constants
 
@@ -50,10 +82,61 @@ class ModelCreateRequest(BaseModel):
     lead: int
     update: str
     retrain: str
+    # Version the update is based on, as listed by /connect/models
+    version: Optional[str] = None
+
+
+class BatchRequest(BaseModel):
+    path: str
+    params: Dict[str, Any] = {}
+    id: Optional[str] = None
+
+
+class PredictInput(BaseModel):
+    history: Dict[str, List[float]] = {}
+    future: Dict[str, List[float]] = {}
+
+
+class PredictRequest(BaseModel):
+    inputs: List[PredictInput]
+
+
+class ForecastPoint(BaseModel):
+    model_id: str
+    timestamp: str
+    forecast: float
+    lower: Optional[float] = None
+    upper: Optional[float] = None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    publisher = None
+    if CATALOG_SNAPSHOT_PATH:
+        publisher = asyncio.create_task(run_publisher(CATALOG_LOADERS))
+    if STARTUP_WARMUP:
+        # Runs in the background so the worker accepts requests immediately
+        app.state.warm_up = start_warm_up(CATALOG_LOADERS)
+    start_tracing()
+    rollup_refresh = asyncio.create_task(get_rollup_manager().run())
+    catalog_sync = None
+    if CATALOG_SYNC:
+        catalog_sync = asyncio.create_task(get_catalog_sync(CATALOG_LOADERS).run())
+    forecast_sweep = None
+    if FORECAST_SWEEP:
+        forecast_sweep = asyncio.create_task(run_sweeper(on_deleted=forget_streams))
+    yield
+    rollup_refresh.cancel()
+    if forecast_sweep is not None:
+        forecast_sweep.cancel()
+    if catalog_sync is not None:
+        catalog_sync.cancel()
+    if publisher is not None:
+        publisher.cancel()
 
 
 # Initialize FastAPI app
-app = FastAPI(title="My API", version="1.0.0")
+app = FastAPI(title="My API", version="1.0.0", lifespan=lifespan)
 
 # Configure CORS
 app.add_middleware(
@@ -62,9 +145,37 @@ app.add_middleware(
     allow_origins=["http://localhost:3000", "http://127.0.0.1:3000"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Export-Id"],
 )
 
 
+async def track_memory(request: Request, call_next):
+    if not tracemalloc.is_tracing():
+        return await call_next(request)
+    route = request.url.path
+    for candidate in request.app.router.routes:
+        if candidate.matches(request.scope)[0] == Match.FULL:
+            route = candidate.path
+            break
+    with track(route):
+        return await call_next(request)
+
+
+# The middleware adds a task per request, so it is only installed while
+# memory tracing is switched on
+if MEMORY_TRACING:
+    app.middleware("http")(track_memory)
+
+
+@app.exception_handler(UpstreamUnavailable)
+async def upstream_unavailable_handler(request: Request, exc: UpstreamUnavailable):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(math.ceil(exc.retry_after))},
+    )
+
+
 def _split(value: str):
     if value:
         if value == "":
@@ -78,7 +189,7 @@ def sort_list(l: List, key="name"):
     return sorted(l, key=itemgetter(key))
 
 
-def extract_type_fields(data: SdsType) -> Dict:
+def extract_type_fields(data: "SdsType") -> Dict:
     d = {}
     d["Id"] = data.Id
     d["Name"] = data.Name
@@ -103,14 +214,14 @@ def extract_simple_fields(data: Dict) -> Dict:
     return d
 
 
-def meta2dict(meta: List[MetadataItem]) -> Dict[str, MetadataItem]:
+def meta2dict(meta: List["MetadataItem"]) -> Dict[str, "MetadataItem"]:
     d = {}
     for _meta in meta:
         d[_meta.Name] = _meta
     return d
 
 
-def extract_model_fields(data: Asset) -> Dict:
+def extract_model_fields(data: "Asset") -> Dict:
     """Extract common fields from ADH objects with defaults."""
     try:
         _meta = meta2dict(data.Metadata)
@@ -129,6 +240,8 @@ def extract_model_fields(data: Asset) -> Dict:
         d["lead"] = _meta["lead"].Value
         d["update"] = _meta["update"].Value
         d["retrain"] = _meta["retrain"].Value
+        modified = getattr(data, "ModifiedDate", None)
+        d["version"] = modified.isoformat() if modified else ""
         return d
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch models: {str(e)}")
@@ -138,6 +251,73 @@ def extract_model_fields(data: Asset) -> Dict:
         )
 
 
+def load_types() -> List[Dict]:
+    client = get_adh_client()
+    types = client.Types.getTypes(NAMESPACE_ID)
+    return sort_list([extract_type_fields(i) for i in types], "Name")
+
+
+def load_streams() -> List[Dict]:
+    client = get_adh_client()
+    streams = client.Streams.getStreams(NAMESPACE_ID)
+    return sort_list([extract_simple_fields(i.toDictionary()) for i in streams])
+
+
+def load_assets() -> List[Dict]:
+    client = get_adh_client()
+    assets = client.Assets.getAssets(NAMESPACE_ID)
+    return sort_list([extract_simple_fields(i.toDictionary()) for i in assets])
+
+
+def load_asset_types() -> List[Dict]:
+    client = get_adh_client()
+    asset_types = client.AssetTypes.getAssetTypes(NAMESPACE_ID)
+    return sort_list([extract_simple_fields(i.toDictionary()) for i in asset_types])
+
+
+def load_models() -> List[Dict]:
+    client = get_adh_client()
+    models = client.Assets.getAssets(NAMESPACE_ID, query=ML_MODEL_ASSET_TYPE_QUERY)
+    return sort_list([extract_model_fields(i) for i in models])
+
+
+CATALOG_LOADERS = {
+    "types": load_types,
+    "streams": load_streams,
+    "assets": load_assets,
+    "asset_types": load_asset_types,
+    "models": load_models,
+}
+
+
+def catalog_listing(kind: str) -> List[Dict]:
+    """Return a listing from the synchronized catalog, falling back to the cache."""
+    listing = get_catalog_sync(CATALOG_LOADERS).get(kind)
+    if listing is None:
+        return get_catalog(kind, CATALOG_LOADERS[kind])
+    return listing
+
+
+def catalog_response(kind: str, if_none_match: Optional[str]):
+    """Serve a listing with its ETag once the synchronizer has loaded it."""
+    sync = get_catalog_sync(CATALOG_LOADERS)
+    listing = sync.get(kind)
+    if listing is None:
+        return get_catalog(kind, CATALOG_LOADERS[kind])
+    etag = sync.etag(kind)
+    if if_none_match == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return JSONResponse(listing, headers={"ETag": etag})
+
+
+def forget_streams(stream_ids: List[str]):
+    """Drop deleted streams from the cached and synchronized listings."""
+    invalidate_catalog("streams")
+    sync = get_catalog_sync(CATALOG_LOADERS)
+    for stream_id in stream_ids:
+        sync.delete("streams", stream_id)
+
+
 @app.get("/", response_model=MessageResponse)
 async def root():
     return MessageResponse(message="Hello from FastAPI!")
@@ -148,23 +328,38 @@ async def health_check():
     return HealthResponse(status="healthy")
 
 
+@app.get("/api/startup")
+async def get_startup():
+    return startup_state()
+
+
+@app.get("/api/memory")
+async def get_memory(top: int = 0):
+    return memory_state(top)
+
+
+@app.get("/api/upstream")
+async def get_upstream():
+    return upstream_state()
+
+
 @app.get("/connect/types")
-async def get_types():
+def get_types(if_none_match: Optional[str] = Header(None)):
     try:
-        client = get_adh_client()
-        types = client.Types.getTypes(NAMESPACE_ID)
-        return sort_list([extract_type_fields(i) for i in types], "Name")
+        return catalog_response("types", if_none_match)
+    except UpstreamUnavailable:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch types: {str(e)}")
 
 
 @app.get("/connect/streams")
-async def get_streams():
+def get_streams(if_none_match: Optional[str] = Header(None)):
     logging.info("/connect/streams")
     try:
-        client = get_adh_client()
-        streams = client.Streams.getStreams(NAMESPACE_ID)
-        return sort_list([extract_simple_fields(i.toDictionary()) for i in streams])
+        return catalog_response("streams", if_none_match)
+    except UpstreamUnavailable:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Failed to fetch streams: {str(e)}"
@@ -172,22 +367,22 @@ async def get_streams():
 
 
 @app.get("/connect/assets")
-async def get_assets():
+def get_assets(if_none_match: Optional[str] = Header(None)):
     logging.info("/connect/assets")
     try:
-        client = get_adh_client()
-        assets = client.Assets.getAssets(NAMESPACE_ID)
-        return sort_list([extract_simple_fields(i.toDictionary()) for i in assets])
+        return catalog_response("assets", if_none_match)
+    except UpstreamUnavailable:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch assets: {str(e)}")
 
 
 @app.get("/connect/asset_types")
-async def get_asset_types():
+def get_asset_types(if_none_match: Optional[str] = Header(None)):
     try:
-        client = get_adh_client()
-        asset_types = client.AssetTypes.getAssetTypes(NAMESPACE_ID)
-        return sort_list([extract_simple_fields(i.toDictionary()) for i in asset_types])
+        return catalog_response("asset_types", if_none_match)
+    except UpstreamUnavailable:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Failed to fetch asset types: {str(e)}"
@@ -195,36 +390,112 @@ async def get_asset_types():
 
 
 @app.get("/connect/models")
-async def get_models():
+def get_models(if_none_match: Optional[str] = Header(None)):
     try:
-        client = get_adh_client()
-        models = client.Assets.getAssets(NAMESPACE_ID, query=ML_MODEL_ASSET_TYPE_QUERY)
-        return sort_list([extract_model_fields(i) for i in models])
+        return catalog_response("models", if_none_match)
+    except UpstreamUnavailable:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch models: {str(e)}")
 
 
+@app.get("/connect/catalog/changes")
+def get_catalog_changes(since: int = 0, epoch: Optional[str] = None):
+    changes = get_catalog_sync(CATALOG_LOADERS).changes(since, epoch)
+    if changes is None:
+        raise HTTPException(
+            status_code=410, detail=f"Changes since version {since} are no longer kept"
+        )
+    return changes
+
+
 @app.delete("/connect/models", response_model=StatusResponse)
-async def delete_models(asset_id: str):
+def delete_models(asset_id: str, cascade: bool = False):
+    """Delete a model asset and, with `cascade`, its forecast output streams."""
     logging.info("/connect/models")
     try:
         client = get_adh_client()
         client.Assets.deleteAsset(NAMESPACE_ID, asset_id)
+        invalidate_catalog("models", "assets")
+        sync = get_catalog_sync(CATALOG_LOADERS)
+        sync.delete("models", asset_id)
+        sync.delete("assets", asset_id)
+        get_model_registry().remove(asset_id)
+        model_streams.cache_clear()
+        if cascade:
+            deleted, failed = delete_forecast_streams(client, asset_id)
+            forget_streams(deleted)
+            if failed:
+                # The asset is gone, the sweeper removes the remaining streams
+                logging.warning(f"Failed to delete forecast streams: {failed}")
         return StatusResponse(status="ok")
+    except UpstreamUnavailable:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to delete model: {str(e)}")
 
 
+@app.post("/connect/models/sweep")
+def sweep_forecast_streams(dry_run: bool = True):
+    """Report, and unless `dry_run` delete, forecast streams without a model."""
+    logging.info("/connect/models/sweep")
+    try:
+        report = sweep(dry_run)
+        forget_streams(report["deleted"])
+        return report
+    except UpstreamUnavailable:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Failed to sweep forecast streams: {str(e)}"
+        )
+
+
 @app.put("/connect/models", response_model=StatusResponse)
-async def put_models(request: ModelCreateRequest):
-    return await post_models(request)
+def put_models(request: ModelCreateRequest):
+    logging.info("put /connect/models")
+    try:
+        asset, changes = update_ml_asset(
+            id=request.id,
+            name=request.name,
+            description=request.description,
+            model_type=request.model_type,
+            interval=request.interval,
+            past=request.past,
+            target=request.target,
+            future=request.future,
+            status=request.status,
+            lag=request.lag,
+            lead=request.lead,
+            update=request.update,
+            retrain=request.retrain,
+            version=request.version,
+        )
+        if not changes:
+            return StatusResponse(status="unchanged")
+        if "recreated" in changes:
+            invalidate_catalog(*CATALOG_LOADERS)
+        else:
+            invalidate_catalog("models", "assets")
+        sync = get_catalog_sync(CATALOG_LOADERS)
+        sync.upsert("models", extract_model_fields(asset))
+        sync.upsert("assets", extract_simple_fields(asset.toDictionary()))
+        return StatusResponse(status="ok")
+    except ModelNotFound:
+        raise HTTPException(status_code=404, detail=f"Model {request.id} not found")
+    except ModelConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except UpstreamUnavailable:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to update model: {str(e)}")
 
 
 @app.post("/connect/models", response_model=StatusResponse)
-async def post_models(request: ModelCreateRequest):
+def post_models(request: ModelCreateRequest):
     logging.info("post /connect/models")
     try:
-        create_ml_asset(
+        asset = create_ml_asset(
             id=request.id,
             name=request.name,
             description=request.description,
@@ -239,24 +510,66 @@ async def post_models(request: ModelCreateRequest):
             update=request.update,
             retrain=request.retrain,
         )
+        # The asset, its asset type and the forecast streams may all be new
+        invalidate_catalog(*CATALOG_LOADERS)
+        sync = get_catalog_sync(CATALOG_LOADERS)
+        sync.upsert("models", extract_model_fields(asset))
+        sync.upsert("assets", extract_simple_fields(asset.toDictionary()))
+        sync.request_sync()
         return StatusResponse(status="ok")
+    except UpstreamUnavailable:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to create model: {str(e)}")
 
 
+@app.post("/connect/forecast_values")
+def post_forecast_values(points: List[ForecastPoint]):
+    logging.info("post /connect/forecast_values")
+    # Each request flushes and answers for only its own points
+    writer = ForecastWriter()
+    for point in points:
+        writer.add(
+            point.model_id, point.timestamp, point.forecast, point.lower, point.upper
+        )
+    try:
+        stats = writer.flush()
+    except UpstreamUnavailable:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Failed to write forecast values: {str(e)}"
+        )
+    if stats["failed"]:
+        errors = "; ".join(f"{s}: {e}" for s, e in stats["errors"].items())
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to write {stats['failed']} forecast values: {errors}",
+        )
+    return stats
+
+
 @app.get("/connect/stream_values")
-async def get_stream_values(stream_id: str, start: str, end: str, count: int):
+def get_stream_values(stream_id: str, start: str, end: str, count: int):
+    check_budget("/connect/stream_values", count)
     try:
         client = get_adh_client()
-        values = client.Streams.getRangeValuesInterpolated(
-            NAMESPACE_ID,
-            stream_id=stream_id,
-            value_class=None,
-            start=start,
-            end=end,
-            count=count,
+        return read_through(
+            "stream_values",
+            {"stream_id": stream_id, "start": start, "end": end, "count": count},
+            lambda: list(
+                client.Streams.getRangeValuesInterpolated(
+                    NAMESPACE_ID,
+                    stream_id=stream_id,
+                    value_class=None,
+                    start=start,
+                    end=end,
+                    count=count,
+                )
+            ),
         )
-        return list(values)
+    except UpstreamUnavailable:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Failed to fetch stream values: {str(e)}"
@@ -264,39 +577,108 @@ async def get_stream_values(stream_id: str, start: str, end: str, count: int):
 
 
 @app.get("/connect/stream_sample_values")
-async def get_stream_sample_values(
-    stream_id: str, start: str, end: str, intervals: int
-):
+def get_stream_sample_values(stream_id: str, start: str, end: str, intervals: int):
+    check_budget("/connect/stream_sample_values", intervals)
     try:
         logging.info(f"{start} {end} {intervals}")
         client = get_adh_client()
-        values = client.Streams.getRangeValuesInterpolated(
-            NAMESPACE_ID,
-            stream_id=stream_id,
-            value_class=None,
-            start=start,
-            end=end,
-            count=intervals,
+        return read_through(
+            "stream_values",
+            {"stream_id": stream_id, "start": start, "end": end, "count": intervals},
+            lambda: list(
+                client.Streams.getRangeValuesInterpolated(
+                    NAMESPACE_ID,
+                    stream_id=stream_id,
+                    value_class=None,
+                    start=start,
+                    end=end,
+                    count=intervals,
+                )
+            ),
         )
-        return list(values)
+    except UpstreamUnavailable:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Failed to fetch stream values: {str(e)}"
         )
 
 
+@app.get("/connect/stream_summaries")
+def get_stream_summaries(
+    start: str,
+    end: str,
+    intervals: int,
+    stream_id: List[str] = Query(...),
+    source: Literal["auto", "adh", "local"] = "auto",
+):
+    check_budget("/connect/stream_summaries", intervals * len(stream_id))
+    try:
+        return get_summaries(stream_id, start, end, intervals, source)
+    except UpstreamUnavailable:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Failed to fetch stream summaries: {str(e)}"
+        )
+
+
+@app.get("/connect/stream_rollup")
+def get_stream_rollup(
+    start: str,
+    end: str,
+    intervals: int,
+    stream_id: List[str] = Query(...),
+):
+    check_budget("/connect/stream_rollup", intervals * len(stream_id))
+    try:
+        return get_rollup_manager().query(stream_id, start, end, intervals)
+    except UpstreamUnavailable:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Failed to fetch stream rollup: {str(e)}"
+        )
+
+
 @app.get("/connect/asset_values")
-async def get_asset_values(asset_id: str, start: str, end: str, count: int):
+def get_asset_values(
+    asset_id: str,
+    start: str,
+    end: str,
+    count: int,
+    align: bool = False,
+    fill: Literal["none", "previous", "linear", "zero"] = "none",
+):
+    # The number of streams is only known from the response
+    check_budget("/connect/asset_values", count)
     try:
         client = get_adh_client()
-        asset_data = client.Assets.getAssetInterpolatedData(
-            NAMESPACE_ID,
-            asset_id=asset_id,
-            start_index=start,
-            end_index=end,
-            count=count,
+        results = read_through(
+            "asset_values",
+            {
+                "asset_id": asset_id,
+                "start": start,
+                "end": end,
+                "count": count,
+            },
+            lambda: client.Assets.getAssetInterpolatedData(
+                NAMESPACE_ID,
+                asset_id=asset_id,
+                start_index=start,
+                end_index=end,
+                count=count,
+            ).toDictionary()["Results"],
         )
-        return asset_data.toDictionary()["Results"]
+        if align:
+            return align_results(results or {}, fill)
+        return results
+    except UpstreamUnavailable:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Failed to fetch asset values: {str(e)}"
@@ -304,21 +686,199 @@ async def get_asset_values(asset_id: str, start: str, end: str, count: int):
 
 
 @app.get("/connect/model_values")
-async def get_model_values(asset_id: str, start: str, end: str, count: int):
+def get_model_values(
+    asset_id: str,
+    start: str,
+    end: str,
+    count: int,
+    fill: Literal["none", "previous", "linear", "zero"] = "none",
+):
     try:
+        models = catalog_listing("models")
+        model = next((m for m in models if m["id"] == asset_id), None)
+        if model is None:
+            raise HTTPException(status_code=404, detail=f"Model {asset_id} not found")
+        streams = model_streams(asset_id, model.get("version", ""))
+        check_budget("/connect/model_values", count * len(streams))
+
         client = get_adh_client()
-        asset = client.Assets.getAssetById(asset_id)
-        references = asset.StreamReferences()
-
-        asset_data = client.Assets.getAssetInterpolatedData(
-            NAMESPACE_ID,
-            asset_id=asset_id,
-            start_index=start,
-            end_index=end,
-            count=count,
+        results = read_through(
+            "model_values",
+            {
+                "asset_id": asset_id,
+                # A changed model reads other streams, never its old history
+                "version": model.get("version", ""),
+                "streams": [list(stream) for stream in streams],
+                "start": start,
+                "end": end,
+                "count": count,
+            },
+            lambda: client.Assets.getAssetInterpolatedData(
+                NAMESPACE_ID,
+                asset_id=asset_id,
+                start_index=start,
+                end_index=end,
+                count=count,
+                stream=[name for _, name in streams],
+            ).toDictionary()["Results"],
         )
-        return [item.toDictionary() for item in asset_data]
+        results = results or {}
+        aligned = align_results(
+            {label: results.get(name) or [] for label, name in streams}, fill
+        )
+        aligned["targets"] = [
+            label for label, _ in streams if label not in ML_FORECAST_STREAMS
+        ]
+        return aligned
+    except (HTTPException, UpstreamUnavailable):
+        raise
     except Exception as e:
         raise HTTPException(
-            status_code=500, detail=f"Failed to fetch asset values: {str(e)}"
+            status_code=500, detail=f"Failed to fetch model values: {str(e)}"
         )
+
+
+@app.get("/connect/backtest")
+def get_backtest(
+    asset_id: str,
+    start: str,
+    end: str,
+    folds: int = 10,
+    train: int = 0,
+):
+    try:
+        model = next(
+            (m for m in catalog_listing("models") if m["id"] == asset_id), None
+        )
+        if model is None:
+            raise HTTPException(status_code=404, detail=f"Model {asset_id} not found")
+        streams = len(model["target"]) + len(model["past"]) + len(model["future"])
+        start_ts, end_ts = parse_timestamps([start, end])
+        samples = (end_ts - start_ts) // np.timedelta64(
+            max(int(model["interval"]), 1), "s"
+        )
+        check_budget("/connect/backtest", int(samples) * max(streams, 1))
+        return run_backtest(model, start, end, folds, train)
+    except (HTTPException, UpstreamUnavailable):
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to run backtest: {str(e)}")
+
+
+@app.get("/connect/export", response_class=StreamingResponse)
+def get_export_download(
+    start: str,
+    end: str,
+    stream_id: List[str] = Query([]),
+    asset_id: Optional[str] = None,
+    format: Literal["csv", "parquet"] = "csv",
+):
+    """Stream all values of the streams, and those referenced by the asset."""
+    try:
+        stream_ids = list(stream_id)
+        if asset_id:
+            client = get_adh_client()
+            asset = client.Assets.getAssetById(NAMESPACE_ID, asset_id)
+            stream_ids += [r.StreamId for r in asset.StreamReferences or []]
+        job, encoder = start_export(stream_ids, start, end, format)
+    except UpstreamUnavailable:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to start export: {str(e)}")
+    return StreamingResponse(
+        iter_export(job, encoder),
+        media_type=encoder.media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="export-{job.id}.{format}"',
+            "X-Export-Id": job.id,
+        },
+    )
+
+
+@app.get("/connect/export/{export_id}")
+def get_export_progress(export_id: str):
+    state = get_export(export_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail=f"Export {export_id} not found")
+    return state
+
+
+@app.post("/connect/models/{asset_id}/train")
+def post_model_train(asset_id: str, start: str, end: str):
+    try:
+        model = next(
+            (m for m in catalog_listing("models") if m["id"] == asset_id), None
+        )
+        if model is None:
+            raise HTTPException(status_code=404, detail=f"Model {asset_id} not found")
+        return get_model_registry().train(model, start, end)
+    except (HTTPException, UpstreamUnavailable):
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to train model: {str(e)}")
+
+
+@app.post("/connect/models/{asset_id}/update")
+def post_model_update(asset_id: str, end: str):
+    try:
+        model = next(
+            (m for m in catalog_listing("models") if m["id"] == asset_id), None
+        )
+        if model is None:
+            raise HTTPException(status_code=404, detail=f"Model {asset_id} not found")
+        return get_model_registry().update(model, end)
+    except (HTTPException, UpstreamUnavailable):
+        raise
+    except ModelNotTrained:
+        raise HTTPException(status_code=404, detail=f"Model {asset_id} is not trained")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to update model: {str(e)}")
+
+
+@app.post("/connect/models/{asset_id}/predict")
+def post_model_predict(asset_id: str, request: PredictRequest):
+    try:
+        predictor = get_model_registry().get(asset_id)
+        X = predictor.design_matrix([item.model_dump() for item in request.inputs])
+        bands = predictor.predict(X)
+        targets = predictor.meta["target"]
+        return {
+            "model_id": asset_id,
+            "trained": predictor.meta["trained"],
+            "predictions": [
+                {
+                    name: dict(zip(targets, band[i].tolist()))
+                    for name, band in zip(ML_FORECAST_STREAMS, bands)
+                }
+                for i in range(len(X))
+            ],
+        }
+    except ModelNotTrained:
+        raise HTTPException(status_code=404, detail=f"Model {asset_id} is not trained")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to predict: {str(e)}")
+
+
+# Read endpoints that can be combined in a batch
+BATCH_OPERATIONS = get_operations(app.routes)
+
+
+@app.post("/connect/batch")
+def post_batch(requests: List[BatchRequest]):
+    try:
+        return run_batch(BATCH_OPERATIONS, [r.model_dump() for r in requests])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+record_import_time(time.perf_counter() - IMPORT_STARTED)
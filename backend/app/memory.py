@@ -0,0 +1,130 @@
+"""Memory accounting of requests and size budgets for value queries.
+
+With ``MEMORY_TRACING`` enabled, `tracemalloc` traces Python allocations
+and every request records how far the traced memory rose above its level
+at the start of the request (its peak) and how much of that it left behind.
+The counters are kept per route. Tracing is process-wide, so requests that
+overlap share their peaks; the counters show which routes are expensive,
+not exact per-request figures. Tracing slows allocations down noticeably
+and is meant to be switched on while investigating.
+
+Independently of tracing, `check_budget` rejects value queries whose
+estimated response exceeds ``RESPONSE_MAX_ROWS`` rows or
+``REQUEST_MEMORY_BUDGET`` bytes before anything is fetched from ADH.
+"""
+
+import os
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException
+
+MEMORY_TRACING: bool = os.getenv("MEMORY_TRACING", "false").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+# Stack frames stored per traced allocation
+MEMORY_TRACE_FRAMES: int = int(os.getenv("MEMORY_TRACE_FRAMES", "1"))
+# Largest number of events a single query may return
+RESPONSE_MAX_ROWS: int = int(os.getenv("RESPONSE_MAX_ROWS", "1000000"))
+# Estimated peak bytes a query may use, and the estimate per event
+REQUEST_MEMORY_BUDGET: int = int(os.getenv("REQUEST_MEMORY_BUDGET", str(512 * 2**20)))
+RESPONSE_ROW_BYTES: int = int(os.getenv("RESPONSE_ROW_BYTES", "600"))
+
+_routes: Dict[str, Dict] = {}
+_lock = threading.Lock()
+
+
+def _route_stats(route: str) -> Dict:
+    # Must be called with the lock held
+    if route not in _routes:
+        _routes[route] = {
+            "requests": 0,
+            "rejected": 0,
+            "allocated_bytes": 0,
+            "peak_bytes": 0,
+            "last_peak_bytes": 0,
+            "last_retained_bytes": 0,
+        }
+    return _routes[route]
+
+
+def start_tracing():
+    if MEMORY_TRACING and not tracemalloc.is_tracing():
+        tracemalloc.start(MEMORY_TRACE_FRAMES)
+
+
+@contextmanager
+def track(route: str):
+    """Record the memory used while the block runs under `route`."""
+    if not tracemalloc.is_tracing():
+        yield
+        return
+    start, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    try:
+        yield
+    finally:
+        current, peak = tracemalloc.get_traced_memory()
+        used = max(0, peak - start)
+        with _lock:
+            stats = _route_stats(route)
+            stats["requests"] += 1
+            stats["allocated_bytes"] += used
+            stats["peak_bytes"] = max(stats["peak_bytes"], used)
+            stats["last_peak_bytes"] = used
+            stats["last_retained_bytes"] = current - start
+
+
+def check_budget(route: str, rows: int):
+    """Raise a 413 if a query of `rows` events exceeds the row or memory budget."""
+    estimate = rows * RESPONSE_ROW_BYTES
+    if rows <= RESPONSE_MAX_ROWS and estimate <= REQUEST_MEMORY_BUDGET:
+        return
+    with _lock:
+        _route_stats(route)["rejected"] += 1
+    raise HTTPException(
+        status_code=413,
+        detail=(
+            f"Query of {rows} values (about {estimate // 2**20} MB) exceeds the "
+            f"budget of {RESPONSE_MAX_ROWS} values or "
+            f"{REQUEST_MEMORY_BUDGET // 2**20} MB; request fewer values"
+        ),
+    )
+
+
+def _max_rss() -> Optional[int]:
+    try:
+        import resource
+    except ImportError:
+        return None
+    # Kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def memory_state(top: int = 0) -> Dict:
+    """Return the per-route counters and, if tracing, the top allocation sites."""
+    state = {
+        "tracing": tracemalloc.is_tracing(),
+        "max_rss_bytes": _max_rss(),
+        "budget": {"rows": RESPONSE_MAX_ROWS, "bytes": REQUEST_MEMORY_BUDGET},
+    }
+    with _lock:
+        state["routes"] = {route: dict(stats) for route, stats in _routes.items()}
+    if state["tracing"]:
+        current, peak = tracemalloc.get_traced_memory()
+        state["traced_bytes"] = current
+        # Requests reset the peak, so this is the peak since the latest began
+        state["traced_peak_bytes"] = peak
+        sites: List[Dict] = []
+        if top > 0:
+            statistics = tracemalloc.take_snapshot().statistics("lineno")
+            sites = [
+                {"site": str(stat.traceback), "bytes": stat.size, "count": stat.count}
+                for stat in statistics[:top]
+            ]
+        state["top"] = sites
+    return state
@@ -1,37 +1,62 @@
+from functools import lru_cache
 from operator import itemgetter
-from typing import Dict, List
-
-from adh_sample_library_preview import (
-    MetadataItem,
-    SdsExtrapolationMode,
-    SdsInterpolationMode,
-    SdsStream,
-    SdsType,
-    SdsTypeCode,
-    SdsTypeProperty,
-    StreamReference,
-    TypeReference,
-)
-from adh_sample_library_preview.Asset import Asset, AssetType
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 
 from .client import NAMESPACE_ID, get_adh_client
 
+# The SDK is imported inside the functions that build ADH objects so that
+# importing this module (and app.main) does not load it.
+if TYPE_CHECKING:
+    from adh_sample_library_preview import MetadataItem, SdsTypeCode
+    from adh_sample_library_preview.Asset import Asset, AssetType
+
 ML_MODEL_TYPE_ID = "model_forecast_double"
 ML_MODEL_TYPE_NAME = "model_forecast_double"
 ML_MODEL_TYPE_DESCRIPTION = "Data Model for Forecast"
 ML_MODEL_ASSET_TYPE_QUERY = "AssetTypeId:Forecast"
 # DEFAULT_MODEL_TYPE = "LinearRegressionModel"
 ML_FORECAST_MODEL_ID = "Forecast"
+ML_FORECAST_STREAMS = ["Forecast", "Forecast Lower", "Forecast Upper"]
+
+
+def forecast_stream_id(id: str, forecast: str = "Forecast") -> str:
+    """Return the id of one of the forecast output streams of model `id`."""
+    return f"{id} {forecast}"
 
 
-def create_meta_dict(items: Dict, id: str, type: SdsTypeCode, value=None):
+@lru_cache(maxsize=256)
+def model_streams(id: str, version: str) -> Tuple[Tuple[str, str], ...]:
+    """Resolve the target and forecast streams of model `id`.
+
+    Returns ``(label, reference name)`` pairs, the targets labelled by their
+    stream id followed by the forecast streams labelled as in
+    `ML_FORECAST_STREAMS`. ``version`` is the modification time of the asset
+    and only keys the cache, so an updated asset is resolved again.
+    """
+    client = get_adh_client()
+    asset = client.Assets.getAssetById(NAMESPACE_ID, id)
+    metadata = {meta.Name or meta.Id: meta.Value for meta in asset.Metadata or []}
+    references = asset.StreamReferences or []
+    by_stream = {reference.StreamId: reference.Name for reference in references}
+    by_id = {reference.Id: reference.Name for reference in references}
+
+    targets = [t for t in (metadata.get("target") or "").split(",") if t]
+    streams = [(target, by_stream.get(target)) for target in targets]
+    streams += [(forecast, by_id.get(forecast)) for forecast in ML_FORECAST_STREAMS]
+    return tuple((label, name) for label, name in streams if name)
+
+
+def create_meta_dict(items: Dict, id: str, type: "SdsTypeCode", value=None):
     items[id] = create_meta(id, type, value)
 
 
-def create_meta(id: str, type: SdsTypeCode, value=None):
+def create_meta(id: str, type: "SdsTypeCode", value=None):
+    from adh_sample_library_preview import MetadataItem
+
     meta_data = MetadataItem(
         id=id,
         sds_type_code=type,
@@ -49,6 +74,8 @@ def list2string(values):
 
 
 def add_references(references: List, additions: List, prefix: str):
+    from adh_sample_library_preview import StreamReference
+
     client = get_adh_client()
     for i in range(len(additions)):
         stream = client.Streams.getStream(NAMESPACE_ID, additions[i])
@@ -58,8 +85,11 @@ def add_references(references: List, additions: List, prefix: str):
         references.append(stream_reference)
 
 
-def create_ml_forecast_type() -> AssetType:
+def create_ml_forecast_type() -> "AssetType":
     """Create or update ML model asset type."""
+    from adh_sample_library_preview import SdsTypeCode
+    from adh_sample_library_preview.Asset import AssetType
+
     client = get_adh_client()
     asset_type = AssetType(
         ML_FORECAST_MODEL_ID, "Forecast", "Base model for ML timeseries forecast"
@@ -85,6 +115,8 @@ def create_ml_forecast_type() -> AssetType:
 
 def create_ml_double_type():
     """Create ML forecasting type with predefined structure."""
+    from adh_sample_library_preview import SdsType, SdsTypeCode, SdsTypeProperty
+
     client = get_adh_client()
     time_type = SdsType("string", SdsTypeCode.DateTime)
     double_type = SdsType("doubleType", SdsTypeCode.Double)
@@ -104,6 +136,8 @@ def create_ml_double_type():
 
 def create_ml_type():
     """Create ML forecasting type with predefined structure."""
+    from adh_sample_library_preview import SdsType, SdsTypeCode, SdsTypeProperty
+
     client = get_adh_client()
     time_type = SdsType("string", SdsTypeCode.DateTime)
     double_type = SdsType("doubleType", SdsTypeCode.Double)
@@ -125,10 +159,34 @@ def create_ml_type():
     return client.Types.getOrCreateType(NAMESPACE_ID, ml_type)
 
 
-def create_ml_asset(
-    id: str,
-    name: str,
-    description: str,
+class ModelNotFound(KeyError):
+    pass
+
+
+class ModelConflict(Exception):
+    """The model was modified after the version the update is based on."""
+
+
+def asset_version(asset: "Asset") -> str:
+    modified = getattr(asset, "ModifiedDate", None)
+    return modified.isoformat() if modified else ""
+
+
+def dedupe_streams(*groups: List[str]):
+    """Remove streams that already appear in an earlier group, in place."""
+    unique = set()
+    for vars in groups:
+        tmp = []
+        for var in vars:
+            if var in unique:
+                continue
+            tmp.append(var)
+            unique.add(var)
+        vars.clear()
+        vars.extend(tmp)
+
+
+def model_metadata(
     model_type: str,
     interval: int,
     past: List[str],
@@ -139,21 +197,10 @@ def create_ml_asset(
     lead: int,
     update: str,
     retrain: str,
-):
-    client = get_adh_client()
-    # Ensure unique stream references
-    unique = set()
-    for vars in [target, future, past, status]:
-        tmp = []
-        for var in vars:
-            if var in unique:
-                continue
-            tmp.append(var)
-            unique.add(var)
-        vars.clear()
-        vars.extend(tmp)
+) -> List["MetadataItem"]:
+    from adh_sample_library_preview import SdsTypeCode
 
-    metadata = [
+    return [
         create_meta("model_type", SdsTypeCode.String, model_type),
         create_meta("interval", SdsTypeCode.Int64, interval),
         create_meta("past", SdsTypeCode.String, list2string(past)),
@@ -165,6 +212,38 @@ def create_ml_asset(
         create_meta("update", SdsTypeCode.String, update),
         create_meta("retrain", SdsTypeCode.String, retrain),
     ]
+
+
+def create_ml_asset(
+    id: str,
+    name: str,
+    description: str,
+    model_type: str,
+    interval: int,
+    past: List[str],
+    target: List[str],
+    future: List[str],
+    status: List[str],
+    lag: int,
+    lead: int,
+    update: str,
+    retrain: str,
+):
+    from adh_sample_library_preview import (
+        SdsExtrapolationMode,
+        SdsInterpolationMode,
+        SdsStream,
+        StreamReference,
+    )
+    from adh_sample_library_preview.Asset import Asset
+
+    client = get_adh_client()
+    # Ensure unique stream references
+    dedupe_streams(target, future, past, status)
+
+    metadata = model_metadata(
+        model_type, interval, past, target, future, status, lag, lead, update, retrain
+    )
     stream_references = []
 
     add_references(stream_references, target, f"target_{id}")
@@ -173,8 +252,8 @@ def create_ml_asset(
     add_references(stream_references, status, f"status_{id}")
 
     ml_double_type = create_ml_double_type()
-    for forecast in ["Forecast", "Forecast Lower", "Forecast Upper"]:
-        stream_id = f"{id} {forecast}"
+    for forecast in ML_FORECAST_STREAMS:
+        stream_id = forecast_stream_id(id, forecast)
         ml_stream = SdsStream(
             stream_id,
             ml_double_type.Id,
@@ -197,3 +276,114 @@ def create_ml_asset(
     asset.Metadata = metadata
     asset.AssetTypeId = asset_type.Id
     return client.Assets.createOrUpdateAsset(NAMESPACE_ID, asset)
+
+
+def update_ml_asset(
+    id: str,
+    name: str,
+    description: str,
+    model_type: str,
+    interval: int,
+    past: List[str],
+    target: List[str],
+    future: List[str],
+    status: List[str],
+    lag: int,
+    lead: int,
+    update: str,
+    retrain: str,
+    version: Optional[str] = None,
+) -> Tuple["Asset", Dict[str, List[str]]]:
+    """Apply only the changed fields of a model to its existing asset.
+
+    Only newly referenced streams are looked up and the asset is written
+    once, or not at all when nothing changed. If `version` is given it must
+    match the asset's current version, otherwise `ModelConflict` is raised.
+    Returns the asset and the changes, by kind.
+    """
+    client = get_adh_client()
+    try:
+        asset = client.Assets.getAssetById(NAMESPACE_ID, id)
+    except Exception as e:
+        if getattr(e, "StatusCode", None) == 404:
+            raise ModelNotFound(id)
+        raise
+    if version and version != asset_version(asset):
+        raise ModelConflict(
+            f"Model {id} was modified, expected version {version} "
+            f"but found {asset_version(asset)}"
+        )
+
+    references = asset.StreamReferences or []
+    forecasts = [r for r in references if r.Id in ML_FORECAST_STREAMS]
+    if len(forecasts) < len(ML_FORECAST_STREAMS):
+        # The forecast streams are missing, create everything that is needed
+        created = create_ml_asset(
+            id,
+            name,
+            description,
+            model_type,
+            interval,
+            past,
+            target,
+            future,
+            status,
+            lag,
+            lead,
+            update,
+            retrain,
+        )
+        model_streams.cache_clear()
+        return created, {"recreated": [id]}
+
+    dedupe_streams(target, future, past, status)
+    changes: Dict[str, List[str]] = {}
+    fields = [
+        field
+        for field, value in (("name", name), ("description", description))
+        if (getattr(asset, field.capitalize()) or "") != value
+    ]
+    if fields:
+        changes["fields"] = fields
+
+    metadata = {meta.Name or meta.Id: meta for meta in asset.Metadata or []}
+    wanted = model_metadata(
+        model_type, interval, past, target, future, status, lag, lead, update, retrain
+    )
+    changed = [
+        item.Id
+        for item in wanted
+        if item.Id not in metadata or str(metadata[item.Id].Value) != str(item.Value)
+    ]
+    if changed:
+        changes["metadata"] = changed
+
+    inputs = {r.StreamId: r for r in references if r.Id not in ML_FORECAST_STREAMS}
+    streams = target + future + past + status
+    added = [stream for stream in streams if stream not in inputs]
+    removed = [stream for stream in inputs if stream not in streams]
+    if added:
+        changes["added"] = added
+    if removed:
+        changes["removed"] = removed
+    if not changes:
+        return asset, changes
+
+    new_references: List = []
+    add_references(new_references, added, f"input_{id}")
+    new_references = {r.StreamId: r for r in new_references}
+    asset.StreamReferences = [
+        inputs.get(stream) or new_references[stream] for stream in streams
+    ] + forecasts
+    for item in wanted:
+        if item.Id in metadata:
+            metadata[item.Id].Value = item.Value
+        else:
+            metadata[item.Id] = item
+    asset.Metadata = list(metadata.values())
+    asset.Name = name
+    asset.Description = description
+    asset = client.Assets.createOrUpdateAsset(NAMESPACE_ID, asset)
+    # Resolved streams of the old version must not be served any more
+    model_streams.cache_clear()
+    return asset, changes
@@ -0,0 +1,352 @@
+"""Registry of trained forecast model parameters.
+
+Training a model fits its linear forecaster on the lag/lead features of a
+history range and stores the coefficients, the residual spread of every
+output and the feature layout in one ``.npz`` file per model under
+``MODEL_REGISTRY_DIR`` (by default ``data/model_registry`` in the backend
+directory, so that trained models survive restarts). Predictors are loaded from these files on first use
+and kept in an LRU bounded to ``MODEL_CACHE_BYTES`` of parameters; a file
+written by a later training (in any process) replaces the cached copy.
+
+The file also keeps the sufficient statistics of the fit and the last
+forecast origin it covers, so an update folds in only the samples that
+completed since, without fetching the whole history again. An update stops
+at the last event stored in every input stream, since ADH extrapolates
+interpolated reads beyond it, and its ranges bypass the feature cache as
+they are never read again. A full training replaces the statistics.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .client import NAMESPACE_ID, get_adh_client
+from .features import build_features
+from .regression import accumulate, check_model_type, fit_statistics, predict
+from .series import format_timestamps, parse_timestamps
+
+MODEL_REGISTRY_DIR: str = os.getenv(
+    "MODEL_REGISTRY_DIR",
+    os.path.join(os.path.dirname(__file__), "..", "data", "model_registry"),
+)
+# Parameter bytes kept in memory across all cached predictors
+MODEL_CACHE_BYTES: int = int(os.getenv("MODEL_CACHE_BYTES", str(64 * 2**20)))
+# Width of the Forecast Lower/Upper band in residual standard deviations
+FORECAST_BAND: float = float(os.getenv("FORECAST_BAND", "1.96"))
+# Per-sample weight decay of older samples in updates, 1 keeps all equally
+MODEL_FORGETTING: float = float(os.getenv("MODEL_FORGETTING", "1.0"))
+
+# Fields of the model that fix the layout of the statistics
+_LAYOUT = ("target", "past", "future", "lag", "lead", "interval")
+
+
+class ModelNotTrained(KeyError):
+    pass
+
+
+class Predictor:
+    """A trained linear forecaster and the layout of its inputs."""
+
+    def __init__(
+        self,
+        coef: np.ndarray,
+        sigma: np.ndarray,
+        meta: Dict,
+        stats: Optional[Dict[str, np.ndarray]] = None,
+    ):
+        self.coef = coef
+        self.sigma = sigma
+        self.meta = meta
+        self.stats = stats
+        self.history_streams: List[str] = meta["target"] + meta["past"]
+        self.lag: int = meta["lag"]
+        self.lead: int = meta["lead"]
+
+    @property
+    def nbytes(self) -> int:
+        stats = sum(v.nbytes for v in (self.stats or {}).values())
+        return self.coef.nbytes + self.sigma.nbytes + stats
+
+    def design_matrix(self, inputs: List[Dict]) -> np.ndarray:
+        """Flatten inputs in the column order of `FeatureMatrix.design_matrix`.
+
+        Every input holds the last `lag` values of each target and past
+        stream under "history" and the next `lead` values of each future
+        stream under "future", oldest first.
+        """
+        rows = []
+        for i, item in enumerate(inputs):
+            row = []
+            for group, streams, length in (
+                ("history", self.history_streams, self.lag),
+                ("future", self.meta["future"], self.lead),
+            ):
+                values = item.get(group) or {}
+                for stream in streams:
+                    window = values.get(stream)
+                    if window is None or len(window) != length:
+                        raise ValueError(
+                            f"Input {i} needs {length} {group} values of {stream}"
+                        )
+                    row.extend(window)
+            rows.append(row)
+        return np.asarray(rows, dtype=np.float64).reshape(len(inputs), -1)
+
+    def predict(self, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Return forecast, lower and upper bands of shape (batch, target, lead)."""
+        shape = (len(X), len(self.meta["target"]), self.lead)
+        forecast = predict(self.coef, X).reshape(shape)
+        band = (FORECAST_BAND * self.sigma).reshape(shape[1:])
+        return forecast, forecast - band, forecast + band
+
+
+def _path(model_id: str, directory: str) -> str:
+    # Model ids may contain characters that are not valid in file names
+    return os.path.join(directory, f"{model_id.encode().hex()}.npz")
+
+
+def save_predictor(
+    model_id: str, predictor: Predictor, directory: Optional[str] = None
+):
+    directory = directory or MODEL_REGISTRY_DIR
+    os.makedirs(directory, exist_ok=True)
+    path = _path(model_id, directory)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        np.savez(
+            f,
+            coef=predictor.coef,
+            sigma=predictor.sigma,
+            meta=np.array(json.dumps(predictor.meta)),
+            **{f"stats_{k}": v for k, v in (predictor.stats or {}).items()},
+        )
+    os.replace(tmp, path)
+
+
+def load_predictor(model_id: str, directory: Optional[str] = None) -> Predictor:
+    path = _path(model_id, directory or MODEL_REGISTRY_DIR)
+    try:
+        with np.load(path) as data:
+            stats = {k[6:]: data[k] for k in data.files if k.startswith("stats_")}
+            return Predictor(
+                data["coef"],
+                data["sigma"],
+                json.loads(str(data["meta"])),
+                stats or None,
+            )
+    except FileNotFoundError:
+        raise ModelNotTrained(model_id)
+
+
+class ModelRegistry:
+    """Lazily loaded LRU of predictors, bounded by their parameter size."""
+
+    def __init__(
+        self, directory: Optional[str] = None, max_bytes: int = MODEL_CACHE_BYTES
+    ):
+        self.directory = directory or MODEL_REGISTRY_DIR
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._cache: "OrderedDict[str, Tuple[int, Predictor]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Serializes read-modify-write of model files
+        self._write_lock = threading.Lock()
+
+    def get(self, model_id: str) -> Predictor:
+        """Return the predictor of `model_id`, raising ModelNotTrained if none."""
+        try:
+            version = os.stat(_path(model_id, self.directory)).st_mtime_ns
+        except FileNotFoundError:
+            self.evict(model_id)
+            raise ModelNotTrained(model_id)
+        with self._lock:
+            entry = self._cache.get(model_id)
+            if entry is not None and entry[0] == version:
+                self._cache.move_to_end(model_id)
+                return entry[1]
+
+        predictor = load_predictor(model_id, self.directory)
+        with self._lock:
+            self._evict(model_id)
+            self._cache[model_id] = (version, predictor)
+            self.nbytes += predictor.nbytes
+            while self.nbytes > self.max_bytes and len(self._cache) > 1:
+                self._evict(next(iter(self._cache)))
+        return predictor
+
+    def _evict(self, model_id: str):
+        # Must be called with the lock held
+        entry = self._cache.pop(model_id, None)
+        if entry is not None:
+            self.nbytes -= entry[1].nbytes
+
+    def evict(self, model_id: str):
+        with self._lock:
+            self._evict(model_id)
+
+    def remove(self, model_id: str):
+        """Delete the trained parameters of `model_id`."""
+        self.evict(model_id)
+        try:
+            os.remove(_path(model_id, self.directory))
+        except FileNotFoundError:
+            pass
+
+    def trained(self, min_age: float = 0.0) -> List[str]:
+        """Return the ids of the models trained at least `min_age` seconds ago."""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        now = time.time()
+        model_ids = []
+        for name in names:
+            if not name.endswith(".npz"):
+                continue
+            try:
+                model_id = bytes.fromhex(name[:-4]).decode()
+                mtime = os.stat(os.path.join(self.directory, name)).st_mtime
+            except (ValueError, OSError):
+                continue
+            if now - mtime >= min_age:
+                model_ids.append(model_id)
+        return sorted(model_ids)
+
+    def _last_event(self, model: Dict, client) -> Optional[np.datetime64]:
+        """Return the time of the last event stored in every stream of `model`."""
+        client = client or get_adh_client()
+        last = None
+        for stream_id in model["target"] + model["past"] + model["future"]:
+            event = client.Streams.getLastValue(NAMESPACE_ID, stream_id)
+            if not event:
+                return None
+            timestamp = parse_timestamps([event["Timestamp"]])[0]
+            last = timestamp if last is None else min(last, timestamp)
+        return last
+
+    def _features(self, model: Dict, start: str, end: str, client, cache: bool = True):
+        return build_features(
+            model["id"],
+            model["target"],
+            model["past"],
+            model["future"],
+            int(model["interval"]),
+            int(model["lag"]),
+            int(model["lead"]),
+            start,
+            end,
+            client,
+            cache=cache,
+        )
+
+    def _store(self, model_id: str, stats: Dict[str, np.ndarray], meta: Dict) -> Dict:
+        coef, sigma = fit_statistics(stats)
+        save_predictor(model_id, Predictor(coef, sigma, meta, stats), self.directory)
+        self.evict(model_id)
+        # sigma is normalized by the degrees of freedom, the RMSE by the count
+        dof = max(float(stats["count"]) - len(coef), 1.0)
+        rmse = np.sqrt((sigma**2).mean() * dof / float(stats["count"]))
+        return {**meta, "rmse": float(rmse)}
+
+    def train(
+        self,
+        model: Dict,
+        start: str,
+        end: str,
+        client=None,
+        forgetting: float = MODEL_FORGETTING,
+    ) -> Dict:
+        """Fit a model, as listed by /connect/models, on [start, end] and store it."""
+        check_model_type(model["model_type"])
+        features = self._features(model, start, end, client)
+        if len(features) == 0:
+            raise ValueError("No complete training samples")
+        X, y = features.design_matrix()
+        stats = accumulate(None, X, y, forgetting)
+        meta = {
+            "target": list(model["target"]),
+            "past": list(model["past"]),
+            "future": list(model["future"]),
+            "lag": features.lag,
+            "lead": features.lead,
+            "interval": int(model["interval"]),
+            "model_type": model["model_type"],
+            "samples": len(X),
+            "last_origin": format_timestamps(features.origins[-1:])[0],
+            "forgetting": forgetting,
+            "trained": time.time(),
+            "updated": None,
+        }
+        with self._write_lock:
+            return self._store(model["id"], stats, meta)
+
+    def update(self, model: Dict, end: str, client=None) -> Dict:
+        """Fold the samples completed between the last update and `end` into a model.
+
+        Only the windows of forecast origins after the last one covered are
+        fetched, so an update costs O(features²) per new sample however long
+        the trained history is.
+        """
+        check_model_type(model["model_type"])
+        with self._write_lock:
+            predictor = load_predictor(model["id"], self.directory)
+            meta = dict(predictor.meta)
+            if predictor.stats is None or "last_origin" not in meta:
+                raise ValueError(f"Model {model['id']} has no stored statistics")
+            layout = {
+                "target": list(model["target"]),
+                "past": list(model["past"]),
+                "future": list(model["future"]),
+                "lag": max(1, int(model["lag"])),
+                "lead": max(1, int(model["lead"])),
+                "interval": int(model["interval"]),
+            }
+            if any(meta[key] != layout[key] for key in _LAYOUT):
+                raise ValueError(
+                    f"Inputs of model {model['id']} changed since training, retrain it"
+                )
+
+            step = np.timedelta64(int(meta["interval"] * 1000), "ms")
+            last_origin = parse_timestamps([meta["last_origin"]])[0]
+            # Values after the last stored event are extrapolated, not observed
+            last_event = self._last_event(model, client)
+            if last_event is None:
+                return {**meta, "added": 0}
+            end_time = min(parse_timestamps([end])[0], last_event)
+            if end_time <= last_origin + meta["lead"] * step:
+                return {**meta, "added": 0}
+            # The first new origin needs lag - 1 samples of history before it
+            first = last_origin + step - (meta["lag"] - 1) * step
+            features = self._features(
+                model,
+                format_timestamps(np.array([first]))[0],
+                format_timestamps(np.array([end_time]))[0],
+                client,
+                cache=False,
+            )
+            if len(features) == 0:
+                return {**meta, "added": 0}
+            X, y = features.design_matrix()
+            stats = accumulate(predictor.stats, X, y, meta["forgetting"])
+            meta["samples"] += len(X)
+            meta["last_origin"] = format_timestamps(features.origins[-1:])[0]
+            meta["updated"] = time.time()
+            return {**self._store(model["id"], stats, meta), "added": len(X)}
+
+
+# Global registry instance
+_model_registry: Optional[ModelRegistry] = None
+
+
+def get_model_registry() -> ModelRegistry:
+    """Get or create the model registry singleton."""
+    global _model_registry
+
+    if _model_registry is None:
+        _model_registry = ModelRegistry()
+    return _model_registry
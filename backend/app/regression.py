@@ -0,0 +1,108 @@
+"""Ridge-regularized linear forecasters fitted from Gram matrices.
+
+A model maps a design matrix row (lagged history and known future inputs,
+see `FeatureMatrix.design_matrix`) to all target values of the lead window
+at once. Fitting only needs ``XᵀX`` and ``Xᵀy``, which lets many training
+windows be solved in one batched call from differences of cumulative sums.
+
+The same sums, together with ``yᵀy`` and the sample count, are sufficient
+statistics of a fit: new samples are folded into them without revisiting
+earlier ones, optionally discounting older samples exponentially.
+"""
+
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+# Model types of forecast assets that can be fitted here
+MODEL_TYPES = ("LINEAR",)
+# Ridge penalty relative to the mean diagonal of the Gram matrix
+RIDGE: float = 1e-6
+
+
+def check_model_type(model_type: str):
+    if (model_type or "").upper() not in MODEL_TYPES:
+        raise ValueError(
+            f"Unsupported model type {model_type!r}, expected one of {MODEL_TYPES}"
+        )
+
+
+def add_intercept(X: np.ndarray) -> np.ndarray:
+    return np.concatenate([X, np.ones((len(X), 1))], axis=1)
+
+
+def gram(X: np.ndarray, y: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Return ``XᵀX`` and ``Xᵀy`` of an intercept-extended design matrix."""
+    return X.T @ X, X.T @ y
+
+
+def solve(xtx: np.ndarray, xty: np.ndarray, ridge: float = RIDGE) -> np.ndarray:
+    """Solve the ridge normal equations, batched over leading dimensions.
+
+    `xtx` has shape (..., p, p) and `xty` (..., p, q); the coefficients have
+    the shape of `xty`.
+    """
+    p = xtx.shape[-1]
+    scale = np.trace(xtx, axis1=-2, axis2=-1)[..., None, None] / p
+    penalty = ridge * np.maximum(scale, 1e-12) * np.eye(p)
+    # The intercept is not penalized
+    penalty[..., -1, -1] = 0.0
+    return np.linalg.solve(xtx + penalty, xty)
+
+
+def fit(X: np.ndarray, y: np.ndarray, ridge: float = RIDGE) -> np.ndarray:
+    """Fit coefficients of shape (features + 1, targets) on rows without NaN."""
+    keep = ~(np.isnan(X).any(axis=1) | np.isnan(y).any(axis=1))
+    if not keep.any():
+        raise ValueError("No complete training samples")
+    return solve(*gram(add_intercept(X[keep]), y[keep]), ridge)
+
+
+def predict(coef: np.ndarray, X: np.ndarray) -> np.ndarray:
+    return add_intercept(X) @ coef
+
+
+def accumulate(
+    stats: Optional[Dict[str, np.ndarray]],
+    X: np.ndarray,
+    y: np.ndarray,
+    forgetting: float = 1.0,
+) -> Dict[str, np.ndarray]:
+    """Fold the rows of X and y without NaN into the sufficient statistics.
+
+    With `forgetting` below 1 every sample is weighted by `forgetting` to the
+    power of the number of samples that came after it, so the statistics
+    follow recent behaviour. `stats` of None starts from no samples.
+    """
+    keep = ~(np.isnan(X).any(axis=1) | np.isnan(y).any(axis=1))
+    X, y = add_intercept(X[keep]), y[keep]
+    n = len(X)
+    weights = forgetting ** np.arange(n - 1, -1, -1, dtype=np.float64)
+    Xw = X * weights[:, None]
+    update = {
+        "xtx": Xw.T @ X,
+        "xty": Xw.T @ y,
+        "yty": (weights[:, None] * y * y).sum(axis=0),
+        "count": np.float64(weights.sum()),
+    }
+    if stats is None:
+        return update
+    decay = forgetting**n
+    return {key: decay * stats[key] + update[key] for key in update}
+
+
+def fit_statistics(
+    stats: Dict[str, np.ndarray], ridge: float = RIDGE
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Return the coefficients and residual standard deviation of every target."""
+    if stats["count"] <= 0:
+        raise ValueError("No complete training samples")
+    coef = solve(stats["xtx"], stats["xty"], ridge)
+    # Residual sum of squares, ||y - X b||² expanded in the statistics
+    rss = (
+        stats["yty"]
+        - 2 * (coef * stats["xty"]).sum(axis=0)
+        + (coef * (stats["xtx"] @ coef)).sum(axis=0)
+    )
+    dof = max(float(stats["count"]) - len(coef), 1.0)
+    return coef, np.sqrt(np.maximum(rss, 0.0) / dof)
@@ -0,0 +1,328 @@
+"""Multi-resolution rollups of frequently viewed streams.
+
+For every stream that has been charted at least ``ROLLUP_MIN_VIEWS`` times,
+a background task keeps per-bucket count, sum, sum of squares, minimum and
+maximum at a few fixed resolutions (``ROLLUP_RESOLUTIONS`` seconds). New raw
+events are folded in incrementally from the newest ingested event, so events
+that reach ADH late, but after it, are picked up by the next refresh. Pages
+are read and folded into staging tiers without holding the lock queries
+take; only the final merge does. A chart
+query over any range is answered from the coarsest tier that is still at
+least as fine as the requested interval width, so its cost depends on the
+number of points drawn rather than on the width of the range.
+
+Every tier keeps at most ``ROLLUP_TIER_POINTS`` of its newest buckets, so
+fine tiers cover recent ranges and coarse tiers reach back the whole
+``ROLLUP_HISTORY``. A range older than a tier reaches is answered from
+ADH instead.
+
+Views are counted with exponential decay (half-life
+``ROLLUP_VIEW_HALF_LIFE``) for at most ``ROLLUP_MAX_TRACKED`` streams. Once
+``ROLLUP_MAX_STREAMS`` streams have rollups, a newly hot stream replaces
+the rollup of the least viewed one.
+
+Tier buckets are assigned to the requested interval containing their start,
+so interval boundaries are accurate to one tier resolution, and the newest
+bucket lags ADH by up to ``ROLLUP_REFRESH`` seconds.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .client import NAMESPACE_ID, get_adh_client
+from .series import events_to_arrays, format_timestamps, iter_window_pages
+from .summaries import aggregate_bins, get_summaries, interval_edges, to_columns
+from .upstream import background
+
+ROLLUP_RESOLUTIONS: List[int] = sorted(
+    int(seconds)
+    for seconds in os.getenv("ROLLUP_RESOLUTIONS", "60,900,3600,86400").split(",")
+)
+# Chart requests after which a stream gets rollups
+ROLLUP_MIN_VIEWS: int = int(os.getenv("ROLLUP_MIN_VIEWS", "3"))
+ROLLUP_MAX_STREAMS: int = int(os.getenv("ROLLUP_MAX_STREAMS", "100"))
+# Seconds after which a view counts half
+ROLLUP_VIEW_HALF_LIFE: float = float(os.getenv("ROLLUP_VIEW_HALF_LIFE", "3600"))
+# Streams whose view counts are kept
+ROLLUP_MAX_TRACKED: int = int(os.getenv("ROLLUP_MAX_TRACKED", "10000"))
+# Seconds of history backfilled when a stream gets rollups, enough for a
+# one-year chart
+ROLLUP_HISTORY: int = int(os.getenv("ROLLUP_HISTORY", str(366 * 86400)))
+# Newest buckets kept per tier
+ROLLUP_TIER_POINTS: int = int(os.getenv("ROLLUP_TIER_POINTS", "10000"))
+# Seconds between incremental updates
+ROLLUP_REFRESH: float = float(os.getenv("ROLLUP_REFRESH", "60"))
+ROLLUP_PAGE_SIZE: int = int(os.getenv("ROLLUP_PAGE_SIZE", "100000"))
+
+_FIELDS = ("count", "total", "squares", "minimum", "maximum")
+
+
+class Tier:
+    """Per-bucket partial aggregates at one resolution, sorted by bucket."""
+
+    def __init__(self, resolution: int):
+        self.resolution_ms = resolution * 1000
+        # Start of the oldest bucket kept after older ones were dropped
+        self.origin_ms: Optional[int] = None
+        self.keys = np.empty(0, dtype=np.int64)
+        self.count = np.empty(0)
+        self.total = np.empty(0)
+        self.squares = np.empty(0)
+        self.minimum = np.empty(0)
+        self.maximum = np.empty(0)
+
+    def add(self, timestamps_ms: np.ndarray, values: np.ndarray):
+        """Fold raw events into their buckets."""
+        keys, inverse = np.unique(
+            timestamps_ms // self.resolution_ms, return_inverse=True
+        )
+        minimum = np.full(len(keys), np.inf)
+        maximum = np.full(len(keys), -np.inf)
+        np.minimum.at(minimum, inverse, values)
+        np.maximum.at(maximum, inverse, values)
+        self._merge(
+            keys,
+            {
+                "count": np.bincount(inverse, minlength=len(keys)).astype(np.float64),
+                "total": np.bincount(inverse, weights=values, minlength=len(keys)),
+                "squares": np.bincount(
+                    inverse, weights=values * values, minlength=len(keys)
+                ),
+                "minimum": minimum,
+                "maximum": maximum,
+            },
+        )
+
+    def _merge(self, keys: np.ndarray, partial: Dict[str, np.ndarray]):
+        merged = np.union1d(self.keys, keys)
+        old = np.searchsorted(merged, self.keys)
+        new = np.searchsorted(merged, keys)
+        for field in _FIELDS:
+            fill = 0.0 if field in ("count", "total", "squares") else np.nan
+            current = np.full(len(merged), fill)
+            current[old] = getattr(self, field)
+            incoming = np.full(len(merged), fill)
+            incoming[new] = partial[field]
+            if field == "minimum":
+                combined = np.fmin(current, incoming)
+            elif field == "maximum":
+                combined = np.fmax(current, incoming)
+            else:
+                combined = current + incoming
+            setattr(self, field, combined)
+        self.keys = merged
+
+    def trim(self, points: int):
+        """Drop all but the newest `points` buckets."""
+        cut = len(self.keys) - points
+        if cut <= 0:
+            return
+        self.origin_ms = int(self.keys[cut]) * self.resolution_ms
+        for field in _FIELDS:
+            setattr(self, field, getattr(self, field)[cut:])
+        self.keys = self.keys[cut:]
+
+    def query(self, edges_ms: np.ndarray) -> Dict[str, np.ndarray]:
+        """Aggregate buckets into the intervals delimited by `edges_ms`."""
+        bins = (
+            np.searchsorted(edges_ms, self.keys * self.resolution_ms, side="right") - 1
+        )
+        return aggregate_bins(
+            bins,
+            len(edges_ms) - 1,
+            self.count,
+            self.total,
+            self.squares,
+            self.minimum,
+            self.maximum,
+        )
+
+
+class StreamRollup:
+    """All tiers of one stream and the timestamp they are complete up to."""
+
+    def __init__(self, stream_id: str, resolutions: List[int] = ROLLUP_RESOLUTIONS):
+        self.stream_id = stream_id
+        self.tiers = [Tier(resolution) for resolution in sorted(resolutions)]
+        self.origin_ms: Optional[int] = None
+        # Newest ingested event, and the time up to which ADH has been read
+        self.watermark_ms: Optional[int] = None
+        self.synced_ms: Optional[int] = None
+        # Guards the tiers and timestamps, and serializes refreshes
+        self.lock = threading.Lock()
+        self.refresh_lock = threading.Lock()
+
+    def add(self, timestamps: np.ndarray, values: np.ndarray):
+        timestamps_ms = timestamps.astype("datetime64[ms]").astype(np.int64)
+        if self.watermark_ms is not None:
+            fresh = timestamps_ms > self.watermark_ms
+            timestamps_ms, values = timestamps_ms[fresh], values[fresh]
+        valid = ~np.isnan(values)
+        for tier in self.tiers:
+            tier.add(timestamps_ms[valid], values[valid])
+        if len(timestamps_ms):
+            self.watermark_ms = max(self.watermark_ms or 0, int(timestamps_ms.max()))
+
+    def merge(self, staged: "StreamRollup", points: Optional[int] = None):
+        """Fold the tiers of a staging rollup with the same resolutions into this one."""
+        points = ROLLUP_TIER_POINTS if points is None else points
+        for tier, partial in zip(self.tiers, staged.tiers):
+            tier._merge(
+                partial.keys, {field: getattr(partial, field) for field in _FIELDS}
+            )
+            tier.trim(points)
+        if staged.watermark_ms is not None:
+            self.watermark_ms = max(self.watermark_ms or 0, staged.watermark_ms)
+
+    def tier_for(self, width_ms: float) -> Optional[Tier]:
+        """Return the coarsest tier at least as fine as `width_ms`."""
+        candidates = [tier for tier in self.tiers if tier.resolution_ms <= width_ms]
+        return candidates[-1] if candidates else None
+
+    def covers(self, start_ms: int, end_ms: int, tier: Tier) -> bool:
+        if self.synced_ms is None:
+            return False
+        return (
+            start_ms >= max(self.origin_ms, tier.origin_ms or self.origin_ms)
+            and end_ms <= self.synced_ms + ROLLUP_REFRESH * 1000
+        )
+
+
+class RollupManager:
+    """Track chart views, maintain rollups and answer range queries from them."""
+
+    def __init__(self, client=None):
+        self._client = client
+        # Decayed view count of every tracked stream and when it was computed
+        self.views: Dict[str, Tuple[float, float]] = {}
+        self.rollups: Dict[str, StreamRollup] = {}
+        self._lock = threading.Lock()
+
+    def _views(self, stream_id: str, now: float) -> float:
+        # Must be called with the lock held
+        count, at = self.views.get(stream_id, (0.0, now))
+        return count * 0.5 ** ((now - at) / ROLLUP_VIEW_HALF_LIFE)
+
+    def _forget_views(self, now: float):
+        # Must be called with the lock held. Keeps the most viewed half.
+        ranked = sorted(self.views, key=lambda s: self._views(s, now), reverse=True)
+        for stream_id in ranked[ROLLUP_MAX_TRACKED // 2 :]:
+            if stream_id not in self.rollups:
+                del self.views[stream_id]
+
+    def record_view(self, stream_id: str, now: Optional[float] = None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            views = self._views(stream_id, now) + 1
+            self.views[stream_id] = (views, now)
+            # Views in quick succession count as whole views
+            if stream_id not in self.rollups and round(views) >= ROLLUP_MIN_VIEWS:
+                if len(self.rollups) >= ROLLUP_MAX_STREAMS:
+                    coldest = min(self.rollups, key=lambda s: self._views(s, now))
+                    if self._views(coldest, now) >= views:
+                        return
+                    del self.rollups[coldest]
+                self.rollups[stream_id] = StreamRollup(stream_id)
+            if len(self.views) > ROLLUP_MAX_TRACKED:
+                self._forget_views(now)
+
+    def refresh(self, stream_id: str, now: Optional[np.datetime64] = None):
+        """Fold events since the newest ingested one (or the history horizon) into a rollup."""
+        rollup = self.rollups.get(stream_id)
+        if rollup is None:
+            # Replaced by a more viewed stream
+            return
+        client = self._client or get_adh_client()
+        now = now if now is not None else np.datetime64("now", "ms")
+        with rollup.refresh_lock:
+            with rollup.lock:
+                origin_ms = rollup.origin_ms
+                if rollup.synced_ms is None:
+                    start = now - np.timedelta64(ROLLUP_HISTORY, "s")
+                    origin_ms = int(start.astype(np.int64))
+                else:
+                    start = np.datetime64(rollup.watermark_ms or origin_ms, "ms")
+                staged = StreamRollup(
+                    stream_id, [tier.resolution_ms // 1000 for tier in rollup.tiers]
+                )
+                # Events up to the watermark are already ingested
+                staged.watermark_ms = rollup.watermark_ms
+            window = format_timestamps(np.array([start, now], dtype="datetime64[ms]"))
+            for events in iter_window_pages(
+                client, NAMESPACE_ID, stream_id, window[0], window[1], ROLLUP_PAGE_SIZE
+            ):
+                staged.add(*events_to_arrays(events))
+            with rollup.lock:
+                rollup.merge(staged)
+                rollup.origin_ms = origin_ms
+                rollup.synced_ms = int(now.astype(np.int64))
+
+    def refresh_all(self):
+        for stream_id in list(self.rollups):
+            try:
+                self.refresh(stream_id)
+            except Exception as e:
+                logging.warning(f"Failed to refresh rollups of {stream_id}: {str(e)}")
+
+    async def run(self, interval: float = ROLLUP_REFRESH):
+        with background():
+            while True:
+                await asyncio.to_thread(self.refresh_all)
+                await asyncio.sleep(interval)
+
+    def _query_rollup(self, stream_id: str, edges: np.ndarray) -> Optional[Dict]:
+        rollup = self.rollups.get(stream_id)
+        if rollup is None:
+            return None
+        edges_ms = edges.astype(np.int64)
+        with rollup.lock:
+            tier = rollup.tier_for((edges_ms[-1] - edges_ms[0]) / (len(edges_ms) - 1))
+            if tier is None or not rollup.covers(
+                int(edges_ms[0]), int(edges_ms[-1]), tier
+            ):
+                return None
+            return tier.query(edges_ms)
+
+    def query(
+        self, stream_ids: List[str], start: str, end: str, intervals: int
+    ) -> Dict:
+        """Return interval statistics like `get_summaries`, from rollups where possible."""
+        edges = interval_edges(start, end, intervals)
+        stats, sources, missing = [], [], []
+        for stream_id in stream_ids:
+            self.record_view(stream_id)
+            stream_stats = self._query_rollup(stream_id, edges)
+            stats.append(stream_stats)
+            sources.append("rollup")
+            if stream_stats is None:
+                missing.append(stream_id)
+
+        if missing:
+            fetched = get_summaries(missing, start, end, intervals, client=self._client)
+            for i, stream_id in enumerate(stream_ids):
+                if stats[i] is None:
+                    j = missing.index(stream_id)
+                    stats[i] = {
+                        name: np.array(fetched[name][j], dtype=np.float64)
+                        for name in ("min", "max", "mean", "stddev", "count")
+                    }
+                    sources[i] = fetched["sources"][j]
+        return {**to_columns(stream_ids, edges, stats), "sources": sources}
+
+
+# Global rollup manager
+_rollup_manager: Optional[RollupManager] = None
+
+
+def get_rollup_manager() -> RollupManager:
+    """Get or create the rollup manager singleton."""
+    global _rollup_manager
+    if _rollup_manager is None:
+        _rollup_manager = RollupManager()
+    return _rollup_manager
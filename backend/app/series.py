@@ -0,0 +1,141 @@
+"""Reading SDS event lists and converting them into NumPy arrays."""
+
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+TIMESTAMP_FIELDS = ("Timestamp", "timestamp")
+FILL_POLICIES = ("none", "previous", "linear", "zero")
+
+
+def value_field(event: Dict) -> Optional[str]:
+    """Return the name of the value property of an SDS event."""
+    if "Value" in event:
+        return "Value"
+    if "value" in event:
+        return "value"
+    for key, value in event.items():
+        if key not in TIMESTAMP_FIELDS and (
+            value is None or isinstance(value, (int, float))
+        ):
+            return key
+    return None
+
+
+def parse_timestamps(timestamps) -> np.ndarray:
+    """Parse ISO 8601 UTC timestamps into a datetime64[ms] array."""
+    return np.array([str(t).rstrip("Z") for t in timestamps], dtype="datetime64[ms]")
+
+
+def format_timestamps(timestamps: np.ndarray) -> List[str]:
+    """Format a datetime64 array as ISO 8601 UTC strings."""
+    return [f"{t}Z" for t in np.datetime_as_string(timestamps, unit="ms")]
+
+
+def events_to_arrays(events: List[Dict]) -> Tuple[np.ndarray, np.ndarray]:
+    """Convert SDS events into a datetime64[ms] index and a float64 value array.
+
+    Missing or non-numeric values become NaN.
+    """
+    if not events:
+        return np.empty(0, dtype="datetime64[ms]"), np.empty(0, dtype=np.float64)
+
+    time_key = "Timestamp" if "Timestamp" in events[0] else "timestamp"
+    field = value_field(events[0])
+    timestamps = parse_timestamps([event.get(time_key) for event in events])
+    values = np.fromiter(
+        (_to_float(event.get(field)) for event in events),
+        dtype=np.float64,
+        count=len(events),
+    )
+    return timestamps, values
+
+
+def fill_gaps(matrix: np.ndarray, fill: str = "none") -> np.ndarray:
+    """Fill NaN gaps along the time axis (axis 1) of a (streams, time) matrix.
+
+    "previous" carries the last value forward, "linear" interpolates between
+    neighbouring values (holding the edges) and "zero" replaces gaps by 0.
+    """
+    if fill not in FILL_POLICIES:
+        raise ValueError(f"Unknown fill policy: {fill}")
+    missing = np.isnan(matrix)
+    if fill == "none" or not missing.any():
+        return matrix
+    if fill == "zero":
+        return np.where(missing, 0.0, matrix)
+
+    positions = np.arange(matrix.shape[1])
+    if fill == "previous":
+        last = np.where(missing, 0, positions)
+        np.maximum.accumulate(last, axis=1, out=last)
+        filled = np.take_along_axis(matrix, last, axis=1)
+        # Leading gaps have no previous value
+        filled[np.maximum.accumulate(~missing, axis=1) == 0] = np.nan
+        return filled
+
+    filled = matrix.copy()
+    for row, row_missing in zip(filled, missing):
+        if row_missing.all():
+            continue
+        row[row_missing] = np.interp(
+            positions[row_missing], positions[~row_missing], row[~row_missing]
+        )
+    return filled
+
+
+def align_results(results: Dict[str, List[Dict]], fill: str = "none") -> Dict:
+    """Join per-stream event lists into one time index and a value matrix.
+
+    Returns ``{"timestamps": [...], "streams": [...], "values": [[...], ...]}``
+    where ``values[i][j]`` is the value of ``streams[i]`` at
+    ``timestamps[j]``. Gaps left after filling are null.
+    """
+    streams = list(results)
+    arrays = [events_to_arrays(results[stream] or []) for stream in streams]
+    if arrays:
+        index = np.unique(np.concatenate([timestamps for timestamps, _ in arrays]))
+    else:
+        index = np.empty(0, dtype="datetime64[ms]")
+
+    matrix = np.full((len(streams), len(index)), np.nan)
+    for row, (timestamps, values) in enumerate(arrays):
+        matrix[row, np.searchsorted(index, timestamps)] = values
+    matrix = fill_gaps(matrix, fill)
+
+    values = matrix.astype(object)
+    values[np.isnan(matrix)] = None
+    return {
+        "timestamps": format_timestamps(index),
+        "streams": streams,
+        "values": values.tolist(),
+    }
+
+
+def iter_window_pages(
+    client, namespace_id: str, stream_id: str, start: str, end: str, page_size: int
+) -> Iterator[List[Dict]]:
+    """Yield the raw events of a stream window page by page."""
+    token = ""
+    while True:
+        page = client.Streams.getWindowValuesPaged(
+            namespace_id,
+            stream_id=stream_id,
+            start=start,
+            end=end,
+            count=page_size,
+            continuation_token=token,
+            value_class=None,
+        )
+        if page.Results:
+            yield page.Results
+        token = page.ContinuationToken
+        if not token:
+            return
+
+
+def _to_float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
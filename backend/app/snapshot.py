@@ -0,0 +1,266 @@
+"""Catalog snapshot shared between worker processes.
+
+When several uvicorn workers serve the application, only one process
+refreshes the catalog listings from ADH and publishes them to a
+memory-mapped file at ``CATALOG_SNAPSHOT_PATH``. Every worker maps that file
+and decodes a listing once per published version, so catalog traffic to
+ADH stays constant however many workers run. Every listing carries the time
+it was last loaded, so a listing that keeps failing to refresh ages out.
+
+The publisher is either elected among the workers through a lock file
+(``CATALOG_SNAPSHOT_ROLE=auto``), and re-elected when it exits, or runs as
+a sidecar next to reader-only workers::
+
+    CATALOG_SNAPSHOT_ROLE=reader uvicorn app.main:app --workers 4
+    python -m app.snapshot
+"""
+
+import asyncio
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .upstream import background
+
+CATALOG_SNAPSHOT_PATH: Optional[str] = os.getenv("CATALOG_SNAPSHOT_PATH")
+# "auto" elects one worker as publisher, "publisher" and "reader" force a role
+CATALOG_SNAPSHOT_ROLE: str = os.getenv("CATALOG_SNAPSHOT_ROLE", "auto")
+# Seconds between two publications
+CATALOG_SNAPSHOT_INTERVAL: float = float(os.getenv("CATALOG_SNAPSHOT_INTERVAL", "30"))
+# Readers ignore snapshots whose catalogs were loaded longer ago than this
+CATALOG_SNAPSHOT_MAX_AGE: float = float(os.getenv("CATALOG_SNAPSHOT_MAX_AGE", "300"))
+
+# version, index length; the JSON index maps every kind to its load time and
+# the offset and length of its JSON listing after the index
+_HEADER = struct.Struct("<QQ")
+
+# Global reader instance and election lock file
+_snapshot_reader: Optional["SnapshotReader"] = None
+_lock_file = None
+
+
+def _parse_header(data) -> Optional[Tuple[int, Dict[str, List]]]:
+    if len(data) < _HEADER.size:
+        return None
+    version, length = _HEADER.unpack_from(data)
+    index = data[_HEADER.size : _HEADER.size + length]
+    if len(index) < length:
+        return None
+    return version, json.loads(index)
+
+
+def read_header(path: str) -> Optional[Tuple[int, Dict[str, List]]]:
+    """Return (version, index) of the snapshot at `path`, or None."""
+    try:
+        with open(path, "rb") as f:
+            header = f.read(_HEADER.size)
+            if len(header) < _HEADER.size:
+                return None
+            return _parse_header(header + f.read(_HEADER.unpack(header)[1]))
+    except OSError:
+        return None
+
+
+def publish(path: str, listings: Dict[str, Tuple[float, bytes]], version: int):
+    """Atomically replace the snapshot at `path`.
+
+    `listings` maps every kind to the time it was loaded and its JSON.
+    """
+    index, offset = {}, 0
+    for kind, (loaded, payload) in listings.items():
+        index[kind] = [loaded, offset, len(payload)]
+        offset += len(payload)
+    index = json.dumps(index).encode()
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(version, len(index)))
+        f.write(index)
+        for _, payload in listings.values():
+            f.write(payload)
+    os.replace(tmp, path)
+
+
+class SnapshotReader:
+    """Map the snapshot file and decode each listing once per published version."""
+
+    def __init__(self, path: str, max_age: float = CATALOG_SNAPSHOT_MAX_AGE):
+        self.path = path
+        self.max_age = max_age
+        self.version = 0
+        self._file_id = None
+        self._index: Dict[str, List] = {}
+        self._decoded: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def _use(self, header: Tuple[int, Dict[str, List]]):
+        version, index = header
+        if version != self.version:
+            self.version, self._index, self._decoded = version, index, {}
+
+    def _refresh(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return
+        file_id = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if file_id == self._file_id:
+            return
+        with self._lock:
+            if file_id == self._file_id:
+                return
+            header = read_header(self.path)
+            if header is not None:
+                self._use(header)
+            self._file_id = file_id
+
+    def _decode(self, kind: str) -> Optional[Any]:
+        with self._lock:
+            if kind in self._decoded:
+                return self._decoded[kind]
+            with open(self.path, "rb") as f:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    if len(mm) < _HEADER.size:
+                        return None
+                    version, index_length = _HEADER.unpack_from(mm)
+                    # The file may have been replaced since the index was read
+                    if version != self.version:
+                        self._use(_parse_header(mm))
+                    if kind not in self._index:
+                        return None
+                    _, offset, length = self._index[kind]
+                    start = _HEADER.size + index_length + offset
+                    self._decoded[kind] = json.loads(mm[start : start + length])
+            return self._decoded[kind]
+
+    def get(self, kind: str, newer_than: float = 0.0) -> Optional[Any]:
+        """Return the published `kind` listing, or None if there is no usable one.
+
+        A listing is only usable if it was loaded after `newer_than` and is
+        not older than the maximum age.
+        """
+        self._refresh()
+        entry = self._index.get(kind)
+        if entry is None:
+            return None
+        loaded = entry[0]
+        if loaded <= newer_than or time.time() - loaded > self.max_age:
+            return None
+        return self._decode(kind)
+
+
+class SnapshotPublisher:
+    """Periodically load all catalog listings and publish them."""
+
+    def __init__(
+        self,
+        path: str,
+        loaders: Dict[str, Callable[[], Any]],
+        interval: float = CATALOG_SNAPSHOT_INTERVAL,
+    ):
+        self.path = path
+        self.loaders = loaders
+        self.interval = interval
+        # Time of the last successful load and JSON of every listing
+        self._listings: Dict[str, Tuple[float, bytes]] = {}
+        header = read_header(path)
+        self.version = header[0] if header else 0
+
+    def publish_once(self) -> int:
+        """Load every listing and publish a new version.
+
+        A listing that fails to load keeps its previously published value and
+        load time, so readers stop using it once it exceeds the maximum age.
+        Nothing is published when no listing loaded.
+        """
+        refreshed = False
+        for kind, loader in self.loaders.items():
+            loaded = time.time()
+            try:
+                payload = json.dumps(loader()).encode()
+            except Exception as e:
+                logging.warning(f"Failed to refresh {kind} for snapshot: {str(e)}")
+                continue
+            self._listings[kind] = (loaded, payload)
+            refreshed = True
+        if refreshed:
+            self.version += 1
+            publish(self.path, self._listings, self.version)
+        return self.version
+
+    async def run(self):
+        with background():
+            while True:
+                try:
+                    await asyncio.to_thread(self.publish_once)
+                except Exception as e:
+                    logging.warning(f"Failed to publish catalog snapshot: {str(e)}")
+                await asyncio.sleep(self.interval)
+
+
+def get_snapshot_reader() -> Optional[SnapshotReader]:
+    """Get or create the snapshot reader, None when snapshots are disabled."""
+    global _snapshot_reader
+
+    if _snapshot_reader is None and CATALOG_SNAPSHOT_PATH:
+        _snapshot_reader = SnapshotReader(CATALOG_SNAPSHOT_PATH)
+    return _snapshot_reader
+
+
+def is_publisher() -> bool:
+    """Decide whether this process publishes the snapshot.
+
+    In "auto" mode the first worker to take an exclusive lock on
+    ``<path>.lock`` becomes the publisher and keeps the lock until it exits.
+    """
+    global _lock_file
+
+    if not CATALOG_SNAPSHOT_PATH or CATALOG_SNAPSHOT_ROLE == "reader":
+        return False
+    if CATALOG_SNAPSHOT_ROLE == "publisher" or _lock_file is not None:
+        return True
+
+    lock_file = open(f"{CATALOG_SNAPSHOT_PATH}.lock", "a+b")
+    try:
+        try:
+            import fcntl
+
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except ImportError:
+            import msvcrt
+
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        lock_file.close()
+        return False
+    _lock_file = lock_file
+    return True
+
+
+async def run_publisher(
+    loaders: Dict[str, Callable[[], Any]], interval: float = CATALOG_SNAPSHOT_INTERVAL
+):
+    """Publish the snapshot as soon as this process holds the publisher role.
+
+    Workers that lost the election retry it every `interval`, so another
+    worker takes over when the publisher exits and releases the lock.
+    """
+    if not CATALOG_SNAPSHOT_PATH or CATALOG_SNAPSHOT_ROLE == "reader":
+        return
+    while not is_publisher():
+        await asyncio.sleep(interval)
+    logging.info(f"Publishing catalog snapshot to {CATALOG_SNAPSHOT_PATH}")
+    await SnapshotPublisher(CATALOG_SNAPSHOT_PATH, loaders, interval).run()
+
+
+if __name__ == "__main__":
+    from app.main import CATALOG_LOADERS
+
+    logging.basicConfig(level=logging.INFO)
+    if not CATALOG_SNAPSHOT_PATH:
+        raise SystemExit("CATALOG_SNAPSHOT_PATH is not set")
+    asyncio.run(SnapshotPublisher(CATALOG_SNAPSHOT_PATH, CATALOG_LOADERS).run())
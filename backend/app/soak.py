@@ -0,0 +1,921 @@
+"""Soak and load runner against a local ADH stand-in.
+
+``python -m app.soak`` starts one backend worker in a subprocess whose ADH
+client is replaced by `FakeADH`, an in-memory namespace answering SDK calls
+after a simulated network latency. Client threads, each on its own
+keep-alive connection, drive a mix of catalog polling (revalidating with
+the ETag like the UI), multi-stream chart fetches and model saves against
+it in two phases:
+
+1. ramp: the concurrency doubles every `--step` seconds up to
+   `--max-concurrency`. The knee is the lowest concurrency reaching
+   ``KNEE_SHARE`` of the best throughput of successful requests, where the
+   worker saturates. Levels failing more than ``KNEE_MAX_ERROR_RATE`` of
+   their requests are not considered.
+2. hold: the knee concurrency runs for `--duration` seconds, sampled every
+   `--sample` seconds.
+
+The JSON report has the throughput, latency percentiles and errors of
+every ramp level and hold sample together with the RSS, open file
+descriptors and sockets of the worker, and the trend of those over the
+hold. Growth beyond ``--leak-rss`` bytes or ``--leak-fds`` descriptors is
+flagged as a suspected leak. The worker keeps its history store, catalog
+snapshot, model registry and feature cache in a temporary directory, never
+in the ones configured in ``.env``. With ``--url`` an already running
+backend is driven instead, ``--pid`` naming its process for the resource
+samples::
+
+    python -m app.soak --max-concurrency 64 --duration 3600 --output soak.json
+"""
+
+import argparse
+import copy
+import http.client
+import json
+import logging
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlencode, urlsplit
+
+import numpy as np
+
+from .model import (
+    ML_FORECAST_MODEL_ID,
+    ML_FORECAST_STREAMS,
+    ML_MODEL_TYPE_ID,
+    forecast_stream_id,
+    model_metadata,
+)
+from .series import format_timestamps, parse_timestamps
+
+# Simulated ADH round trip in seconds
+SOAK_LATENCY: float = float(os.getenv("SOAK_LATENCY", "0.02"))
+# Relative frequency of each kind of request
+SOAK_MIX: Dict[str, int] = {"catalog": 4, "chart": 5, "values": 2, "model_save": 1}
+# Lowest concurrency whose throughput reaches this share of the best is the knee
+KNEE_SHARE = 0.95
+# Levels failing more than this share of their requests cannot be the knee
+KNEE_MAX_ERROR_RATE = 0.01
+CATALOG_PATHS = ("/connect/streams", "/connect/assets", "/connect/models")
+# Sample spacing of the stand-in's raw events
+_RAW_SPACING = np.timedelta64(60, "s")
+_MAX_RAW_EVENTS = 10000
+
+
+class NotFoundError(Exception):
+    """Missing ADH object, with the status code the backend checks for."""
+
+    StatusCode = 404
+
+
+def _matches(item, query: str) -> bool:
+    # Only the "Field:Value" queries used by the backend are supported
+    if not query:
+        return True
+    field, _, value = query.partition(":")
+    return str(getattr(item, field, "")) == value
+
+
+def _page(items: Dict, query: str, skip: int, count: int) -> List:
+    matching = [items[key] for key in sorted(items) if _matches(items[key], query)]
+    return copy.deepcopy(matching[skip : skip + count])
+
+
+class _Service:
+    def __init__(self, adh: "FakeADH"):
+        self._adh = adh
+
+    def _get(self, items: Dict, key: str):
+        self._adh.wait()
+        with self._adh.lock:
+            if key not in items:
+                raise NotFoundError(f"{key} not found")
+            return copy.deepcopy(items[key])
+
+
+# Service class names match the SDK's, the upstream guard keys operations by them
+class Streams(_Service):
+    def getStreams(
+        self, namespace_id: str, query: str = "", skip: int = 0, count: int = 100
+    ):
+        self._adh.wait()
+        with self._adh.lock:
+            return _page(self._adh.streams, query, skip, count)
+
+    def getStream(self, namespace_id: str, stream_id: str):
+        return self._get(self._adh.streams, stream_id)
+
+    def getOrCreateStream(self, namespace_id: str, stream):
+        self._adh.wait()
+        with self._adh.lock:
+            if stream.CreatedDate is None:
+                stream.CreatedDate = datetime.now(timezone.utc)
+            stored = self._adh.streams.setdefault(stream.Id, copy.deepcopy(stream))
+            return copy.deepcopy(stored)
+
+    def deleteStream(self, namespace_id: str, stream_id: str):
+        self._adh.wait()
+        with self._adh.lock:
+            if self._adh.streams.pop(stream_id, None) is None:
+                raise NotFoundError(f"{stream_id} not found")
+
+    def getRangeValuesInterpolated(
+        self, namespace_id, stream_id, value_class, start, end, count
+    ):
+        self._get(self._adh.streams, stream_id)
+        return self._adh.events(stream_id, start, end, count)
+
+    def getLastValue(self, namespace_id, stream_id, value_class=None):
+        self._get(self._adh.streams, stream_id)
+        now = np.datetime64(int(time.time() * 1000), "ms").astype("datetime64[m]")
+        return self._adh._values(stream_id, np.array([now], "datetime64[ms]"))[0]
+
+    def getWindowValues(self, namespace_id, stream_id, value_class, start, end):
+        self._get(self._adh.streams, stream_id)
+        return self._adh.raw_events(stream_id, start, end)
+
+    def getWindowValuesPaged(
+        self,
+        namespace_id,
+        stream_id,
+        start,
+        end,
+        count,
+        continuation_token,
+        value_class=None,
+    ):
+        self._get(self._adh.streams, stream_id)
+        events = self._adh.raw_events(stream_id, start, end)
+        offset = int(continuation_token or 0)
+        token = str(offset + count) if offset + count < len(events) else None
+        return SimpleNamespace(
+            Results=events[offset : offset + count], ContinuationToken=token
+        )
+
+    def getSummaries(self, namespace_id, stream_id, value_class, start, end, count):
+        events = self.getRangeValuesInterpolated(
+            namespace_id, stream_id, value_class, start, end, count + 1
+        )
+        return [
+            {
+                "Start": first["Timestamp"],
+                "End": last["Timestamp"],
+                "Summaries": {
+                    "Minimum": {"Value": min(first["Value"], last["Value"])},
+                    "Maximum": {"Value": max(first["Value"], last["Value"])},
+                    "Mean": {"Value": (first["Value"] + last["Value"]) / 2},
+                    "StandardDeviation": {
+                        "Value": abs(first["Value"] - last["Value"]) / 2
+                    },
+                    "Count": {"Value": 60},
+                },
+            }
+            for first, last in zip(events, events[1:])
+        ]
+
+    def updateValues(self, namespace_id: str, stream_id: str, values: str):
+        # Values are discarded so the stand-in's memory stays flat
+        self._get(self._adh.streams, stream_id)
+
+
+class Assets(_Service):
+    def getAssets(
+        self, namespace_id: str, query: str = "", skip: int = 0, count: int = 100
+    ):
+        self._adh.wait()
+        with self._adh.lock:
+            return _page(self._adh.assets, query, skip, count)
+
+    def getAssetById(self, namespace_id: str, asset_id: str):
+        return self._get(self._adh.assets, asset_id)
+
+    def createOrUpdateAsset(self, namespace_id: str, asset):
+        self._adh.wait()
+        with self._adh.lock:
+            return copy.deepcopy(self._adh.store_asset(copy.deepcopy(asset)))
+
+    def deleteAsset(self, namespace_id: str, asset_id: str):
+        self._adh.wait()
+        with self._adh.lock:
+            if self._adh.assets.pop(asset_id, None) is None:
+                raise NotFoundError(f"{asset_id} not found")
+
+    def getAssetInterpolatedData(
+        self, namespace_id, asset_id, start_index, end_index, count, stream=None
+    ):
+        asset = self._get(self._adh.assets, asset_id)
+        results = {
+            reference.Name: self._adh.events(
+                reference.StreamId, start_index, end_index, count
+            )
+            for reference in asset.StreamReferences or []
+            if stream is None or reference.Name in stream
+        }
+        return SimpleNamespace(toDictionary=lambda: {"Results": results})
+
+
+class AssetTypes(_Service):
+    def getAssetTypes(self, namespace_id: str, skip: int = 0, count: int = 100):
+        self._adh.wait()
+        with self._adh.lock:
+            return _page(self._adh.asset_types, "", skip, count)
+
+    def createOrUpdateAssetType(self, namespace_id: str, asset_type):
+        self._adh.wait()
+        with self._adh.lock:
+            self._adh.asset_types[asset_type.Id] = copy.deepcopy(asset_type)
+            return copy.deepcopy(asset_type)
+
+
+class Types(_Service):
+    def getTypes(
+        self, namespace_id: str, skip: int = 0, count: int = 100, query: str = ""
+    ):
+        self._adh.wait()
+        with self._adh.lock:
+            return _page(self._adh.types, query, skip, count)
+
+    def getOrCreateType(self, namespace_id: str, type):
+        self._adh.wait()
+        with self._adh.lock:
+            stored = self._adh.types.setdefault(type.Id, copy.deepcopy(type))
+            return copy.deepcopy(stored)
+
+
+class FakeADH:
+    """In-memory stand-in for the ADH services used by the backend.
+
+    Every call sleeps `latency` seconds, like a network round trip that
+    releases the GIL. Stream values are a sine wave per stream computed on
+    demand, so any range can be read without storing data.
+    """
+
+    def __init__(self, streams: int = 200, models: int = 20, latency: float = 0.0):
+        from adh_sample_library_preview import SdsStream, SdsType, SdsTypeCode
+
+        self.latency = latency
+        self.calls = 0
+        self.lock = threading.Lock()
+        now = datetime.now(timezone.utc)
+        self.types = {
+            "doubleType": SdsType(
+                "doubleType", SdsTypeCode.Double, [], "doubleType", "Soak test type"
+            )
+        }
+        self.streams = {}
+        for i in range(streams):
+            stream_id = f"soak.stream.{i:04d}"
+            self.streams[stream_id] = SdsStream(
+                stream_id, "doubleType", stream_id, "Soak test stream", created_date=now
+            )
+        self.asset_types: Dict = {}
+        self.assets: Dict = {}
+        stream_ids = sorted(self.streams)
+        for i in range(models):
+            inputs = [stream_ids[(3 * i + k) % len(stream_ids)] for k in range(3)]
+            self._seed_model(f"soak.model.{i:03d}", inputs, now)
+
+        self.Streams = Streams(self)
+        self.Assets = Assets(self)
+        self.AssetTypes = AssetTypes(self)
+        self.Types = Types(self)
+
+    def _seed_model(self, model_id: str, inputs: List[str], now: datetime):
+        from adh_sample_library_preview import SdsStream, StreamReference
+        from adh_sample_library_preview.Asset import Asset
+
+        metadata = model_metadata(
+            "LINEAR", 60, [], inputs[:1], inputs[1:], [], 10, 5, "1h", "1d"
+        )
+        references = [StreamReference(s, s, s, "") for s in inputs]
+        for forecast in ML_FORECAST_STREAMS:
+            stream_id = forecast_stream_id(model_id, forecast)
+            self.streams[stream_id] = SdsStream(
+                stream_id,
+                ML_MODEL_TYPE_ID,
+                f"IndyIQ ML {forecast}",
+                created_date=now,
+            )
+            references.append(
+                StreamReference(forecast, f"IndyIQ ML {forecast}", stream_id, "")
+            )
+        asset = Asset(model_id, f"Soak model {model_id}", "Soak test model")
+        asset.AssetTypeId = ML_FORECAST_MODEL_ID
+        asset.Metadata = metadata
+        asset.StreamReferences = references
+        self.store_asset(asset)
+
+    def store_asset(self, asset):
+        # Must be called with the lock held. ADH names metadata after its id
+        # and stamps every write.
+        for item in asset.Metadata or []:
+            item.Name = item.Name or item.Id
+        asset.ModifiedDate = datetime.now(timezone.utc)
+        self.assets[asset.Id] = asset
+        return asset
+
+    def wait(self):
+        with self.lock:
+            self.calls += 1
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+    def _values(self, stream_id: str, timestamps: np.ndarray) -> List[Dict]:
+        phase = zlib.crc32(stream_id.encode()) % 628 / 100
+        minutes = timestamps.astype(np.int64) / 60000.0
+        values = 50 + 10 * np.sin(minutes / 60 + phase)
+        return [
+            {"Timestamp": t, "Value": v}
+            for t, v in zip(format_timestamps(timestamps), values.tolist())
+        ]
+
+    def events(self, stream_id: str, start: str, end: str, count: int) -> List[Dict]:
+        """Interpolated events at `count` evenly spaced times over [start, end]."""
+        start_ts, end_ts = parse_timestamps([start, end]).astype(np.int64)
+        timestamps = np.linspace(start_ts, end_ts, max(count, 1)).astype(np.int64)
+        return self._values(stream_id, timestamps.astype("datetime64[ms]"))
+
+    def raw_events(self, stream_id: str, start: str, end: str) -> List[Dict]:
+        """Stored events, one per minute and at most ``_MAX_RAW_EVENTS``."""
+        start_ts, end_ts = parse_timestamps([start, end])
+        start_ts = start_ts.astype("datetime64[m]").astype("datetime64[ms]")
+        count = min(int((end_ts - start_ts) // _RAW_SPACING) + 1, _MAX_RAW_EVENTS)
+        return self._values(stream_id, start_ts + np.arange(count) * _RAW_SPACING)
+
+
+class HttpSession:
+    """One keep-alive HTTP connection to the backend."""
+
+    def __init__(self, url: str, timeout: float = 30.0):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self._connection: Optional[http.client.HTTPConnection] = None
+
+    def request(
+        self, method: str, path: str, body: Optional[Dict], headers: Dict
+    ) -> Tuple[int, Optional[str]]:
+        """Send a request and return its status and ETag."""
+        payload = None if body is None else json.dumps(body)
+        headers = dict(headers)
+        if payload is not None:
+            headers["Content-Type"] = "application/json"
+        for attempt in range(2):
+            if self._connection is None:
+                self._connection = http.client.HTTPConnection(
+                    self.host, self.port, timeout=self.timeout
+                )
+            try:
+                self._connection.request(method, path, payload, headers)
+                response = self._connection.getresponse()
+                response.read()
+                return response.status, response.getheader("ETag")
+            except (http.client.HTTPException, ConnectionError):
+                # The server may close an idle keep-alive connection
+                self.close()
+                if attempt:
+                    raise
+        raise AssertionError("unreachable")
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+class RequestMix:
+    """Weighted generator of the requests of one client."""
+
+    def __init__(
+        self,
+        streams: List[str],
+        models: List[Dict],
+        rng: random.Random,
+        mix: Dict[str, int] = SOAK_MIX,
+    ):
+        self.streams = streams
+        self.models = models
+        self.rng = rng
+        self.kinds = [kind for kind in mix if mix[kind] > 0]
+        if not streams:
+            self.kinds = [k for k in self.kinds if k not in ("chart", "values")]
+        if not models:
+            self.kinds = [k for k in self.kinds if k != "model_save"]
+        self.weights = [mix[kind] for kind in self.kinds]
+        self.etags: Dict[str, str] = {}
+        self.saves = 0
+
+    def _window(self) -> Tuple[str, str]:
+        now = np.datetime64("now", "m").astype("datetime64[ms]")
+        end = now - np.timedelta64(self.rng.randrange(7 * 24 * 60), "m")
+        hours = self.rng.choice((1, 6, 24))
+        start = end - np.timedelta64(hours, "h")
+        return tuple(format_timestamps(np.array([start, end])))
+
+    def next(self) -> Tuple[str, str, str, Optional[Dict], Dict]:
+        """Return the kind, method, path, JSON body and headers of a request."""
+        kind = self.rng.choices(self.kinds, self.weights)[0]
+        if kind == "catalog":
+            path = self.rng.choice(CATALOG_PATHS)
+            etag = self.etags.get(path)
+            return kind, "GET", path, None, {"If-None-Match": etag} if etag else {}
+        if kind == "chart":
+            start, end = self._window()
+            streams = self.rng.sample(self.streams, min(4, len(self.streams)))
+            query = [("start", start), ("end", end), ("intervals", 300)]
+            query += [("stream_id", s) for s in streams]
+            return (
+                kind,
+                "GET",
+                f"/connect/stream_summaries?{urlencode(query)}",
+                None,
+                {},
+            )
+        if kind == "values":
+            start, end = self._window()
+            query = {
+                "stream_id": self.rng.choice(self.streams),
+                "start": start,
+                "end": end,
+                "intervals": 500,
+            }
+            return (
+                kind,
+                "GET",
+                f"/connect/stream_sample_values?{urlencode(query)}",
+                None,
+                {},
+            )
+        self.saves += 1
+        model = self.rng.choice(self.models)
+        body = {
+            field: model[field]
+            for field in (
+                "id",
+                "name",
+                "model_type",
+                "interval",
+                "past",
+                "target",
+                "future",
+                "lag",
+                "lead",
+                "update",
+                "retrain",
+            )
+        }
+        body.update(description=f"Soak save {self.saves}", status=[])
+        return kind, "PUT", "/connect/models", body, {}
+
+
+class Recorder:
+    """Latencies and errors of the requests completed since the last swap."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._latencies: List[float] = []
+        self._kinds: Dict[str, int] = {}
+        self._errors = 0
+        self._started = time.monotonic()
+
+    def record(self, kind: str, latency: float, status: int):
+        with self._lock:
+            self._latencies.append(latency)
+            self._kinds[kind] = self._kinds.get(kind, 0) + 1
+            # 304 answers a revalidated catalog poll
+            if not (200 <= status < 300 or status == 304):
+                self._errors += 1
+
+    def swap(self) -> Dict:
+        """Summarize the current window and start a new one."""
+        with self._lock:
+            latencies, kinds, errors = self._latencies, self._kinds, self._errors
+            seconds = time.monotonic() - self._started
+            self._reset()
+        return summarize(latencies, errors, seconds, kinds)
+
+
+def summarize(
+    latencies: List[float], errors: int, seconds: float, kinds: Dict[str, int]
+) -> Dict:
+    """Throughput and latency percentiles in milliseconds of one window."""
+    summary = {
+        "seconds": seconds,
+        "requests": len(latencies),
+        "errors": errors,
+        # Failed requests are often the fastest and must not count as throughput
+        "rps": (len(latencies) - errors) / seconds if seconds > 0 else 0.0,
+        "kinds": kinds,
+    }
+    if latencies:
+        p50, p90, p99 = np.percentile(latencies, [50, 90, 99]) * 1000
+        summary.update(
+            p50_ms=float(p50),
+            p90_ms=float(p90),
+            p99_ms=float(p99),
+            max_ms=float(max(latencies) * 1000),
+        )
+    return summary
+
+
+def _client_loop(
+    session_factory: Callable, mix: RequestMix, recorder: Recorder, stop: Callable
+):
+    session = session_factory()
+    try:
+        while not stop():
+            kind, method, path, body, headers = mix.next()
+            started = time.perf_counter()
+            try:
+                status, etag = session.request(method, path, body, headers)
+            except Exception as e:
+                logging.debug(f"{method} {path} failed: {e}")
+                status, etag = 0, None
+            recorder.record(kind, time.perf_counter() - started, status)
+            if etag:
+                mix.etags[path] = etag
+    finally:
+        close = getattr(session, "close", None)
+        if close is not None:
+            close()
+
+
+def drive(
+    session_factory: Callable,
+    concurrency: int,
+    seconds: float,
+    streams: List[str],
+    models: List[Dict],
+    seed: int = 0,
+    sample: Optional[float] = None,
+    on_sample: Optional[Callable[[Dict], None]] = None,
+) -> Dict:
+    """Run `concurrency` clients for `seconds` and summarize their requests.
+
+    With `sample`, `on_sample` receives a summary of every `sample` seconds
+    while the clients run.
+    """
+    recorder = Recorder()
+    deadline = time.monotonic() + seconds
+    threads = [
+        threading.Thread(
+            target=_client_loop,
+            args=(
+                session_factory,
+                RequestMix(streams, models, random.Random(seed * 1000 + i)),
+                recorder,
+                lambda: time.monotonic() >= deadline,
+            ),
+            daemon=True,
+        )
+        for i in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    if sample:
+        while time.monotonic() + sample < deadline:
+            time.sleep(sample)
+            on_sample(recorder.swap())
+    for thread in threads:
+        thread.join()
+    return {"concurrency": concurrency, **recorder.swap()}
+
+
+def find_knee(
+    levels: List[Dict],
+    share: float = KNEE_SHARE,
+    max_error_rate: float = KNEE_MAX_ERROR_RATE,
+) -> Optional[Dict]:
+    """Return the lowest level reaching `share` of the best throughput.
+
+    Levels whose error rate exceeds `max_error_rate` are skipped.
+    """
+    levels = [
+        level
+        for level in levels
+        if level.get("errors", 0) <= max_error_rate * level.get("requests", 0)
+    ]
+    if not levels:
+        return None
+    best = max(level["rps"] for level in levels)
+    return next(level for level in levels if level["rps"] >= share * best)
+
+
+def trend(times: List[float], values: List[Optional[float]]) -> Optional[Dict]:
+    """First, last and least-squares growth per hour of a sampled quantity."""
+    points = [(t, v) for t, v in zip(times, values) if v is not None]
+    if len(points) < 2:
+        return None
+    t, v = np.array(points, dtype=np.float64).T
+    slope = np.polyfit(t, v, 1)[0] if np.ptp(t) > 0 else 0.0
+    return {
+        "first": float(v[0]),
+        "last": float(v[-1]),
+        "growth": float(v[-1] - v[0]),
+        "per_hour": float(slope * 3600),
+    }
+
+
+def process_stats(pid: Optional[int]) -> Dict[str, Optional[int]]:
+    """Resident memory, open file descriptors and sockets of a process."""
+    stats = {"rss_bytes": None, "open_fds": None, "open_sockets": None}
+    if pid is None:
+        return stats
+    proc = f"/proc/{pid}"
+    if os.path.isdir(proc):
+        with open(f"{proc}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    stats["rss_bytes"] = int(line.split()[1]) * 1024
+        fds = os.listdir(f"{proc}/fd")
+        sockets = 0
+        for fd in fds:
+            try:
+                sockets += os.readlink(f"{proc}/fd/{fd}").startswith("socket:")
+            except OSError:
+                # Closed while listing
+                pass
+        stats["open_fds"] = len(fds)
+        stats["open_sockets"] = sockets
+        return stats
+    try:
+        import psutil
+    except ImportError:
+        return stats
+    process = psutil.Process(pid)
+    stats["rss_bytes"] = process.memory_info().rss
+    stats["open_fds"] = (
+        process.num_fds() if hasattr(process, "num_fds") else process.num_handles()
+    )
+    connections = getattr(process, "net_connections", None) or process.connections
+    stats["open_sockets"] = len(connections())
+    return stats
+
+
+def run_soak(
+    url: str,
+    max_concurrency: int = 64,
+    step: float = 10.0,
+    duration: float = 300.0,
+    sample: float = 10.0,
+    pid: Optional[int] = None,
+    leak_rss: int = 64 * 2**20,
+    leak_fds: int = 20,
+    seed: int = 0,
+) -> Dict:
+    """Ramp up to the knee of the backend at `url`, hold it and report the results."""
+    streams, models = _listings(url)
+
+    def session_factory():
+        return HttpSession(url)
+
+    ramp: List[Dict] = []
+    concurrency = 1
+    while concurrency <= max_concurrency:
+        level = drive(session_factory, concurrency, step, streams, models, seed)
+        level.update(process_stats(pid))
+        logging.info(
+            f"{concurrency} clients: {level['rps']:.1f} req/s, "
+            f"p99 {level.get('p99_ms', 0):.0f} ms, {level['errors']} errors"
+        )
+        ramp.append(level)
+        if level["requests"] and level["errors"] > level["requests"] / 2:
+            break
+        concurrency *= 2
+    knee = find_knee(ramp)
+
+    samples: List[Dict] = []
+    started = time.monotonic()
+
+    def on_sample(window: Dict):
+        window.update(elapsed=time.monotonic() - started, **process_stats(pid))
+        samples.append(window)
+        logging.info(
+            f"{window['elapsed']:.0f}s: {window['rps']:.1f} req/s, "
+            f"rss {window['rss_bytes']}, fds {window['open_fds']}"
+        )
+
+    final = drive(
+        session_factory,
+        knee["concurrency"] if knee else 1,
+        duration,
+        streams,
+        models,
+        seed + 1,
+        sample,
+        on_sample,
+    )
+    final.update(elapsed=time.monotonic() - started, **process_stats(pid))
+    samples.append(final)
+
+    times = [s["elapsed"] for s in samples]
+    resources = {
+        key: trend(times, [s[key] for s in samples])
+        for key in ("rss_bytes", "open_fds", "open_sockets")
+    }
+    leaks = [
+        key
+        for key, limit in (("rss_bytes", leak_rss), ("open_fds", leak_fds))
+        if resources[key] and resources[key]["growth"] > limit
+    ]
+    return {
+        "ramp": ramp,
+        "knee": knee,
+        "hold": samples,
+        "resources": resources,
+        "leak_suspected": leaks,
+    }
+
+
+def _get_json(url: str, path: str, timeout: float = 60.0):
+    """GET `path` from the backend at `url` on a connection of its own."""
+    parts = urlsplit(url)
+    connection = http.client.HTTPConnection(
+        parts.hostname, parts.port or 80, timeout=timeout
+    )
+    try:
+        connection.request("GET", path)
+        response = connection.getresponse()
+        body = response.read()
+    finally:
+        connection.close()
+    if response.status != 200:
+        raise RuntimeError(f"GET {path} returned {response.status}")
+    return json.loads(body)
+
+
+def _listings(url: str) -> Tuple[List[str], List[Dict]]:
+    """Read the stream ids and models the request mix works on."""
+    streams = [
+        s["id"]
+        for s in _get_json(url, "/connect/streams")
+        if not s["id"].endswith(tuple(f" {f}" for f in ML_FORECAST_STREAMS))
+    ]
+    return streams, _get_json(url, "/connect/models")
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_until_up(url: str, process: subprocess.Popen, timeout: float = 60.0):
+    session = HttpSession(url, timeout=5)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Backend exited with code {process.returncode}")
+        try:
+            if session.request("GET", "/api/health", None, {})[0] == 200:
+                return
+        except OSError:
+            pass
+        session.close()
+        time.sleep(0.2)
+    raise RuntimeError(f"Backend did not start within {timeout} seconds")
+
+
+def _isolated_env(directory: str) -> Dict[str, str]:
+    """Environment of a worker whose local stores all live in `directory`.
+
+    Variables already set take precedence over ``.env``, so the worker never
+    touches the stores of the developer's configuration.
+    """
+    return {
+        **os.environ,
+        "HISTORY_STORE_PATH": os.path.join(directory, "history.db"),
+        "CATALOG_SNAPSHOT_PATH": os.path.join(directory, "catalog.snapshot"),
+        "MODEL_REGISTRY_DIR": os.path.join(directory, "models"),
+        "FEATURE_CACHE_DIR": os.path.join(directory, "features"),
+    }
+
+
+def _stop(process: subprocess.Popen, timeout: float = 30.0):
+    """Terminate the backend, killing it if it does not exit within `timeout`."""
+    process.terminate()
+    try:
+        process.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        logging.warning(f"Backend did not exit within {timeout} seconds, killing it")
+        process.kill()
+        process.wait()
+
+
+def serve(port: int, streams: int, models: int, latency: float):
+    """Run one backend worker whose ADH client is a `FakeADH`."""
+    import uvicorn
+
+    from . import client
+    from .upstream import GuardedClient
+
+    client._adh_client = GuardedClient(FakeADH(streams, models, latency))
+    from .main import app
+
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", nargs="?", choices=("run", "serve"), default="run")
+    parser.add_argument("--url", help="drive this backend instead of starting one")
+    parser.add_argument("--pid", type=int, help="process id of the --url backend")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--streams", type=int, default=200)
+    parser.add_argument("--models", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=SOAK_LATENCY)
+    parser.add_argument("--max-concurrency", type=int, default=64)
+    parser.add_argument("--step", type=float, default=10.0, help="seconds per level")
+    parser.add_argument("--duration", type=float, default=300.0, help="hold seconds")
+    parser.add_argument("--sample", type=float, default=10.0)
+    parser.add_argument("--leak-rss", type=int, default=64 * 2**20)
+    parser.add_argument("--leak-fds", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--backend-log", help="write the backend's output here")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+
+    if args.command == "serve":
+        serve(args.port, args.streams, args.models, args.latency)
+        return
+
+    process = backend_log = data_dir = None
+    url, pid = args.url, args.pid
+    if url is None:
+        data_dir = tempfile.mkdtemp(prefix="adh_soak_")
+        if args.backend_log:
+            backend_log = open(args.backend_log, "a")
+        port = args.port or _free_port()
+        url = f"http://127.0.0.1:{port}"
+        backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        process = subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "app.soak",
+                "serve",
+                f"--port={port}",
+                f"--streams={args.streams}",
+                f"--models={args.models}",
+                f"--latency={args.latency}",
+            ],
+            cwd=backend_dir,
+            env=_isolated_env(data_dir),
+            stdout=backend_log,
+            stderr=subprocess.STDOUT if backend_log else None,
+        )
+        pid = process.pid
+    try:
+        if process is not None:
+            _wait_until_up(url, process)
+        report = run_soak(
+            url,
+            args.max_concurrency,
+            args.step,
+            args.duration,
+            args.sample,
+            pid,
+            args.leak_rss,
+            args.leak_fds,
+            args.seed,
+        )
+        for name, path in (("upstream", "/api/upstream"), ("memory", "/api/memory")):
+            try:
+                report[name] = _get_json(url, path)
+            except RuntimeError as e:
+                logging.warning(str(e))
+        report["config"] = vars(args) | {"url": url}
+    finally:
+        if process is not None:
+            _stop(process)
+        if backend_log is not None:
+            backend_log.close()
+        if data_dir is not None:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""Persistent on-disk store for historical stream values.
+
+Values older than a configurable horizon no longer change in ADH, so query
+results whose whole range ends before that horizon are kept in a local
+SQLite database. They are served from disk on later requests and survive
+process restarts and reloads. The store is disabled unless
+``HISTORY_STORE_PATH`` is set.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Optional
+
+HISTORY_STORE_PATH: Optional[str] = os.getenv("HISTORY_STORE_PATH")
+# Results ending more than this many seconds ago are treated as immutable
+HISTORY_STORE_HORIZON: int = int(os.getenv("HISTORY_STORE_HORIZON", "86400"))
+
+# Global store instance
+_history_store: Optional["HistoryStore"] = None
+
+
+def parse_time(value: str) -> Optional[datetime]:
+    """Parse an ISO 8601 timestamp, returning None if it is not absolute."""
+    try:
+        parsed = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+class HistoryStore:
+    """SQLite-backed read-through/write-through store of query results."""
+
+    def __init__(self, path: str, horizon: int = HISTORY_STORE_HORIZON):
+        self.path = path
+        self.horizon = horizon
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " key TEXT PRIMARY KEY,"
+            " kind TEXT NOT NULL,"
+            " stream_id TEXT NOT NULL,"
+            " payload BLOB NOT NULL,"
+            " created REAL NOT NULL)"
+        )
+        self._db.commit()
+
+    def is_historical(self, end: str) -> bool:
+        """Return True if a range ending at `end` is older than the horizon."""
+        end_time = parse_time(end)
+        if end_time is None:
+            return False
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.horizon)
+        return end_time < cutoff
+
+    @staticmethod
+    def key(kind: str, params: Dict) -> str:
+        return json.dumps([kind, params], sort_keys=True)
+
+    def get(self, kind: str, params: Dict) -> Optional[Any]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT payload FROM results WHERE key = ?", (self.key(kind, params),)
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(zlib.decompress(row[0]))
+
+    def put(self, kind: str, params: Dict, value: Any):
+        payload = zlib.compress(json.dumps(value).encode())
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)",
+                (
+                    self.key(kind, params),
+                    kind,
+                    params.get("stream_id") or params.get("asset_id") or "",
+                    payload,
+                    time.time(),
+                ),
+            )
+            self._db.commit()
+
+    def fetch(self, kind: str, params: Dict, loader: Callable[[], Any]) -> Any:
+        """Return the stored result for `params`, loading and storing it on a miss.
+
+        Ranges that are not entirely older than the horizon bypass the store.
+        """
+        if not self.is_historical(params.get("end")):
+            return loader()
+        try:
+            value = self.get(kind, params)
+        except sqlite3.Error as e:
+            logging.warning(f"History store read failed: {str(e)}")
+            value = None
+        if value is not None:
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = loader()
+        try:
+            self.put(kind, params, value)
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            logging.warning(f"History store write failed: {str(e)}")
+        return value
+
+    def stats(self) -> Dict:
+        with self._lock:
+            rows, size = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(payload)), 0) FROM results"
+            ).fetchone()
+        return {"hits": self.hits, "misses": self.misses, "rows": rows, "bytes": size}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def get_history_store() -> Optional[HistoryStore]:
+    """Get or create the history store singleton, None when it is disabled."""
+    global _history_store
+
+    if _history_store is None and HISTORY_STORE_PATH:
+        _history_store = HistoryStore(HISTORY_STORE_PATH)
+    return _history_store
+
+
+def read_through(kind: str, params: Dict, loader: Callable[[], Any]) -> Any:
+    """Serve `params` from the history store if enabled, else call `loader`."""
+    store = get_history_store()
+    if store is None:
+        return loader()
+    return store.fetch(kind, params, loader)
@@ -0,0 +1,252 @@
+"""Per-interval summaries (min/max/mean/stddev/count) of one or many streams."""
+
+import logging
+import os
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from .client import NAMESPACE_ID, get_adh_client
+from .series import (
+    events_to_arrays,
+    format_timestamps,
+    iter_window_pages,
+    parse_timestamps,
+)
+
+# Raw events per ADH page when summaries are computed locally
+SUMMARY_PAGE_SIZE: int = int(os.getenv("SUMMARY_PAGE_SIZE", "10000"))
+# Raw events a local summary of one stream may read
+SUMMARY_MAX_EVENTS: int = int(os.getenv("SUMMARY_MAX_EVENTS", "5000000"))
+
+STATISTICS = ("min", "max", "mean", "stddev", "count")
+
+# SDS summary names of the statistics above
+ADH_SUMMARIES = {
+    "min": "Minimum",
+    "max": "Maximum",
+    "mean": "Mean",
+    "stddev": "StandardDeviation",
+    "count": "Count",
+}
+
+
+def interval_edges(start: str, end: str, intervals: int) -> np.ndarray:
+    """Return the `intervals + 1` boundaries of equal intervals over [start, end]."""
+    if intervals <= 0:
+        raise ValueError("intervals must be positive")
+    start_ts, end_ts = parse_timestamps([start, end]).astype(np.int64)
+    if end_ts <= start_ts:
+        raise ValueError("end must be after start")
+    edges = np.linspace(start_ts, end_ts, intervals + 1).round().astype(np.int64)
+    return edges.astype("datetime64[ms]")
+
+
+def aggregate_bins(
+    bins: np.ndarray,
+    intervals: int,
+    count: np.ndarray,
+    total: np.ndarray,
+    squares: np.ndarray,
+    minimum: np.ndarray,
+    maximum: np.ndarray,
+) -> Dict[str, np.ndarray]:
+    """Combine partial aggregates falling into `intervals` bins.
+
+    Every partial contributes its count, sum, sum of squares, minimum and
+    maximum to the bin given by `bins`; partials outside [0, intervals) are
+    ignored. Empty bins get a count of 0 and NaN for the other statistics.
+    """
+    keep = (bins >= 0) & (bins < intervals)
+    bins = bins[keep]
+    count = np.bincount(bins, weights=count[keep], minlength=intervals)
+    total = np.bincount(bins, weights=total[keep], minlength=intervals)
+    squares = np.bincount(bins, weights=squares[keep], minlength=intervals)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = total / count
+        variance = (squares - count * mean * mean) / (count - 1)
+    stddev = np.sqrt(np.clip(variance, 0, None))
+    stddev[count < 2] = np.nan
+
+    result_min = np.full(intervals, np.nan)
+    result_max = np.full(intervals, np.nan)
+    if len(bins):
+        order = np.argsort(bins, kind="stable")
+        bins = bins[order]
+        starts = np.flatnonzero(np.r_[True, bins[1:] != bins[:-1]])
+        result_min[bins[starts]] = np.fmin.reduceat(minimum[keep][order], starts)
+        result_max[bins[starts]] = np.fmax.reduceat(maximum[keep][order], starts)
+
+    return {
+        "min": result_min,
+        "max": result_max,
+        "mean": mean,
+        "stddev": stddev,
+        "count": count,
+    }
+
+
+def _bin_events(
+    timestamps: np.ndarray, values: np.ndarray, edges: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Return the interval of every non-NaN value, -1 or len(edges) - 1 outside."""
+    intervals = len(edges) - 1
+    bins = np.searchsorted(edges, timestamps, side="right") - 1
+    # The end edge belongs to the last interval
+    bins[timestamps == edges[-1]] = intervals - 1
+    valid = ~np.isnan(values)
+    return bins[valid], values[valid]
+
+
+def summarize_arrays(
+    timestamps: np.ndarray, values: np.ndarray, edges: np.ndarray
+) -> Dict[str, np.ndarray]:
+    """Compute interval statistics of raw events with vectorized reductions.
+
+    Events outside the edges and NaN values are ignored. Empty intervals get
+    a count of 0 and NaN for the other statistics.
+    """
+    bins, values = _bin_events(timestamps, values, edges)
+    ones = np.ones(len(values))
+    return aggregate_bins(
+        bins, len(edges) - 1, ones, values, values * values, values, values
+    )
+
+
+def to_columns(stream_ids: List[str], edges: np.ndarray, stats: List[Dict]) -> Dict:
+    """Shape per-stream statistics as columnar lists with nulls for gaps."""
+    columns: Dict[str, List] = {name: [] for name in STATISTICS}
+    for stream_stats in stats:
+        for name in STATISTICS:
+            values = stream_stats[name].astype(object)
+            values[np.isnan(stream_stats[name])] = None
+            columns[name].append(values.tolist())
+    return {
+        "timestamps": format_timestamps(edges[:-1]),
+        "streams": list(stream_ids),
+        **columns,
+    }
+
+
+def _summary_value(summary) -> float:
+    if isinstance(summary, dict):
+        summary = next(iter(summary.values()), None) if summary else None
+    try:
+        return float(summary)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def adh_summaries(client, stream_id: str, start: str, end: str, intervals: int):
+    """Fetch interval statistics from an ADH summary query."""
+    results = client.Streams.getSummaries(
+        NAMESPACE_ID,
+        stream_id=stream_id,
+        value_class=None,
+        start=start,
+        end=end,
+        count=intervals,
+    )
+    stats = {name: np.full(intervals, np.nan) for name in STATISTICS}
+    for i, result in enumerate(list(results)[:intervals]):
+        summaries = result.get("Summaries", {})
+        for name, adh_name in ADH_SUMMARIES.items():
+            stats[name][i] = _summary_value(summaries.get(adh_name))
+    return stats
+
+
+def local_summaries(
+    client,
+    stream_id: str,
+    edges: np.ndarray,
+    start: str,
+    end: str,
+    page_size: int = SUMMARY_PAGE_SIZE,
+    max_events: int = SUMMARY_MAX_EVENTS,
+):
+    """Page through the raw events and compute interval statistics locally.
+
+    Every page is folded into per-interval partial aggregates, so memory
+    does not grow with the number of events. More than `max_events` raw
+    events raise a ValueError.
+    """
+    intervals = len(edges) - 1
+    count = np.zeros(intervals)
+    total = np.zeros(intervals)
+    squares = np.zeros(intervals)
+    minimum = np.full(intervals, np.nan)
+    maximum = np.full(intervals, np.nan)
+    events = 0
+    for page in iter_window_pages(
+        client, NAMESPACE_ID, stream_id, start, end, page_size
+    ):
+        events += len(page)
+        if events > max_events:
+            raise ValueError(
+                f"{stream_id} has more than {max_events} events in the range, "
+                "too many to summarize locally"
+            )
+        bins, values = _bin_events(*events_to_arrays(page), edges)
+        keep = (bins >= 0) & (bins < intervals)
+        bins, values = bins[keep], values[keep]
+        count += np.bincount(bins, minlength=intervals)
+        total += np.bincount(bins, weights=values, minlength=intervals)
+        squares += np.bincount(bins, weights=values * values, minlength=intervals)
+        np.fmin.at(minimum, bins, values)
+        np.fmax.at(maximum, bins, values)
+    return aggregate_bins(
+        np.arange(intervals), intervals, count, total, squares, minimum, maximum
+    )
+
+
+def _unsupported(error: Exception) -> bool:
+    # Summary queries the namespace or SDK cannot answer, as opposed to ADH
+    # being unavailable, where computing locally would only add load
+    if isinstance(error, (AttributeError, NotImplementedError)):
+        return True
+    status = getattr(error, "StatusCode", None)
+    return status is not None and 400 <= status < 500 and status != 429
+
+
+def get_summaries(
+    stream_ids: List[str],
+    start: str,
+    end: str,
+    intervals: int,
+    source: str = "auto",
+    client=None,
+) -> Dict:
+    """Return interval statistics of `stream_ids` in columnar form.
+
+    ``source`` selects ADH summary queries ("adh"), local computation over
+    raw values ("local") or ADH with a local fallback per stream ("auto").
+    The fallback is only taken when ADH rejects the summary query with a
+    client error, never when it fails or is unavailable.
+    The result has one row per stream in every statistic, for example
+    ``result["mean"][i][j]`` is the mean of ``streams[i]`` over the interval
+    starting at ``timestamps[j]``.
+    """
+    client = client or get_adh_client()
+    edges = interval_edges(start, end, intervals)
+    stats, sources = [], []
+    for stream_id in stream_ids:
+        stream_stats, used = _summaries(client, stream_id, edges, start, end, source)
+        stats.append(stream_stats)
+        sources.append(used)
+    return {**to_columns(stream_ids, edges, stats), "sources": sources}
+
+
+def _summaries(
+    client, stream_id: str, edges: np.ndarray, start: str, end: str, source: str
+) -> Tuple[Dict[str, np.ndarray], str]:
+    intervals = len(edges) - 1
+    if source in ("auto", "adh"):
+        try:
+            return adh_summaries(client, stream_id, start, end, intervals), "adh"
+        except Exception as e:
+            if source == "adh" or not _unsupported(e):
+                raise
+            logging.info(
+                f"Summary query failed for {stream_id}, computing locally: {e}"
+            )
+    return local_summaries(client, stream_id, edges, start, end), "local"
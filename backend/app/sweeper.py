@@ -0,0 +1,197 @@
+"""Removal of forecast output streams left behind by deleted models.
+
+Every model asset owns the ``"{id} Forecast"``, ``"{id} Forecast Lower"`` and
+``"{id} Forecast Upper"`` streams. Deleting a model with ``cascade`` removes
+them with the asset; the sweeper finds the forecast streams of models that
+were deleted without it (or by other clients) and deletes them in
+concurrency-limited batches. Both listings are read from ADH rather than
+from the catalog cache, and streams younger than ``FORECAST_SWEEP_MIN_AGE``
+are skipped, so the streams of a model that is being created are never
+taken for orphans. The trained parameters of deleted models are removed
+from the model registry the same way.
+"""
+
+import asyncio
+import contextvars
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .client import NAMESPACE_ID, get_adh_client
+from .model import (
+    ML_FORECAST_STREAMS,
+    ML_MODEL_ASSET_TYPE_QUERY,
+    ML_MODEL_TYPE_ID,
+    forecast_stream_id,
+)
+from .registry import ModelRegistry, get_model_registry
+from .upstream import background
+
+# Run the sweeper in the background; otherwise it only runs on request
+FORECAST_SWEEP: bool = os.getenv("FORECAST_SWEEP", "false").lower() == "true"
+# Seconds between background sweeps
+FORECAST_SWEEP_INTERVAL: float = float(os.getenv("FORECAST_SWEEP_INTERVAL", "3600"))
+# Streams created less than this many seconds ago are never swept
+FORECAST_SWEEP_MIN_AGE: float = float(os.getenv("FORECAST_SWEEP_MIN_AGE", "3600"))
+# Number of streams deleted concurrently
+FORECAST_SWEEP_WORKERS: int = int(os.getenv("FORECAST_SWEEP_WORKERS", "4"))
+# Number of streams deleted per batch
+FORECAST_SWEEP_BATCH_SIZE: int = int(os.getenv("FORECAST_SWEEP_BATCH_SIZE", "50"))
+# Page size of the stream and asset listings
+FORECAST_SWEEP_PAGE_SIZE: int = int(os.getenv("FORECAST_SWEEP_PAGE_SIZE", "1000"))
+
+FORECAST_STREAM_QUERY = f"TypeId:{ML_MODEL_TYPE_ID}"
+
+# Longest suffix first, "Forecast" is a suffix of the other two
+_SUFFIXES = sorted((f" {f}" for f in ML_FORECAST_STREAMS), key=len, reverse=True)
+
+
+def forecast_owner(stream_id: str) -> Optional[str]:
+    """Return the model id a forecast stream id belongs to, or None."""
+    for suffix in _SUFFIXES:
+        if stream_id.endswith(suffix) and len(stream_id) > len(suffix):
+            return stream_id[: -len(suffix)]
+    return None
+
+
+def find_orphans(
+    streams: Iterable, model_ids: Iterable[str], now: datetime, min_age: float
+) -> List[str]:
+    """Return the ids of forecast streams whose model is not in `model_ids`."""
+    models = set(model_ids)
+    orphans = []
+    for stream in streams:
+        owner = forecast_owner(stream.Id)
+        if owner is None or owner in models:
+            continue
+        created = getattr(stream, "CreatedDate", None)
+        if created is not None and (now - created).total_seconds() < min_age:
+            continue
+        orphans.append(stream.Id)
+    return sorted(orphans)
+
+
+def _pages(fetch, page_size: int) -> List:
+    items, skip = [], 0
+    while True:
+        page = fetch(skip, page_size)
+        items.extend(page)
+        if len(page) < page_size:
+            return items
+        skip += page_size
+
+
+def delete_streams(
+    client,
+    stream_ids: List[str],
+    workers: int = FORECAST_SWEEP_WORKERS,
+    batch_size: int = FORECAST_SWEEP_BATCH_SIZE,
+) -> Tuple[List[str], Dict[str, str]]:
+    """Delete streams in batches of `batch_size` with `workers` in parallel.
+
+    Returns the deleted ids and the error of every stream that could not be
+    deleted. Streams that are already gone count as deleted.
+    """
+
+    def delete(stream_id: str) -> Optional[str]:
+        try:
+            client.Streams.deleteStream(NAMESPACE_ID, stream_id)
+        except Exception as e:
+            if getattr(e, "StatusCode", None) != 404:
+                return str(e)
+        return None
+
+    deleted: List[str] = []
+    failed: Dict[str, str] = {}
+    batch_size = max(1, batch_size)
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for i in range(0, len(stream_ids), batch_size):
+            batch = stream_ids[i : i + batch_size]
+            # Deletes run with the caller's upstream priority
+            futures = [
+                pool.submit(contextvars.copy_context().run, delete, stream_id)
+                for stream_id in batch
+            ]
+            for stream_id, error in zip(batch, (f.result() for f in futures)):
+                if error is None:
+                    deleted.append(stream_id)
+                else:
+                    failed[stream_id] = error
+    return deleted, failed
+
+
+def delete_forecast_streams(client, model_id: str) -> Tuple[List[str], Dict[str, str]]:
+    """Delete the forecast output streams of one model."""
+    stream_ids = [forecast_stream_id(model_id, f) for f in ML_FORECAST_STREAMS]
+    return delete_streams(client, stream_ids)
+
+
+def sweep(
+    dry_run: bool = True,
+    client=None,
+    min_age: float = FORECAST_SWEEP_MIN_AGE,
+    page_size: int = FORECAST_SWEEP_PAGE_SIZE,
+    registry: Optional[ModelRegistry] = None,
+) -> Dict:
+    """Find orphaned forecast streams and trained parameters and delete them
+    unless `dry_run`."""
+    client = client or get_adh_client()
+    registry = registry or get_model_registry()
+    now = datetime.now(timezone.utc)
+    # Streams are listed before models: a model created in between owns
+    # streams that are either listed with it or too young to be swept
+    streams = _pages(
+        lambda skip, count: client.Streams.getStreams(
+            NAMESPACE_ID, query=FORECAST_STREAM_QUERY, skip=skip, count=count
+        ),
+        page_size,
+    )
+    models = _pages(
+        lambda skip, count: client.Assets.getAssets(
+            NAMESPACE_ID, query=ML_MODEL_ASSET_TYPE_QUERY, skip=skip, count=count
+        ),
+        page_size,
+    )
+    model_ids = {m.Id for m in models}
+    orphans = find_orphans(streams, model_ids, now, min_age)
+    # Parameters written after the model listing are too young to be swept
+    weights = [m for m in registry.trained(min_age) if m not in model_ids]
+    report = {
+        "dry_run": dry_run,
+        "scanned": len(streams),
+        "models": len(models),
+        "orphans": orphans,
+        "weights": weights,
+        "deleted": [],
+        "failed": {},
+    }
+    if not dry_run and orphans:
+        report["deleted"], report["failed"] = delete_streams(client, orphans)
+    if not dry_run:
+        for model_id in weights:
+            registry.remove(model_id)
+    return report
+
+
+async def run_sweeper(interval: float = FORECAST_SWEEP_INTERVAL, on_deleted=None):
+    """Sweep orphaned forecast streams every `interval` seconds.
+
+    `on_deleted` is called with the ids of the deleted streams, e.g. to
+    update the catalog.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            with background():
+                report = await asyncio.to_thread(sweep, False)
+        except Exception as e:
+            logging.warning(f"Forecast stream sweep failed: {e}")
+            continue
+        if report["deleted"]:
+            logging.info(f"Swept {len(report['deleted'])} orphaned forecast streams")
+            if on_deleted is not None:
+                on_deleted(report["deleted"])
+        if report["failed"]:
+            logging.warning(f"Could not sweep {len(report['failed'])} forecast streams")
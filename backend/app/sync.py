@@ -0,0 +1,214 @@
+"""Versioned in-memory snapshot of the namespace catalog.
+
+A background task reloads every catalog listing (types, streams, assets,
+asset types, models) every ``CATALOG_SYNC_INTERVAL`` seconds and compares it
+item by item with the snapshot. Only the items that were added, changed or
+removed are applied, and each change bumps the snapshot version. Writes
+made by this process (creating or deleting a model) are applied to the
+snapshot immediately instead of waiting for the next refresh.
+
+The ETag of a listing is a hash of its content, so it stays valid across
+restarts and agrees between workers. The recent changes can be read back as
+a feed with `changes`; versions only count within one process, so the feed
+carries a random epoch that the caller passes back.
+
+Listings are loaded through `get_catalog`, so a shared catalog snapshot
+published by another process is used when one is configured. A listing whose
+load began before a local write of the same kind is dropped, so a refresh
+never puts back what the write replaced.
+
+The synchronizer is opt-in with ``CATALOG_SYNC``, as every worker reloads
+the whole catalog every ``CATALOG_SYNC_INTERVAL`` seconds.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from .catalog import get_catalog
+from .upstream import background
+
+CATALOG_SYNC: bool = os.getenv("CATALOG_SYNC", "false").lower() in ("1", "true", "yes")
+# Seconds between two refreshes
+CATALOG_SYNC_INTERVAL: float = float(os.getenv("CATALOG_SYNC_INTERVAL", "30"))
+# Number of changes kept for the change feed
+CATALOG_SYNC_HISTORY: int = int(os.getenv("CATALOG_SYNC_HISTORY", "1000"))
+
+# Id and sort fields of the listings that do not use "id" and "name"
+CATALOG_FIELDS: Dict[str, Tuple[str, str]] = {"types": ("Id", "Name")}
+
+
+class CatalogSync:
+    """Catalog listings indexed by id, with a version bumped on every change."""
+
+    def __init__(
+        self,
+        loaders: Dict[str, Callable[[], List[Dict]]],
+        interval: float = CATALOG_SYNC_INTERVAL,
+        history: int = CATALOG_SYNC_HISTORY,
+    ):
+        self.loaders = loaders
+        self.interval = interval
+        self.version = 0
+        self.epoch = uuid.uuid4().hex
+        self._items: Dict[str, Dict[str, Dict]] = {}
+        self._listings: Dict[str, List[Dict]] = {}
+        self._etags: Dict[str, str] = {}
+        self._changes: Deque[Dict] = deque(maxlen=history)
+        # Monotonic time of the last local write of every kind
+        self._written: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        # Set by `run`; waiting on the event loop leaves no thread to join on exit
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+
+    def _fields(self, kind: str) -> Tuple[str, str]:
+        return CATALOG_FIELDS.get(kind, ("id", "name"))
+
+    def _apply(self, kind: str, op: str, id: str, item: Optional[Dict]):
+        # Must be called with the lock held
+        self.version += 1
+        self._changes.append(
+            {"version": self.version, "kind": kind, "op": op, "id": id, "item": item}
+        )
+
+    def _rebuild(self, kind: str):
+        _, name = self._fields(kind)
+        listing = sorted(
+            self._items[kind].values(), key=lambda item: str(item.get(name, ""))
+        )
+        content = json.dumps(listing, sort_keys=True, default=str).encode()
+        self._listings[kind] = listing
+        self._etags[kind] = f'"{kind}-{hashlib.sha1(content).hexdigest()[:16]}"'
+
+    def load(
+        self, kind: str, items: List[Dict], started: Optional[float] = None
+    ) -> int:
+        """Apply the difference between `items` and the snapshot of `kind`.
+
+        `started` is the monotonic time the listing began loading; a listing
+        older than the last local write of `kind` is ignored. Returns the
+        number of changed items.
+        """
+        key, _ = self._fields(kind)
+        fresh = {item[key]: item for item in items}
+        with self._lock:
+            if started is not None and self._written.get(kind, -1.0) >= started:
+                return 0
+            current = self._items.get(kind)
+            if current is None:
+                # The first load is a single change of the whole listing
+                self._items[kind] = fresh
+                self._apply(kind, "load", "", None)
+                self._rebuild(kind)
+                return len(fresh)
+
+            changed = 0
+            for id, item in fresh.items():
+                if current.get(id) != item:
+                    self._apply(kind, "upsert", id, item)
+                    changed += 1
+            for id in set(current) - set(fresh):
+                self._apply(kind, "delete", id, None)
+                changed += 1
+            if changed:
+                self._items[kind] = fresh
+                self._rebuild(kind)
+            return changed
+
+    def upsert(self, kind: str, item: Dict):
+        """Apply a local create or update of one item."""
+        key, _ = self._fields(kind)
+        with self._lock:
+            if kind not in self._items:
+                return
+            self._written[kind] = time.monotonic()
+            self._items[kind][item[key]] = item
+            self._apply(kind, "upsert", item[key], item)
+            self._rebuild(kind)
+
+    def delete(self, kind: str, id: str):
+        """Apply a local delete of one item."""
+        with self._lock:
+            if self._items.get(kind, {}).pop(id, None) is None:
+                return
+            self._written[kind] = time.monotonic()
+            self._apply(kind, "delete", id, None)
+            self._rebuild(kind)
+
+    def get(self, kind: str) -> Optional[List[Dict]]:
+        """Return the `kind` listing, or None before it was first loaded."""
+        return self._listings.get(kind)
+
+    def etag(self, kind: str) -> str:
+        return self._etags.get(kind, f'"{kind}-0"')
+
+    def changes(self, since: int, epoch: Optional[str] = None) -> Optional[Dict]:
+        """Return the changes after version `since`.
+
+        Returns None if some of them are no longer kept, or if `epoch` is
+        from another process, in which case the caller has to reload the
+        listings.
+        """
+        with self._lock:
+            if epoch is not None and epoch != self.epoch:
+                return None
+            changes = [c for c in self._changes if c["version"] > since]
+            oldest = self._changes[0]["version"] if self._changes else self.version + 1
+            if since < self.version and oldest > since + 1:
+                return None
+            return {"epoch": self.epoch, "version": self.version, "changes": changes}
+
+    def sync_once(self):
+        for kind, loader in self.loaders.items():
+            try:
+                started = time.monotonic()
+                self.load(kind, get_catalog(kind, loader), started)
+            except Exception as e:
+                logging.warning(f"Failed to synchronize {kind}: {str(e)}")
+
+    def request_sync(self):
+        """Run the next refresh now instead of after the interval.
+
+        Can be called from any thread.
+        """
+        loop, wake = self._loop, self._wake
+        if loop is None or wake is None:
+            return
+        try:
+            loop.call_soon_threadsafe(wake.set)
+        except RuntimeError:
+            # The loop has been closed
+            pass
+
+    async def run(self):
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        with background():
+            while True:
+                await asyncio.to_thread(self.sync_once)
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+
+
+# Global catalog synchronizer
+_catalog_sync: Optional[CatalogSync] = None
+
+
+def get_catalog_sync(loaders: Dict[str, Callable[[], Any]] = None) -> CatalogSync:
+    """Get or create the catalog synchronizer singleton."""
+    global _catalog_sync
+
+    if _catalog_sync is None:
+        _catalog_sync = CatalogSync(loaders or {})
+    return _catalog_sync
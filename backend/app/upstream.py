@@ -0,0 +1,549 @@
+"""Protection of the application against a slow or failing ADH.
+
+Every SDK call made through the shared client passes through `call`, which
+
+* fails fast while the circuit breaker is open after repeated upstream
+  failures,
+* limits the number of concurrent upstream calls with an adaptive limit that
+  shrinks when latency rises above its baseline and grows back slowly when
+  it recovers, and
+* sheds load by raising `OverloadedError` when no slot frees up within a
+  short queue timeout.
+
+Calls are either interactive (the default, e.g. /connect/* reads) or
+background (catalog refreshes, rollups, exports, forecast writes, sweeps),
+as set by the `background` context manager around the calling code.
+Waiting interactive calls take every free slot ahead of waiting background
+calls, except for a reserved `UPSTREAM_BACKGROUND_MIN_SHARE` of the limit
+that background calls always get, and background calls never hold more
+than `UPSTREAM_BACKGROUND_MAX_SHARE` of it. Background calls queue longer
+before they are shed.
+
+The latency baseline is a smoothed average per operation and request size
+(see `size_class`), so a large read is not taken for a congested small one,
+and the limit shrinks at most once per ``UPSTREAM_LIMIT_WINDOW`` however many
+slow calls complete in it.
+
+Both errors are `UpstreamUnavailable`, which the API turns into a 503 with a
+Retry-After header.
+
+Idempotent reads listed in `HEDGED_OPERATIONS` can optionally be hedged: if
+a call has not answered within the configured latency percentile of its
+operation and size class, an identical second call is sent and whichever
+answers first wins. A token budget caps hedges at a fraction of all hedgeable calls.
+"""
+
+import contextvars
+import inspect
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures import wait
+from datetime import datetime
+from typing import Any, Callable, Deque, Dict, Iterator, Optional, Tuple
+
+UPSTREAM_CONCURRENCY_INITIAL: int = int(os.getenv("UPSTREAM_CONCURRENCY_INITIAL", "16"))
+UPSTREAM_CONCURRENCY_MIN: int = int(os.getenv("UPSTREAM_CONCURRENCY_MIN", "2"))
+UPSTREAM_CONCURRENCY_MAX: int = int(os.getenv("UPSTREAM_CONCURRENCY_MAX", "64"))
+# Latency above this multiple of an operation's baseline shrinks the limit
+UPSTREAM_LATENCY_TOLERANCE: float = float(
+    os.getenv("UPSTREAM_LATENCY_TOLERANCE", "2.0")
+)
+# Minimum seconds between two decreases of the limit
+UPSTREAM_LIMIT_WINDOW: float = float(os.getenv("UPSTREAM_LIMIT_WINDOW", "1.0"))
+# Seconds a call waits for a free slot before it is shed
+UPSTREAM_QUEUE_TIMEOUT: float = float(os.getenv("UPSTREAM_QUEUE_TIMEOUT", "1.0"))
+UPSTREAM_BACKGROUND_QUEUE_TIMEOUT: float = float(
+    os.getenv("UPSTREAM_BACKGROUND_QUEUE_TIMEOUT", "30.0")
+)
+# Fractions of the concurrency limit background calls are guaranteed and capped at
+UPSTREAM_BACKGROUND_MIN_SHARE: float = float(
+    os.getenv("UPSTREAM_BACKGROUND_MIN_SHARE", "0.1")
+)
+UPSTREAM_BACKGROUND_MAX_SHARE: float = float(
+    os.getenv("UPSTREAM_BACKGROUND_MAX_SHARE", "0.5")
+)
+# Consecutive failures that open the circuit, and seconds it stays open
+UPSTREAM_BREAKER_FAILURES: int = int(os.getenv("UPSTREAM_BREAKER_FAILURES", "5"))
+UPSTREAM_BREAKER_RESET: float = float(os.getenv("UPSTREAM_BREAKER_RESET", "30"))
+UPSTREAM_HEDGING: bool = os.getenv("UPSTREAM_HEDGING", "false").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+# Latency percentile after which a hedged read sends its second request
+UPSTREAM_HEDGE_PERCENTILE: float = float(os.getenv("UPSTREAM_HEDGE_PERCENTILE", "95"))
+# Maximum fraction of hedgeable calls that may send a second request
+UPSTREAM_HEDGE_BUDGET: float = float(os.getenv("UPSTREAM_HEDGE_BUDGET", "0.05"))
+
+HEDGED_OPERATIONS = {
+    "Streams.getRangeValuesInterpolated",
+    "Assets.getAssetInterpolatedData",
+}
+
+PRIORITIES = ("interactive", "background")
+_priority: contextvars.ContextVar[str] = contextvars.ContextVar(
+    "upstream_priority", default="interactive"
+)
+
+
+def current_priority() -> str:
+    return _priority.get()
+
+
+@contextmanager
+def background() -> Iterator[None]:
+    """Run the upstream calls made in this context as background traffic.
+
+    Context variables do not follow work handed to a plain thread pool, so
+    pool tasks enter this themselves.
+    """
+    token = _priority.set("background")
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class UpstreamUnavailable(Exception):
+    """ADH cannot take the call right now; retry after `retry_after` seconds."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(UpstreamUnavailable):
+    pass
+
+
+class OverloadedError(UpstreamUnavailable):
+    pass
+
+
+def is_upstream_failure(error: Exception) -> bool:
+    """Return True if `error` says ADH is unhealthy rather than the request bad."""
+    if isinstance(error, (TypeError, ValueError, UpstreamUnavailable)):
+        return False
+    status = getattr(error, "StatusCode", None)
+    if status is not None:
+        return status >= 500 or status == 429
+    return True
+
+
+# Signatures of the called functions, keyed by the function of bound methods
+_signatures: Dict[Any, Optional[inspect.Signature]] = {}
+
+
+def _span(start, end) -> Optional[float]:
+    try:
+        first, last = (
+            datetime.fromisoformat(str(t).replace("Z", "+00:00")) for t in (start, end)
+        )
+        return abs((last - first).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def size_class(fn: Callable, args, kwargs) -> str:
+    """Bucket the size of a call by its ``count`` and its time range.
+
+    Both are rounded to powers of four, e.g. ``"n5,t8"`` for 1000 values over
+    a day; calls without either return "".
+    """
+    function = getattr(fn, "__func__", fn)
+    if function not in _signatures:
+        try:
+            _signatures[function] = inspect.signature(fn)
+        except (TypeError, ValueError):
+            _signatures[function] = None
+    signature = _signatures[function]
+    try:
+        arguments = signature.bind_partial(*args, **kwargs).arguments
+    except (AttributeError, TypeError):
+        arguments = kwargs
+    parts = []
+    count = arguments.get("count")
+    if isinstance(count, int) and count > 0:
+        parts.append(f"n{count.bit_length() // 2}")
+    span = _span(
+        arguments.get("start", arguments.get("start_index")),
+        arguments.get("end", arguments.get("end_index")),
+    )
+    if span is not None:
+        parts.append(f"t{int(span).bit_length() // 2}")
+    return ",".join(parts)
+
+
+def call_key(operation: str, fn: Callable, args, kwargs) -> str:
+    """Operation name qualified by the size class of the call."""
+    size = size_class(fn, args, kwargs)
+    return f"{operation}[{size}]" if size else operation
+
+
+class AdaptiveLimiter:
+    """Concurrency limit adjusted by additive increase, multiplicative decrease.
+
+    Every call that answers within `tolerance` times the average latency of
+    its key raises the limit by ``1 / limit``. Slow or failed calls shrink it
+    by 10%, at most once per `window` seconds. Slots are shared by
+    interactive and background calls as described in the module docstring.
+    """
+
+    def __init__(
+        self,
+        initial: int = UPSTREAM_CONCURRENCY_INITIAL,
+        minimum: int = UPSTREAM_CONCURRENCY_MIN,
+        maximum: int = UPSTREAM_CONCURRENCY_MAX,
+        tolerance: float = UPSTREAM_LATENCY_TOLERANCE,
+        queue_timeout: float = UPSTREAM_QUEUE_TIMEOUT,
+        background_queue_timeout: float = UPSTREAM_BACKGROUND_QUEUE_TIMEOUT,
+        background_min_share: float = UPSTREAM_BACKGROUND_MIN_SHARE,
+        background_max_share: float = UPSTREAM_BACKGROUND_MAX_SHARE,
+        window: float = UPSTREAM_LIMIT_WINDOW,
+        smoothing: int = 100,
+        warmup: int = 10,
+    ):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = float(min(max(initial, self.minimum), self.maximum))
+        self.tolerance = tolerance
+        self.queue_timeout = queue_timeout
+        self.background_queue_timeout = background_queue_timeout
+        self.background_min_share = background_min_share
+        self.background_max_share = background_max_share
+        self.window = window
+        # Weight of the history in the average, and samples before judging
+        self.smoothing = max(1, smoothing)
+        self.warmup = warmup
+        self.inflight = 0
+        self.shed = 0
+        self.running = dict.fromkeys(PRIORITIES, 0)
+        self.waiting = dict.fromkeys(PRIORITIES, 0)
+        # Average latency and number of samples per call key
+        self._baselines: Dict[str, Tuple[float, int]] = {}
+        self._decreased = float("-inf")
+        self._condition = threading.Condition()
+
+    def _admits(self, priority: str) -> bool:
+        # Must be called with the condition held
+        limit = int(self.limit)
+        background = self.running["background"]
+        reserved = (
+            max(1, int(limit * self.background_min_share))
+            if self.background_min_share > 0
+            else 0
+        )
+        if priority == "background":
+            cap = max(reserved, int(limit * self.background_max_share))
+            if self.inflight >= limit or background >= cap:
+                return False
+            # Interactive calls go first, except into the reserved share
+            return self.waiting["interactive"] == 0 or background < reserved
+        held = reserved - background if self.waiting["background"] else 0
+        return self.inflight < limit - max(held, 0)
+
+    def acquire(self, priority: Optional[str] = None) -> str:
+        """Take a slot for a call of `priority`, the context's by default."""
+        priority = priority or current_priority()
+        timeout = (
+            self.background_queue_timeout
+            if priority == "background"
+            else self.queue_timeout
+        )
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            self.waiting[priority] += 1
+            try:
+                while not self._admits(priority):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.shed += 1
+                        raise OverloadedError(
+                            "Too many concurrent requests to ADH", timeout
+                        )
+                    self._condition.wait(remaining)
+            finally:
+                self.waiting[priority] -= 1
+                # A waiter leaving can admit calls of the other class
+                self._condition.notify_all()
+            self.inflight += 1
+            self.running[priority] += 1
+        return priority
+
+    def release(
+        self, operation: str, latency: float, ok: bool, priority: str = "interactive"
+    ):
+        """Free the slot of a call and adjust the limit to its outcome.
+
+        `operation` is the call key, e.g. from `call_key`.
+        """
+        with self._condition:
+            self.inflight -= 1
+            self.running[priority] -= 1
+            congested = not ok
+            if ok:
+                mean, samples = self._baselines.get(operation, (latency, 0))
+                if samples >= self.warmup and latency > self.tolerance * mean:
+                    congested = True
+                # Exact mean of the first samples, then an exponential average
+                # that follows lasting changes slowly
+                samples += 1
+                mean += (latency - mean) / min(samples, self.smoothing)
+                self._baselines[operation] = (mean, samples)
+
+            now = time.monotonic()
+            if congested:
+                if now - self._decreased >= self.window:
+                    self.limit = max(self.minimum, self.limit * 0.9)
+                    self._decreased = now
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+
+class CircuitBreaker:
+    """Open after consecutive failures, then let a single probe call through."""
+
+    def __init__(
+        self,
+        failure_threshold: int = UPSTREAM_BREAKER_FAILURES,
+        reset_timeout: float = UPSTREAM_BREAKER_RESET,
+    ):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self.state == "closed":
+                return
+            remaining = self._opened_at + self.reset_timeout - time.monotonic()
+            if self.state == "open" and remaining <= 0:
+                self.state = "half-open"
+                return
+            raise CircuitOpenError(
+                "ADH is unavailable, failing fast", max(remaining, 1.0)
+            )
+
+    def cancel(self):
+        """Give back a probe that was let through but never made."""
+        with self._lock:
+            if self.state == "half-open":
+                self.state = "open"
+                self._opened_at = time.monotonic() - self.reset_timeout
+
+    def record(self, ok: bool):
+        with self._lock:
+            if ok:
+                self.state = "closed"
+                self.failures = 0
+                return
+            self.failures += 1
+            if self.state == "half-open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    logging.warning("Opening ADH circuit breaker")
+                self.state = "open"
+                self._opened_at = time.monotonic()
+
+
+class LatencyTracker:
+    """Recent successful latencies per operation."""
+
+    def __init__(self, window: int = 500, min_samples: int = 20):
+        self.window = window
+        self.min_samples = min_samples
+        self._samples: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, operation: str, latency: float):
+        with self._lock:
+            samples = self._samples.get(operation)
+            if samples is None:
+                samples = self._samples[operation] = deque(maxlen=self.window)
+            samples.append(latency)
+
+    def percentile(self, operation: str, percentile: float) -> Optional[float]:
+        """Return the latency percentile, or None until there are enough samples."""
+        with self._lock:
+            samples = sorted(self._samples.get(operation, ()))
+        if len(samples) < self.min_samples:
+            return None
+        index = min(len(samples) - 1, int(len(samples) * percentile / 100))
+        return samples[index]
+
+
+class HedgeBudget:
+    """Token bucket earning `ratio` tokens per hedgeable call, one per hedge."""
+
+    def __init__(self, ratio: float = UPSTREAM_HEDGE_BUDGET, burst: float = 10.0):
+        self.ratio = ratio
+        self.burst = burst
+        self.tokens = 0.0
+        self.sent = 0
+        self.won = 0
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self.tokens = min(self.burst, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        with self._lock:
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            self.sent += 1
+            return True
+
+
+limiter = AdaptiveLimiter()
+breaker = CircuitBreaker()
+latencies = LatencyTracker()
+hedge_budget = HedgeBudget()
+_hedge_pool = ThreadPoolExecutor(
+    max_workers=2 * UPSTREAM_CONCURRENCY_MAX, thread_name_prefix="adh-hedge"
+)
+
+
+def _guarded(
+    fn: Callable,
+    args,
+    kwargs,
+    operation: Optional[str],
+    started: Optional[threading.Event] = None,
+) -> Any:
+    operation = operation or getattr(fn, "__qualname__", repr(fn))
+    key = call_key(operation, fn, args, kwargs)
+    breaker.before_call()
+    try:
+        priority = limiter.acquire()
+    except OverloadedError:
+        breaker.cancel()
+        raise
+    if started is not None:
+        started.set()
+    # Latencies count only the time spent upstream, not the queue
+    began = time.monotonic()
+    ok = True
+    try:
+        return fn(*args, **kwargs)
+    except Exception as e:
+        ok = not is_upstream_failure(e)
+        raise
+    else:
+        latencies.record(key, time.monotonic() - began)
+    finally:
+        limiter.release(key, time.monotonic() - began, ok, priority)
+        breaker.record(ok)
+
+
+def call(fn: Callable, *args, operation: str = None, **kwargs) -> Any:
+    """Call `fn` under the circuit breaker and the adaptive concurrency limit."""
+    return _guarded(fn, args, kwargs, operation)
+
+
+def _submit(fn: Callable, *args, **kwargs):
+    # Run in the caller's context so context variables follow the call
+    return _hedge_pool.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def hedged_call(fn: Callable, *args, operation: str, **kwargs) -> Any:
+    """Like `call`, but send a second request if the first one is slow.
+
+    The delay is the latency percentile of calls of the same operation and
+    size class, counted from when the first request got its limiter slot. No
+    second request is sent while the limiter is full. Only use this for
+    idempotent reads: both requests may reach ADH.
+    """
+    delay = latencies.percentile(
+        call_key(operation, fn, args, kwargs), UPSTREAM_HEDGE_PERCENTILE
+    )
+    hedge_budget.deposit()
+    started = threading.Event()
+    primary = _submit(_guarded, fn, args, kwargs, operation, started)
+    if delay is None:
+        return primary.result()
+    # Set as well when the call fails before it starts
+    primary.add_done_callback(lambda _: started.set())
+    started.wait()
+    try:
+        return primary.result(timeout=delay)
+    except FutureTimeoutError:
+        pass
+    if limiter.inflight >= int(limiter.limit) or not hedge_budget.withdraw():
+        return primary.result()
+
+    backup = _submit(_guarded, fn, args, kwargs, operation)
+    pending = {primary, backup}
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                if future is backup:
+                    hedge_budget.won += 1
+                return future.result()
+            error = future.exception()
+    raise error
+
+
+def upstream_state() -> Dict:
+    return {
+        "breaker": breaker.state,
+        "failures": breaker.failures,
+        "limit": int(limiter.limit),
+        "inflight": limiter.inflight,
+        "running": dict(limiter.running),
+        "waiting": dict(limiter.waiting),
+        "shed": limiter.shed,
+        "hedges_sent": hedge_budget.sent,
+        "hedges_won": hedge_budget.won,
+    }
+
+
+class _GuardedService:
+    def __init__(self, service):
+        self._service = service
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._service, name)
+        if not callable(attr):
+            return attr
+
+        operation = f"{type(self._service).__name__}.{name}"
+        if UPSTREAM_HEDGING and operation in HEDGED_OPERATIONS:
+
+            def guarded(*args, **kwargs):
+                return hedged_call(attr, *args, operation=operation, **kwargs)
+
+        else:
+
+            def guarded(*args, **kwargs):
+                return call(attr, *args, operation=operation, **kwargs)
+
+        return guarded
+
+
+class GuardedClient:
+    """Proxy of an ADH client whose service methods go through `call`."""
+
+    def __init__(self, client):
+        self._client = client
+        self._services: Dict[str, _GuardedService] = {}
+
+    def __getattr__(self, name: str):
+        if name not in self._services:
+            attr = getattr(self._client, name)
+            if inspect.isroutine(attr) or isinstance(attr, (str, int, float, bool)):
+                return attr
+            self._services[name] = _GuardedService(attr)
+        return self._services[name]
@@ -0,0 +1,67 @@
+"""Startup warm-up of the ADH client and catalog listings."""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Callable, Dict
+
+from .catalog import get_catalog
+from .client import get_adh_client
+from .upstream import background
+
+# Build the client and prefetch the catalogs when the application starts
+STARTUP_WARMUP: bool = os.getenv("STARTUP_WARMUP", "false").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+
+_state: Dict = {
+    "status": "disabled",
+    "import_seconds": None,
+    "seconds": {},
+    "error": None,
+}
+
+
+def record_import_time(seconds: float):
+    _state["import_seconds"] = seconds
+    logging.info(f"Application imported in {seconds * 1000:.0f} ms")
+
+
+def startup_state() -> Dict:
+    """Return import time and warm-up progress."""
+    return {**_state, "seconds": dict(_state["seconds"])}
+
+
+def warm_up(loaders: Dict[str, Callable]):
+    """Build the ADH client and prefetch the catalog listings.
+
+    The first catalog request also acquires the client's access token, so
+    later requests find both the token and the listings ready.
+    """
+    _state["status"] = "running"
+    _state["seconds"] = {}
+    started = time.perf_counter()
+    try:
+        get_adh_client()
+        _state["seconds"]["client"] = time.perf_counter() - started
+        for kind, loader in loaders.items():
+            step = time.perf_counter()
+            get_catalog(kind, loader)
+            _state["seconds"][kind] = time.perf_counter() - step
+        _state["status"] = "done"
+    except Exception as e:
+        _state["status"] = "failed"
+        _state["error"] = str(e)
+        logging.warning(f"Startup warm-up failed: {str(e)}")
+    _state["seconds"]["total"] = time.perf_counter() - started
+
+
+def start_warm_up(loaders: Dict[str, Callable]) -> asyncio.Task:
+    """Run `warm_up` in a worker thread without blocking startup."""
+    _state["status"] = "pending"
+    with background():
+        # The task runs in a copy of the current context
+        return asyncio.create_task(asyncio.to_thread(warm_up, loaders))
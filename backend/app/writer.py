@@ -0,0 +1,188 @@
+"""Batched write pipeline for forecast output streams."""
+
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from .client import NAMESPACE_ID, get_adh_client
+from .model import ML_FORECAST_STREAMS, forecast_stream_id
+from .upstream import background
+
+# Maximum number of values sent to ADH in a single insert/update call
+FORECAST_WRITE_BATCH_SIZE: int = int(os.getenv("FORECAST_WRITE_BATCH_SIZE", "5000"))
+# Number of streams written concurrently during a flush
+FORECAST_WRITE_WORKERS: int = int(os.getenv("FORECAST_WRITE_WORKERS", "4"))
+FORECAST_WRITE_RETRIES: int = int(os.getenv("FORECAST_WRITE_RETRIES", "3"))
+FORECAST_WRITE_BACKOFF: float = float(os.getenv("FORECAST_WRITE_BACKOFF", "0.5"))
+# Flushes a failing stream is kept buffered for before its points are dropped
+FORECAST_WRITE_MAX_FLUSHES: int = int(os.getenv("FORECAST_WRITE_MAX_FLUSHES", "3"))
+
+
+class ForecastWriter:
+    """Buffer forecast points per stream and flush them in bounded bulk writes.
+
+    Points are keyed by timestamp, so adding the same point twice (or
+    retrying a failed flush) never produces duplicates: values are written
+    with an SDS update, which inserts missing events and replaces existing
+    ones.
+
+    A writer holds the points of one producer (e.g. one request), so the
+    outcome of a flush only covers points that producer added.
+    """
+
+    def __init__(
+        self,
+        client=None,
+        batch_size: int = FORECAST_WRITE_BATCH_SIZE,
+        workers: int = FORECAST_WRITE_WORKERS,
+        retries: int = FORECAST_WRITE_RETRIES,
+        backoff: float = FORECAST_WRITE_BACKOFF,
+        max_flushes: int = FORECAST_WRITE_MAX_FLUSHES,
+    ):
+        self._client = client
+        self.batch_size = max(1, batch_size)
+        self.workers = max(1, workers)
+        self.retries = max(0, retries)
+        self.backoff = backoff
+        self.max_flushes = max(1, max_flushes)
+        self._lock = threading.Lock()
+        self._buffer: Dict[str, Dict[str, float]] = {}
+        self._pending = 0
+        # Consecutive flushes in which writes to a stream failed
+        self._failures: Dict[str, int] = {}
+
+    @property
+    def pending(self) -> int:
+        """Number of points waiting to be flushed."""
+        return self._pending
+
+    def add(
+        self,
+        model_id: str,
+        timestamp: str,
+        forecast: float,
+        lower: Optional[float] = None,
+        upper: Optional[float] = None,
+    ):
+        """Buffer one forecast point for all output streams of a model."""
+        values = dict(zip(ML_FORECAST_STREAMS, [forecast, lower, upper]))
+        with self._lock:
+            for forecast_name, value in values.items():
+                if value is None:
+                    continue
+                stream = self._buffer.setdefault(
+                    forecast_stream_id(model_id, forecast_name), {}
+                )
+                if timestamp not in stream:
+                    self._pending += 1
+                stream[timestamp] = value
+
+    def flush(self) -> Dict:
+        """Write all buffered points and return throughput statistics.
+
+        Chunks that still fail after all retries are put back into the buffer
+        so the next flush picks them up again, until writes to their stream
+        have failed in ``max_flushes`` consecutive flushes; then they are
+        dropped. ``errors`` maps every failing stream to its last error.
+        """
+        with self._lock:
+            buffer, self._buffer = self._buffer, {}
+            self._pending = 0
+
+        chunks: List[Tuple[str, List[Dict]]] = []
+        for stream_id, points in buffer.items():
+            events = [
+                {"Timestamp": timestamp, "Value": points[timestamp]}
+                for timestamp in sorted(points)
+            ]
+            for i in range(0, len(events), self.batch_size):
+                chunks.append((stream_id, events[i : i + self.batch_size]))
+
+        stats = {
+            "streams": len(buffer),
+            "points": 0,
+            "requests": 0,
+            "retries": 0,
+            "failed": 0,
+            "dropped": 0,
+            "errors": {},
+            "seconds": 0.0,
+            "points_per_second": 0.0,
+        }
+        if not chunks:
+            return stats
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(chunks))) as pool:
+            results = list(pool.map(lambda chunk: self._write(*chunk), chunks))
+
+        failed: Dict[str, List[Dict]] = {}
+        for (stream_id, events), (error, attempts) in zip(chunks, results):
+            stats["requests"] += attempts
+            stats["retries"] += attempts - 1
+            if error is None:
+                stats["points"] += len(events)
+            else:
+                stats["failed"] += len(events)
+                stats["errors"][stream_id] = error
+                failed.setdefault(stream_id, []).extend(events)
+        for stream_id in buffer:
+            if stream_id not in failed:
+                self._failures.pop(stream_id, None)
+        for stream_id, events in failed.items():
+            self._failures[stream_id] = self._failures.get(stream_id, 0) + 1
+            if self._failures[stream_id] >= self.max_flushes:
+                logging.warning(
+                    f"Dropping {len(events)} values for {stream_id} after "
+                    f"{self._failures[stream_id]} failed flushes"
+                )
+                stats["dropped"] += len(events)
+                del self._failures[stream_id]
+            else:
+                self._requeue(stream_id, events)
+
+        stats["seconds"] = time.perf_counter() - start
+        if stats["seconds"] > 0:
+            stats["points_per_second"] = stats["points"] / stats["seconds"]
+        logging.info(
+            "Flushed %d forecast points to %d streams in %d requests (%.0f points/s)",
+            stats["points"],
+            stats["streams"],
+            stats["requests"],
+            stats["points_per_second"],
+        )
+        return stats
+
+    def _write(self, stream_id: str, events: List[Dict]) -> Tuple[Optional[str], int]:
+        """Write one chunk, returning its last error (None on success) and attempts."""
+        client = self._client or get_adh_client()
+        payload = json.dumps(events)
+        error = None
+        for attempt in range(1, self.retries + 2):
+            try:
+                # Bulk writes yield to interactive reads
+                with background():
+                    client.Streams.updateValues(NAMESPACE_ID, stream_id, payload)
+                return None, attempt
+            except Exception as e:
+                error = str(e)
+                logging.warning(
+                    f"Write of {len(events)} values to {stream_id} failed "
+                    f"(attempt {attempt}): {str(e)}"
+                )
+                if attempt <= self.retries:
+                    time.sleep(self.backoff * 2 ** (attempt - 1))
+        return error, self.retries + 1
+
+    def _requeue(self, stream_id: str, events: List[Dict]):
+        with self._lock:
+            stream = self._buffer.setdefault(stream_id, {})
+            for event in events:
+                # Points added since the flush started are newer, keep them
+                if event["Timestamp"] not in stream:
+                    stream[event["Timestamp"]] = event["Value"]
+                    self._pending += 1
@@ -0,0 +1,140 @@
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pytest
+
+from app import features
+from app.backtest import backtest, run_backtest
+from app.features import FeatureMatrix
+from app.regression import accumulate, fit, fit_statistics, predict
+
+
+def make_features(n: int = 400, lag: int = 4, lead: int = 3, noise: float = 0.0):
+    """Target driven linearly by its own past and a known future input."""
+    rng = np.random.default_rng(0)
+    future = rng.normal(size=n)
+    target = np.zeros(n)
+    for t in range(2, n):
+        target[t] = 0.6 * target[t - 1] - 0.2 * target[t - 2] + future[t]
+    target += noise * rng.normal(size=n)
+    data = np.column_stack([target, future])
+    timestamps = np.datetime64("2024-01-01T00:00", "ms") + np.arange(
+        n
+    ) * np.timedelta64(1, "m")
+    return FeatureMatrix(timestamps, data, 1, 0, 1, lag, lead)
+
+
+@pytest.mark.unit
+def test_fit_recovers_linear_relation():
+    X = np.random.default_rng(1).normal(size=(200, 3))
+    y = X @ np.array([[1.0], [-2.0], [0.5]]) + 3.0
+
+    coef = fit(X, y)
+
+    np.testing.assert_allclose(predict(coef, X), y, atol=1e-4)
+
+
+@pytest.mark.unit
+def test_accumulated_statistics_match_a_full_fit():
+    rng = np.random.default_rng(2)
+    X = rng.normal(size=(300, 3))
+    y = X @ np.array([[1.0], [-2.0], [0.5]]) + 0.1 * rng.normal(size=(300, 1))
+
+    stats = accumulate(None, X[:100], y[:100])
+    stats = accumulate(stats, X[100:], y[100:])
+    coef, sigma = fit_statistics(stats)
+
+    np.testing.assert_allclose(coef, fit(X, y), atol=1e-8)
+    residuals = predict(coef, X) - y
+    assert sigma[0] == pytest.approx(np.sqrt((residuals**2).sum() / (300 - 4)))
+
+    # Forgetting weighs every sample by its age, however the rows are split
+    whole = accumulate(None, X, y, forgetting=0.9)
+    split = accumulate(accumulate(None, X[:7], y[:7], 0.9), X[7:], y[7:], 0.9)
+    for key in whole:
+        np.testing.assert_allclose(split[key], whole[key])
+
+
+@pytest.mark.unit
+def test_backtest_of_linear_process_beats_persistence():
+    result = backtest(make_features(), folds=5, workers=2)
+
+    assert len(result["folds"]) == 5
+    assert result["overall"]["mae"] < 1e-4
+    assert result["overall"]["skill"] > 0.99
+    assert len(result["horizon_mae"]) == 3
+
+
+@pytest.mark.unit
+def test_folds_train_only_on_earlier_labels():
+    matrix = make_features(n=100, lead=3)
+    n = len(matrix)
+
+    expanding = backtest(matrix, folds=4)
+    sliding = backtest(matrix, folds=4, train=20)
+
+    starts = [n // 2 + k * ((n - n // 2) // 4) for k in range(4)]
+    # Labels of a sample reach lead - 1 origins ahead
+    assert [f["train_samples"] for f in expanding["folds"]] == [s - 2 for s in starts]
+    assert [f["train_samples"] for f in sliding["folds"]] == [20] * 4
+    assert sum(f["test_samples"] for f in expanding["folds"]) == n - n // 2
+
+
+@pytest.mark.unit
+def test_backtest_matches_fitting_each_fold():
+    matrix = make_features(noise=0.3)
+    X, y = matrix.design_matrix(dropna=False)
+
+    result = backtest(matrix, folds=2, train=100)
+
+    # Training labels of the first fold end one lead window before it
+    start = 102
+    coef = fit(X[:100], y[:100])
+    size = (len(X) - start) // 2
+    error = predict(coef, X[start : start + size]) - y[start : start + size]
+    assert result["folds"][0]["mae"] == pytest.approx(np.abs(error).mean())
+
+
+@pytest.mark.unit
+def test_rejects_unsupported_model_type():
+    model = {"id": "m", "model_type": "XGBOOST"}
+    with pytest.raises(ValueError, match="Unsupported model type"):
+        run_backtest(model, "2024-01-01T00:00:00Z", "2024-01-02T00:00:00Z")
+
+
+@pytest.mark.unit
+def test_run_backtest_fetches_once(tmp_path):
+    client = MagicMock()
+    values = make_features(n=200).data
+
+    def interpolated(namespace_id, stream_id, value_class, start, end, count):
+        column = values[:count, ["t", "f"].index(stream_id)]
+        return [{"Timestamp": "", "Value": v} for v in column]
+
+    client.Streams.getRangeValuesInterpolated.side_effect = interpolated
+    model = {
+        "id": "m",
+        "model_type": "LINEAR",
+        "target": ["t"],
+        "past": [],
+        "future": ["f"],
+        "interval": 60,
+        "lag": 4,
+        "lead": 3,
+    }
+
+    with patch.object(features, "FEATURE_CACHE_DIR", str(tmp_path)):
+        result = run_backtest(
+            model, "2024-01-01T00:00:00Z", "2024-01-01T03:19:00Z", 8, client=client
+        )
+
+    assert len(result["folds"]) == 8
+    assert client.Streams.getRangeValuesInterpolated.call_count == 2
+    assert result["overall"]["mae"] < 1e-4
+
+
+@pytest.mark.unit
+def test_backtest_endpoint_unknown_model(client):
+    with patch("app.main.catalog_listing", return_value=[]):
+        response = client.get("/connect/backtest?asset_id=x&start=a&end=b")
+    assert response.status_code == 404
@@ -0,0 +1,125 @@
+import threading
+from typing import List
+from unittest.mock import patch
+
+import pytest
+from fastapi import HTTPException, Query
+
+from app.batch import bind_params, run_batch
+
+
+def get_values(stream_id: str, count: int, align: bool = False):
+    return {"stream_id": stream_id, "count": count, "align": align}
+
+
+def get_many(stream_id: List[str] = Query(...)):
+    return stream_id
+
+
+def get_missing(asset_id: str):
+    raise HTTPException(status_code=404, detail=f"{asset_id} not found")
+
+
+OPERATIONS = {
+    "/connect/values": get_values,
+    "/connect/many": get_many,
+    "/connect/missing": get_missing,
+}
+
+
+@pytest.mark.unit
+def test_bind_params_converts_query_strings():
+    kwargs = bind_params(
+        get_values, {"stream_id": "s1", "count": "10", "align": "true"}
+    )
+
+    assert kwargs == {"stream_id": "s1", "count": 10, "align": True}
+    assert bind_params(get_many, {"stream_id": ["a", "b"]}) == {"stream_id": ["a", "b"]}
+
+
+@pytest.mark.unit
+def test_bind_params_rejects_bad_parameters():
+    with pytest.raises(ValueError, match="Missing parameter: count"):
+        bind_params(get_values, {"stream_id": "s1"})
+    with pytest.raises(ValueError, match="Invalid parameter count"):
+        bind_params(get_values, {"stream_id": "s1", "count": "many"})
+    with pytest.raises(ValueError, match="Unknown parameters: other"):
+        bind_params(get_values, {"stream_id": "s1", "count": 1, "other": 2})
+    with pytest.raises(ValueError, match="Missing parameter: stream_id"):
+        bind_params(get_many, {})
+
+
+@pytest.mark.unit
+def test_failures_only_affect_their_own_result():
+    results = run_batch(
+        OPERATIONS,
+        [
+            {
+                "id": "a",
+                "path": "/connect/values",
+                "params": {"stream_id": "s1", "count": 5},
+            },
+            {"id": "b", "path": "/connect/missing", "params": {"asset_id": "x"}},
+            {"id": "c", "path": "/connect/unknown"},
+            {"id": "d", "path": "/connect/values", "params": {"stream_id": "s1"}},
+        ],
+    )
+
+    assert [(r["id"], r["status"]) for r in results] == [
+        ("a", 200),
+        ("b", 404),
+        ("c", 404),
+        ("d", 422),
+    ]
+    assert results[0]["body"] == {"stream_id": "s1", "count": 5, "align": False}
+    assert results[1]["body"] == {"detail": "x not found"}
+
+
+@pytest.mark.unit
+def test_sub_requests_run_concurrently():
+    barrier = threading.Barrier(3, timeout=5)
+
+    def wait_for_others(stream_id: str):
+        barrier.wait()
+        return stream_id
+
+    requests = [
+        {"path": "/connect/wait", "params": {"stream_id": f"s{i}"}} for i in range(3)
+    ]
+    results = run_batch({"/connect/wait": wait_for_others}, requests, concurrency=3)
+
+    assert [r["body"] for r in results] == ["s0", "s1", "s2"]
+
+
+@pytest.mark.unit
+def test_batch_endpoint(client):
+    models = [{"id": "m1", "name": "Model 1"}]
+    with patch("app.main.get_catalog", return_value=models):
+        response = client.post(
+            "/connect/batch",
+            json=[
+                {"id": "models", "path": "/connect/models"},
+                {"id": "bad", "path": "/connect/stream_values", "params": {}},
+            ],
+        )
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body[0] == {
+        "id": "models",
+        "path": "/connect/models",
+        "status": 200,
+        "body": models,
+    }
+    assert body[1]["status"] == 422
+
+
+@pytest.mark.unit
+def test_batch_endpoint_limits_size(client):
+    with patch("app.batch.BATCH_MAX_REQUESTS", 1):
+        response = client.post(
+            "/connect/batch",
+            json=[{"path": "/connect/models"}, {"path": "/connect/streams"}],
+        )
+
+    assert response.status_code == 400
@@ -0,0 +1,121 @@
+import csv
+import io
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.export import get_export, iter_export, start_export
+from app.main import BATCH_OPERATIONS
+
+
+def event(minute: int, value) -> dict:
+    return {"Timestamp": f"2024-01-01T00:{minute:02d}:00Z", "Value": value}
+
+
+def make_client(streams: dict, page_size: int = 2) -> MagicMock:
+    """Serve the events of every stream in pages of `page_size`."""
+    client = MagicMock()
+
+    def paged(namespace_id, stream_id, start, end, count, continuation_token, **_):
+        events = streams[stream_id]
+        offset = int(continuation_token or 0)
+        page = events[offset : offset + count]
+        token = str(offset + count) if offset + count < len(events) else None
+        return SimpleNamespace(Results=page, ContinuationToken=token)
+
+    client.Streams.getWindowValuesPaged.side_effect = paged
+    return client
+
+
+STREAMS = {
+    "a": [event(0, 1.0), event(1, 2.0), event(2, None)],
+    "b": [event(0, 10.0), event(5, 20.0)],
+}
+
+
+@pytest.mark.unit
+def test_csv_export_pages_all_streams():
+    job, encoder = start_export(["a", "b"], "s", "e", "csv")
+
+    body = b"".join(iter_export(job, encoder, make_client(STREAMS), page_size=2))
+
+    rows = list(csv.reader(io.StringIO(body.decode())))
+    assert rows[0] == ["stream_id", "timestamp", "value"]
+    assert sorted(rows[1:]) == [
+        ["a", "2024-01-01T00:00:00.000Z", "1.0"],
+        ["a", "2024-01-01T00:01:00.000Z", "2.0"],
+        ["a", "2024-01-01T00:02:00.000Z", ""],
+        ["b", "2024-01-01T00:00:00.000Z", "10.0"],
+        ["b", "2024-01-01T00:05:00.000Z", "20.0"],
+    ]
+    state = get_export(job.id)
+    assert state["status"] == "done"
+    assert (state["streams_done"], state["pages"], state["rows"]) == (2, 3, 5)
+    assert state["bytes"] == len(body)
+
+
+@pytest.mark.unit
+def test_parquet_export_round_trips():
+    pq = pytest.importorskip("pyarrow.parquet")
+    job, encoder = start_export(["a", "b"], "s", "e", "parquet")
+
+    body = b"".join(iter_export(job, encoder, make_client(STREAMS)))
+
+    table = pq.read_table(io.BytesIO(body)).to_pydict()
+    assert sorted(zip(table["stream_id"], table["value"]), key=str) == sorted(
+        [("a", 1.0), ("a", 2.0), ("a", None), ("b", 10.0), ("b", 20.0)], key=str
+    )
+
+
+@pytest.mark.unit
+def test_failing_stream_aborts_export():
+    client = make_client(STREAMS)
+    client.Streams.getWindowValuesPaged.side_effect = RuntimeError("upstream down")
+    job, encoder = start_export(["a"], "s", "e", "csv")
+
+    with pytest.raises(RuntimeError):
+        b"".join(iter_export(job, encoder, client))
+
+    assert get_export(job.id)["status"] == "failed"
+
+
+@pytest.mark.unit
+def test_closing_the_download_cancels_the_export():
+    streams = {"a": [event(m, float(m)) for m in range(50)]}
+    job, encoder = start_export(["a"], "s", "e", "csv")
+    chunks = iter_export(job, encoder, make_client(streams), queue_pages=1)
+
+    next(chunks)
+    next(chunks)
+    chunks.close()
+
+    assert get_export(job.id)["status"] == "cancelled"
+
+
+@pytest.mark.unit
+def test_rejects_bad_requests():
+    with pytest.raises(ValueError, match="No streams"):
+        start_export([], "s", "e")
+    with pytest.raises(ValueError, match="Unknown export format"):
+        start_export(["a"], "s", "e", "xlsx")
+
+
+@pytest.mark.unit
+def test_export_endpoint_streams_asset_references(client):
+    adh = make_client(STREAMS)
+    adh.Assets.getAssetById.return_value = MagicMock(
+        StreamReferences=[MagicMock(StreamId="b")]
+    )
+    with (
+        patch("app.export.get_adh_client", return_value=adh),
+        patch("app.main.get_adh_client", return_value=adh),
+    ):
+        response = client.get("/connect/export?start=s&end=e&stream_id=a&asset_id=x")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert len(response.text.splitlines()) == 6
+    progress = client.get(f"/connect/export/{response.headers['x-export-id']}")
+    assert progress.json()["status"] == "done"
+    assert "/connect/export" not in BATCH_OPERATIONS
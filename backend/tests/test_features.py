@@ -0,0 +1,101 @@
+import os
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pytest
+
+from app.features import build_features, load_base_arrays
+
+
+def make_client():
+    """Fake ADH client returning value = column * 100 + sample index."""
+    client = MagicMock()
+    offsets = {"target": 0, "past": 100, "future": 200}
+
+    def interpolated(namespace_id, stream_id, value_class, start, end, count):
+        return [
+            {"Timestamp": "", "Value": offsets[stream_id] + i} for i in range(count)
+        ]
+
+    client.Streams.getRangeValuesInterpolated.side_effect = interpolated
+    return client
+
+
+def build(client, tmp_path):
+    return build_features(
+        "asset",
+        ["target"],
+        ["past"],
+        ["future"],
+        interval=60,
+        lag=3,
+        lead=2,
+        start="2024-01-01T00:00:00Z",
+        end="2024-01-01T00:09:00Z",
+        client=client,
+        cache_dir=str(tmp_path),
+    )
+
+
+@pytest.mark.unit
+def test_windows_are_aligned_views(tmp_path):
+    features = build(make_client(), tmp_path)
+
+    assert len(features.timestamps) == 10
+    assert len(features) == 10 - 3 - 2 + 1
+    assert np.shares_memory(features.history, features.data)
+    # first origin is sample 2: history 0..2, lead covariates and labels 3..4
+    np.testing.assert_array_equal(features.history[0], [[0, 1, 2], [100, 101, 102]])
+    np.testing.assert_array_equal(features.ahead[0], [[203, 204]])
+    np.testing.assert_array_equal(features.labels[0], [[3, 4]])
+    assert str(features.origins[0]) == "2024-01-01T00:02:00.000"
+
+
+@pytest.mark.unit
+def test_design_matrix_shape(tmp_path):
+    X, y = build(make_client(), tmp_path).design_matrix()
+
+    assert X.shape == (6, 2 * 3 + 2)
+    assert y.shape == (6, 2)
+
+
+@pytest.mark.unit
+def test_base_arrays_are_cached_as_memmaps(tmp_path):
+    client = make_client()
+    build(client, tmp_path)
+    calls = client.Streams.getRangeValuesInterpolated.call_count
+
+    features = build(client, tmp_path)
+
+    assert client.Streams.getRangeValuesInterpolated.call_count == calls
+    assert isinstance(features.data, np.memmap)
+
+
+@pytest.mark.unit
+def test_recent_ranges_are_not_cached(tmp_path):
+    client = make_client()
+    now = np.datetime64("now", "m")
+    start, end = (f"{t}:00Z" for t in (now - np.timedelta64(9, "m"), now))
+
+    load_base_arrays("asset", ["target"], 60, start, end, client, str(tmp_path))
+
+    assert os.listdir(tmp_path) == []
+
+
+@pytest.mark.unit
+def test_cache_evicts_least_recently_used(tmp_path):
+    client = make_client()
+
+    def load(hour: int):
+        start = f"2024-01-01T{hour:02d}:00:00Z"
+        end = f"2024-01-01T{hour:02d}:09:00Z"
+        load_base_arrays("asset", ["target"], 60, start, end, client, str(tmp_path))
+        return client.Streams.getRangeValuesInterpolated.call_count
+
+    load(0)
+    entry = sum(f.stat().st_size for f in tmp_path.iterdir())
+    with patch("app.features.FEATURE_CACHE_MAX_BYTES", entry):
+        calls = load(1)
+        assert len(list(tmp_path.glob("*.index.npy"))) == 1
+        assert load(1) == calls
+        assert load(0) == calls + 1
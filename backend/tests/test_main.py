@@ -1,3 +1,5 @@
+from unittest.mock import MagicMock, patch
+
 import pytest
 from fastapi import HTTPException
 
@@ -165,4 +167,128 @@ def test_delete_nonexistent_model(client):
 def test_stream_values_invalid_parameters(client):
     """Test stream values with invalid parameters."""
     response = client.get("/connect/stream_values?stream_id=invalid&start=invalid&end=invalid&count=invalid")
-    assert response.status_code in [400, 422, 500]  # Should handle validation errors
\ No newline at end of file
+    assert response.status_code in [400, 422, 500]  # Should handle validation errors
+
+
+def _model_asset():
+    from adh_sample_library_preview import MetadataItem, StreamReference
+    from adh_sample_library_preview.Asset import Asset
+
+    asset = Asset(id="m1", name="Model 1")
+    asset.Metadata = [MetadataItem(id="target", name="target", value="Flow")]
+    asset.StreamReferences = [
+        StreamReference("Flow", "Flow Meter", "Flow"),
+        StreamReference("Pressure", "Pressure", "Pressure"),
+        StreamReference("Forecast", "IndyIQ ML Forecast", "m1 Forecast"),
+        StreamReference(
+            "Forecast Lower", "IndyIQ ML Forecast Lower", "m1 Forecast Lower"
+        ),
+        StreamReference(
+            "Forecast Upper", "IndyIQ ML Forecast Upper", "m1 Forecast Upper"
+        ),
+    ]
+    return asset
+
+
+@pytest.mark.unit
+def test_model_values_joins_actuals_with_forecasts(client):
+    """Test that model values align targets and forecast bands on one axis."""
+    from app.model import model_streams
+
+    model_streams.cache_clear()
+    adh = MagicMock()
+    adh.Assets.getAssetById.return_value = _model_asset()
+    adh.Assets.getAssetInterpolatedData.return_value.toDictionary.return_value = {
+        "Results": {
+            "Flow Meter": [{"Timestamp": "2024-01-01T00:00:00Z", "Value": 1.0}],
+            "IndyIQ ML Forecast": [
+                {"Timestamp": "2024-01-01T00:00:00Z", "Value": 1.5},
+                {"Timestamp": "2024-01-01T01:00:00Z", "Value": 2.0},
+            ],
+        }
+    }
+    models = [{"id": "m1", "version": "2024-01-01T00:00:00"}]
+    params = {"asset_id": "m1", "start": "2024-01-01", "end": "2024-01-02", "count": 2}
+
+    with (
+        patch("app.main.get_catalog", return_value=models),
+        patch("app.main.get_adh_client", return_value=adh),
+        patch("app.model.get_adh_client", return_value=adh),
+    ):
+        response = client.get("/connect/model_values", params=params)
+        client.get("/connect/model_values", params=params)
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "timestamps": ["2024-01-01T00:00:00.000Z", "2024-01-01T01:00:00.000Z"],
+        "streams": ["Flow", "Forecast", "Forecast Lower", "Forecast Upper"],
+        "values": [[1.0, None], [1.5, 2.0], [None, None], [None, None]],
+        "targets": ["Flow"],
+    }
+    # References are resolved once per asset version
+    adh.Assets.getAssetById.assert_called_once()
+    assert adh.Assets.getAssetInterpolatedData.call_args.kwargs["stream"] == [
+        "Flow Meter",
+        "IndyIQ ML Forecast",
+        "IndyIQ ML Forecast Lower",
+        "IndyIQ ML Forecast Upper",
+    ]
+
+
+@pytest.mark.unit
+def test_model_values_cache_follows_model_version(client, tmp_path):
+    """Test that stored model history is not served after the model changed."""
+    from app.model import model_streams
+    from app.store import HistoryStore
+
+    model_streams.cache_clear()
+    adh = MagicMock()
+    adh.Assets.getAssetById.return_value = _model_asset()
+    adh.Assets.getAssetInterpolatedData.return_value.toDictionary.return_value = {
+        "Results": {}
+    }
+    store = HistoryStore(str(tmp_path / "history.db"), horizon=3600)
+    params = {"asset_id": "m1", "start": "2020-01-01", "end": "2020-01-02", "count": 2}
+
+    with (
+        patch("app.main.get_adh_client", return_value=adh),
+        patch("app.model.get_adh_client", return_value=adh),
+        patch("app.store.get_history_store", return_value=store),
+    ):
+        for version in ("v1", "v1", "v2"):
+            models = [{"id": "m1", "version": version}]
+            with patch("app.main.get_catalog", return_value=models):
+                assert client.get("/connect/model_values", params=params).is_success
+
+    assert adh.Assets.getAssetInterpolatedData.call_count == 2
+
+
+@pytest.mark.unit
+def test_asset_values_are_read_through_the_store(client, tmp_path):
+    """Test that asset values are stored and served again."""
+    from app.store import HistoryStore
+
+    adh = MagicMock()
+    adh.Assets.getAssetInterpolatedData.return_value.toDictionary.return_value = {
+        "Results": {"s1": [{"Timestamp": "2020-01-01T00:00:00Z", "Value": 1.0}]}
+    }
+    store = HistoryStore(str(tmp_path / "history.db"), horizon=3600)
+    params = {"asset_id": "a1", "start": "2020-01-01", "end": "2020-01-02", "count": 2}
+
+    with (
+        patch("app.main.get_adh_client", return_value=adh),
+        patch("app.store.get_history_store", return_value=store),
+    ):
+        responses = [client.get("/connect/asset_values", params=params) for _ in "ab"]
+
+    assert [r.status_code for r in responses] == [200, 200]
+    assert responses[1].json()["s1"][0]["Value"] == 1.0
+    assert adh.Assets.getAssetInterpolatedData.call_count == 1
+
+
+@pytest.mark.unit
+def test_model_values_unknown_model(client):
+    """Test model values of a model that does not exist."""
+    with patch("app.main.get_catalog", return_value=[]):
+        response = client.get("/connect/model_values?asset_id=x&start=a&end=b&count=1")
+    assert response.status_code == 404
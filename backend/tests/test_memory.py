@@ -0,0 +1,93 @@
+import tracemalloc
+from unittest.mock import patch
+
+import pytest
+from fastapi import HTTPException
+from starlette.middleware import Middleware
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from app import memory
+from app.main import app, track_memory
+
+
+@pytest.fixture
+def tracing():
+    tracemalloc.start()
+    with patch.object(memory, "_routes", {}):
+        yield
+    tracemalloc.stop()
+
+
+@pytest.mark.unit
+def test_track_records_peak_per_route(tracing):
+    with memory.track("/big"):
+        block = bytearray(4 * 2**20)
+        del block
+
+    stats = memory.memory_state()["routes"]["/big"]
+    assert stats["requests"] == 1
+    assert stats["peak_bytes"] >= 4 * 2**20
+    assert stats["last_retained_bytes"] < 2**20
+
+
+@pytest.mark.unit
+def test_track_is_a_no_op_without_tracing():
+    with patch.object(memory, "_routes", {}):
+        with memory.track("/big"):
+            pass
+        assert memory.memory_state()["routes"] == {}
+
+
+@pytest.mark.unit
+def test_check_budget_rejects_oversized_queries():
+    with (
+        patch.object(memory, "_routes", {}),
+        patch.object(memory, "RESPONSE_MAX_ROWS", 100),
+    ):
+        memory.check_budget("/values", 100)
+        with pytest.raises(HTTPException) as error:
+            memory.check_budget("/values", 101)
+        assert memory.memory_state()["routes"]["/values"]["rejected"] == 1
+    assert error.value.status_code == 413
+
+
+@pytest.mark.unit
+def test_oversized_stream_values_rejected_before_fetching(client):
+    with (
+        patch.object(memory, "RESPONSE_MAX_ROWS", 10),
+        patch("app.main.get_adh_client") as get_client,
+    ):
+        response = client.get(
+            "/connect/stream_values?stream_id=s&start=a&end=b&count=11"
+        )
+    assert response.status_code == 413
+    get_client.assert_not_called()
+
+
+@pytest.fixture
+def tracked():
+    middleware = Middleware(BaseHTTPMiddleware, dispatch=track_memory)
+    with (
+        patch.object(app, "user_middleware", [middleware, *app.user_middleware]),
+        patch.object(app, "middleware_stack", None),
+    ):
+        yield
+
+
+@pytest.mark.unit
+def test_memory_middleware_is_off_without_tracing():
+    assert all(
+        m.kwargs.get("dispatch") is not track_memory for m in app.user_middleware
+    )
+
+
+@pytest.mark.unit
+def test_memory_endpoint_reports_traced_routes(client, tracing, tracked):
+    client.get("/api/health")
+    response = client.get("/api/memory?top=3")
+
+    body = response.json()
+    assert body["tracing"] is True
+    assert body["traced_peak_bytes"] >= body["traced_bytes"] > 0
+    assert body["routes"]["/api/health"]["requests"] == 1
+    assert len(body["top"]) == 3
@@ -1,4 +1,5 @@
 import uuid
+from unittest.mock import MagicMock, patch
 
 import pytest
 
@@ -154,3 +155,120 @@ def test_model_constants():
     assert ML_MODEL_TYPE_DESCRIPTION == "Data Model for Forecast"
     assert ML_MODEL_ASSET_TYPE_QUERY == "AssetTypeId:ml_model_id"
     assert DEFAULT_MODEL_TYPE == "LinearRegressionModel"
+
+
+def _existing_asset():
+    from datetime import datetime, timezone
+
+    from adh_sample_library_preview import StreamReference
+    from adh_sample_library_preview.Asset import Asset
+
+    from app.model import ML_FORECAST_STREAMS, model_metadata
+
+    asset = Asset(id="m1", name="Model", description="Old")
+    asset.Metadata = model_metadata(
+        "LINEAR", 5, ["p1"], ["t1"], [], [], 20, 10, "u", "r"
+    )
+    asset.StreamReferences = [
+        StreamReference("t1", "t1", "t1"),
+        StreamReference("p1", "p1", "p1"),
+    ] + [StreamReference(f, f, f"m1 {f}") for f in ML_FORECAST_STREAMS]
+    asset.ModifiedDate = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    return asset
+
+
+def _update(client, **changes):
+    from app.model import update_ml_asset
+
+    fields = dict(
+        id="m1",
+        name="Model",
+        description="Old",
+        model_type="LINEAR",
+        interval=5,
+        past=["p1"],
+        target=["t1"],
+        future=[],
+        status=[],
+        lag=20,
+        lead=10,
+        update="u",
+        retrain="r",
+    )
+    fields.update(changes)
+    with patch("app.model.get_adh_client", return_value=client):
+        return update_ml_asset(**fields)
+
+
+@pytest.mark.unit
+def test_update_without_changes_writes_nothing():
+    client = MagicMock()
+    client.Assets.getAssetById.return_value = _existing_asset()
+
+    _, changes = _update(client)
+
+    assert changes == {}
+    client.Assets.createOrUpdateAsset.assert_not_called()
+    client.Streams.getStream.assert_not_called()
+
+
+@pytest.mark.unit
+def test_update_description_only_writes_asset_once():
+    client = MagicMock()
+    client.Assets.getAssetById.return_value = _existing_asset()
+
+    _, changes = _update(client, description="New")
+
+    assert changes == {"fields": ["description"]}
+    client.Assets.createOrUpdateAsset.assert_called_once()
+    client.Streams.getStream.assert_not_called()
+    client.Streams.getOrCreateStream.assert_not_called()
+    client.AssetTypes.createOrUpdateAssetType.assert_not_called()
+
+
+@pytest.mark.unit
+def test_update_fetches_only_added_streams():
+    client = MagicMock()
+    client.Assets.getAssetById.return_value = _existing_asset()
+    client.Streams.getStream.return_value = MagicMock(
+        Id="f1", Name="f1", Description=""
+    )
+
+    _, changes = _update(client, past=[], future=["f1"])
+
+    assert changes == {
+        "metadata": ["past", "future"],
+        "added": ["f1"],
+        "removed": ["p1"],
+    }
+    client.Streams.getStream.assert_called_once()
+    written = client.Assets.createOrUpdateAsset.call_args.args[1]
+    assert [r.StreamId for r in written.StreamReferences][:2] == ["t1", "f1"]
+    assert len(written.StreamReferences) == 5
+
+
+@pytest.mark.unit
+def test_update_with_stale_version_conflicts():
+    from app.model import ModelConflict
+
+    client = MagicMock()
+    client.Assets.getAssetById.return_value = _existing_asset()
+
+    with pytest.raises(ModelConflict):
+        _update(client, description="New", version="2023-01-01T00:00:00+00:00")
+    _, changes = _update(client, description="New", version="2024-01-01T00:00:00+00:00")
+    assert changes == {"fields": ["description"]}
+
+
+@pytest.mark.unit
+def test_update_forgets_resolved_streams():
+    from app.model import model_streams
+
+    client = MagicMock()
+    client.Assets.getAssetById.return_value = _existing_asset()
+    with patch("app.model.get_adh_client", return_value=client):
+        model_streams("m1", "v1")
+
+    _update(client, description="New")
+
+    assert model_streams.cache_info().currsize == 0
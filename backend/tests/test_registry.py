@@ -0,0 +1,226 @@
+import os
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pytest
+
+from app import features
+from app.registry import ModelNotTrained, ModelRegistry, Predictor, save_predictor
+from app.series import parse_timestamps
+
+MODEL = {
+    "id": "m/1",
+    "model_type": "LINEAR",
+    "target": ["t"],
+    "past": [],
+    "future": ["f"],
+    "interval": 60,
+    "lag": 2,
+    "lead": 2,
+}
+
+
+def make_client(n: int = 120):
+    """Target t = 2 * f + 1 sampled every minute."""
+    f = np.random.default_rng(0).normal(size=n)
+    columns = {"t": 2 * f + 1, "f": f}
+    client = MagicMock()
+
+    def interpolated(namespace_id, stream_id, value_class, start, end, count):
+        return [{"Timestamp": "", "Value": v} for v in columns[stream_id][:count]]
+
+    client.Streams.getRangeValuesInterpolated.side_effect = interpolated
+    return client
+
+
+def make_timed_client(n: int = 240, stored: int = None):
+    """Like `make_client`, but serving each request from its start time.
+
+    Only the first `stored` minutes are stored events; like ADH, later
+    interpolated reads repeat the last stored value.
+    """
+    f = np.random.default_rng(0).normal(size=n)
+    columns = {"t": 2 * f + 1 + 0.01 * np.sin(np.arange(n)), "f": f}
+    origin = np.datetime64("2024-01-01T00:00", "ms")
+    client = MagicMock()
+    client.stored = n if stored is None else stored
+
+    def interpolated(namespace_id, stream_id, value_class, start, end, count):
+        offset = int((parse_timestamps([start])[0] - origin) // np.timedelta64(1, "m"))
+        indices = np.minimum(np.arange(offset, offset + count), client.stored - 1)
+        values = columns[stream_id][indices[indices < n]]
+        return [{"Timestamp": "", "Value": v} for v in values]
+
+    def last_value(namespace_id, stream_id):
+        last = origin + (client.stored - 1) * np.timedelta64(1, "m")
+        return {"Timestamp": f"{last}Z", "Value": columns[stream_id][client.stored - 1]}
+
+    client.Streams.getRangeValuesInterpolated.side_effect = interpolated
+    client.Streams.getLastValue.side_effect = last_value
+    return client
+
+
+def predictor(size: int) -> Predictor:
+    meta = {"target": ["t"], "past": [], "future": [], "lag": 1, "lead": 1}
+    return Predictor(np.zeros((size, 1)), np.zeros(1), meta)
+
+
+@pytest.fixture
+def registry(tmp_path):
+    with patch.object(features, "FEATURE_CACHE_DIR", str(tmp_path / "features")):
+        yield ModelRegistry(str(tmp_path / "models"))
+
+
+@pytest.mark.unit
+def test_train_then_predict(registry):
+    summary = registry.train(
+        MODEL, "2024-01-01T00:00:00Z", "2024-01-01T01:59:00Z", make_client()
+    )
+    model = registry.get("m/1")
+    X = model.design_matrix(
+        [
+            {"history": {"t": [1.0, 1.0]}, "future": {"f": [0.5, -0.5]}},
+            {"history": {"t": [3.0, 3.0]}, "future": {"f": [1.0, 0.0]}},
+        ]
+    )
+    forecast, lower, upper = model.predict(X)
+
+    assert summary["samples"] > 100
+    assert forecast.shape == (2, 1, 2)
+    np.testing.assert_allclose(forecast[:, 0], [[2.0, 0.0], [3.0, 1.0]], atol=1e-3)
+    assert (lower <= forecast).all() and (upper >= forecast).all()
+
+
+@pytest.mark.unit
+def test_update_matches_training_on_all_history(registry, tmp_path):
+    client = make_timed_client()
+    registry.train(MODEL, "2024-01-01T00:00:00Z", "2024-01-01T01:59:00Z", client)
+
+    summary = registry.update(MODEL, "2024-01-01T03:59:00Z", client)
+
+    # Only the windows of the new origins are fetched
+    start = client.Streams.getRangeValuesInterpolated.call_args.kwargs["start"]
+    assert start == "2024-01-01T01:57:00.000Z"
+    full = ModelRegistry(str(tmp_path / "full"))
+    full.train(MODEL, "2024-01-01T00:00:00Z", "2024-01-01T03:59:00Z", client)
+    updated, reference = registry.get("m/1"), full.get("m/1")
+    assert summary["added"] == 120
+    assert updated.meta["samples"] == reference.meta["samples"]
+    assert updated.meta["last_origin"] == reference.meta["last_origin"]
+    np.testing.assert_allclose(updated.coef, reference.coef, atol=1e-9)
+    np.testing.assert_allclose(updated.sigma, reference.sigma, rtol=1e-6)
+
+    again = registry.update(MODEL, "2024-01-01T03:59:00Z", client)
+    assert again["added"] == 0
+
+
+@pytest.mark.unit
+def test_update_stops_at_the_last_stored_event(registry, tmp_path):
+    client = make_timed_client(stored=180)
+    registry.train(MODEL, "2024-01-01T00:00:00Z", "2024-01-01T01:59:00Z", client)
+
+    partial = registry.update(MODEL, "2024-01-01T03:59:00Z", client)
+    assert registry.get("m/1").meta["last_origin"] == "2024-01-01T02:57:00.000Z"
+    # The rest is folded in once it is stored
+    client.stored = 240
+    rest = registry.update(MODEL, "2024-01-01T03:59:00Z", client)
+
+    full = ModelRegistry(str(tmp_path / "full"))
+    full.train(MODEL, "2024-01-01T00:00:00Z", "2024-01-01T03:59:00Z", client)
+    updated, reference = registry.get("m/1"), full.get("m/1")
+    assert partial["added"] + rest["added"] == 120
+    assert updated.meta["last_origin"] == reference.meta["last_origin"]
+    np.testing.assert_allclose(updated.coef, reference.coef, atol=1e-9)
+
+
+@pytest.mark.unit
+def test_update_does_not_cache_features(registry, tmp_path):
+    client = make_timed_client()
+    registry.train(MODEL, "2024-01-01T00:00:00Z", "2024-01-01T01:59:00Z", client)
+    cached = sorted(os.listdir(tmp_path / "features"))
+
+    registry.update(MODEL, "2024-01-01T03:59:00Z", client)
+
+    assert sorted(os.listdir(tmp_path / "features")) == cached
+
+
+@pytest.mark.unit
+def test_update_requires_the_trained_layout(registry):
+    client = make_timed_client()
+    registry.train(MODEL, "2024-01-01T00:00:00Z", "2024-01-01T01:59:00Z", client)
+
+    with pytest.raises(ValueError, match="changed since training"):
+        registry.update({**MODEL, "lag": 3}, "2024-01-01T03:59:00Z", client)
+    with pytest.raises(ModelNotTrained):
+        registry.update({**MODEL, "id": "other"}, "2024-01-01T03:59:00Z", client)
+
+
+@pytest.mark.unit
+def test_rejects_incomplete_inputs(registry):
+    registry.train(MODEL, "2024-01-01T00:00:00Z", "2024-01-01T01:59:00Z", make_client())
+    with pytest.raises(ValueError, match="needs 2 future values of f"):
+        registry.get("m/1").design_matrix([{"history": {"t": [1.0, 1.0]}}])
+
+
+@pytest.mark.unit
+def test_untrained_model(registry):
+    with pytest.raises(ModelNotTrained):
+        registry.get("unknown")
+
+
+@pytest.mark.unit
+def test_lru_is_bounded_by_parameter_bytes(tmp_path):
+    registry = ModelRegistry(str(tmp_path), max_bytes=3 * 8 * 10)
+    for name in "abc":
+        save_predictor(name, predictor(10), str(tmp_path))
+
+    first = registry.get("a")
+    registry.get("b")
+    assert registry.get("a") is first
+    registry.get("c")
+
+    assert list(registry._cache) == ["a", "c"]
+    assert registry.nbytes <= registry.max_bytes
+
+
+@pytest.mark.unit
+def test_retrained_model_is_reloaded(tmp_path):
+    registry = ModelRegistry(str(tmp_path))
+    save_predictor("a", predictor(2), str(tmp_path))
+    assert len(registry.get("a").coef) == 2
+
+    save_predictor("a", predictor(3), str(tmp_path))
+    registry.evict("a")
+    assert len(registry.get("a").coef) == 3
+
+    registry.remove("a")
+    with pytest.raises(ModelNotTrained):
+        registry.get("a")
+
+
+@pytest.mark.unit
+def test_predict_endpoint(client, tmp_path):
+    registry = ModelRegistry(str(tmp_path))
+    meta = {
+        "target": ["t"],
+        "past": [],
+        "future": ["f"],
+        "lag": 1,
+        "lead": 1,
+        "trained": 0.0,
+    }
+    coef = np.array([[1.0], [2.0], [0.5]])
+    save_predictor("m", Predictor(coef, np.array([0.1]), meta), str(tmp_path))
+
+    with patch("app.main.get_model_registry", return_value=registry):
+        response = client.post(
+            "/connect/models/m/predict",
+            json={"inputs": [{"history": {"t": [1.0]}, "future": {"f": [2.0]}}]},
+        )
+        missing = client.post("/connect/models/x/predict", json={"inputs": []})
+
+    assert response.status_code == 200
+    prediction = response.json()["predictions"][0]
+    assert prediction["Forecast"] == {"t": [5.5]}
+    assert prediction["Forecast Upper"]["t"][0] == pytest.approx(5.5 + 0.196)
+    assert missing.status_code == 404
@@ -0,0 +1,208 @@
+import threading
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import numpy as np
+import pytest
+
+from app import rollups
+from app.rollups import RollupManager, StreamRollup
+from app.series import parse_timestamps
+from app.summaries import interval_edges, summarize_arrays
+
+NOW = np.datetime64("2024-01-02T00:00:00", "ms")
+START = "2024-01-01T00:00:00Z"
+END = "2024-01-01T04:00:00Z"
+
+
+def make_events(start: str, minutes: int, offset: float = 0.0):
+    first = parse_timestamps([start])[0]
+    timestamps = first + np.arange(minutes) * np.timedelta64(1, "m")
+    return [
+        {"Timestamp": f"{t}Z", "Value": float(i % 17) + offset}
+        for i, t in enumerate(timestamps)
+    ]
+
+
+def paged_client(*pages):
+    client = MagicMock()
+    client.Streams.getWindowValuesPaged.side_effect = [
+        SimpleNamespace(Results=page, ContinuationToken=None) for page in pages
+    ]
+    return client
+
+
+@pytest.mark.unit
+def test_rollup_matches_raw_summaries():
+    events = make_events(START, 240)
+    timestamps = parse_timestamps([e["Timestamp"] for e in events])
+    values = np.array([e["Value"] for e in events])
+    rollup = StreamRollup("s1", resolutions=[60, 900, 3600])
+    rollup.add(timestamps, values)
+    edges = interval_edges(START, END, 4)
+
+    tier = rollup.tier_for(3600 * 1000)
+    stats = tier.query(edges.astype(np.int64))
+    expected = summarize_arrays(timestamps, values, edges)
+
+    assert tier.resolution_ms == 3600 * 1000
+    for name in ("count", "min", "max", "mean", "stddev"):
+        np.testing.assert_allclose(stats[name], expected[name])
+
+
+@pytest.mark.unit
+def test_incremental_add_skips_ingested_events():
+    events = make_events(START, 120)
+    timestamps = parse_timestamps([e["Timestamp"] for e in events])
+    values = np.array([e["Value"] for e in events])
+    rollup = StreamRollup("s1", resolutions=[60])
+
+    rollup.add(timestamps[:80], values[:80])
+    # The second page overlaps the first
+    rollup.add(timestamps[60:], values[60:])
+
+    tier = rollup.tiers[0]
+    assert tier.count.sum() == 120
+    np.testing.assert_allclose(tier.total.sum(), values.sum())
+
+
+@pytest.mark.unit
+def test_streams_get_rollups_after_repeated_views(monkeypatch):
+    monkeypatch.setattr(rollups, "ROLLUP_MIN_VIEWS", 2)
+    manager = RollupManager(client=MagicMock())
+
+    manager.record_view("s1")
+    assert "s1" not in manager.rollups
+    manager.record_view("s1")
+    assert "s1" in manager.rollups
+
+
+@pytest.mark.unit
+def test_hot_streams_replace_the_least_viewed_rollups(monkeypatch):
+    monkeypatch.setattr(rollups, "ROLLUP_MIN_VIEWS", 1)
+    monkeypatch.setattr(rollups, "ROLLUP_MAX_STREAMS", 1)
+    monkeypatch.setattr(rollups, "ROLLUP_VIEW_HALF_LIFE", 100)
+    manager = RollupManager(client=MagicMock())
+
+    manager.record_view("s1", now=0)
+    manager.record_view("s2", now=0)
+    assert list(manager.rollups) == ["s1"]
+    manager.record_view("s2", now=0)
+    assert list(manager.rollups) == ["s2"]
+    # Two half-lives later the views of s2 count half a view
+    manager.record_view("s3", now=200)
+    assert list(manager.rollups) == ["s3"]
+
+
+@pytest.mark.unit
+def test_view_counts_are_bounded(monkeypatch):
+    monkeypatch.setattr(rollups, "ROLLUP_MIN_VIEWS", 100)
+    monkeypatch.setattr(rollups, "ROLLUP_MAX_TRACKED", 4)
+    manager = RollupManager(client=MagicMock())
+
+    for i in range(10):
+        manager.record_view(f"s{i}", now=float(i))
+
+    assert len(manager.views) <= 4
+    assert "s9" in manager.views
+
+
+@pytest.mark.unit
+def test_tiers_keep_a_bounded_number_of_buckets(monkeypatch):
+    monkeypatch.setattr(rollups, "ROLLUP_MIN_VIEWS", 1)
+    monkeypatch.setattr(rollups, "ROLLUP_TIER_POINTS", 30)
+    manager = RollupManager(client=paged_client(make_events(START, 240)))
+    manager.record_view("s1")
+    manager.refresh("s1", now=NOW)
+
+    rollup = manager.rollups["s1"]
+    assert [len(tier.keys) for tier in rollup.tiers] == [30, 16, 4, 1]
+    # The hourly tier still covers the whole range, the minute tier does not
+    assert manager._query_rollup("s1", interval_edges(START, END, 4)) is not None
+    assert manager._query_rollup("s1", interval_edges(START, END, 240)) is None
+    recent = interval_edges("2024-01-01T03:30:00Z", END, 30)
+    assert manager._query_rollup("s1", recent)["count"].sum() == 30
+
+
+@pytest.mark.unit
+def test_query_serves_refreshed_streams_from_rollups(monkeypatch):
+    monkeypatch.setattr(rollups, "ROLLUP_MIN_VIEWS", 1)
+    client = paged_client(make_events(START, 240), make_events(END, 30, offset=100))
+    manager = RollupManager(client=client)
+    manager.record_view("s1")
+
+    manager.refresh("s1", now=NOW)
+    manager.refresh("s1", now=NOW + np.timedelta64(1, "h"))
+    result = manager.query(["s1"], START, "2024-01-01T04:30:00Z", 9)
+
+    assert result["sources"] == ["rollup"]
+    assert sum(result["count"][0]) == 270
+    assert result["max"][0][-1] == 116.0
+    client.Streams.getSummaries.assert_not_called()
+    # The second refresh reads from the newest ingested event
+    second_start = client.Streams.getWindowValuesPaged.call_args.kwargs["start"]
+    assert second_start == "2024-01-01T03:59:00.000Z"
+
+
+@pytest.mark.unit
+def test_late_events_after_the_watermark_are_folded_in(monkeypatch):
+    monkeypatch.setattr(rollups, "ROLLUP_MIN_VIEWS", 1)
+    first = make_events(START, 60)
+    # Reached ADH after the first refresh although older than its end
+    late = make_events("2024-01-01T01:00:00Z", 10, offset=100)
+    client = paged_client(first, first[-1:] + late)
+    manager = RollupManager(client=client)
+    manager.record_view("s1")
+
+    manager.refresh("s1", now=NOW)
+    manager.refresh("s1", now=NOW + np.timedelta64(1, "m"))
+
+    tier = manager.rollups["s1"].tiers[0]
+    assert tier.count.sum() == 70
+    assert tier.maximum.max() == 109.0
+
+
+@pytest.mark.unit
+def test_queries_do_not_wait_for_a_refresh(monkeypatch):
+    monkeypatch.setattr(rollups, "ROLLUP_MIN_VIEWS", 1)
+    client = paged_client(make_events(START, 240))
+    manager = RollupManager(client=client)
+    manager.record_view("s1")
+    manager.refresh("s1", now=NOW)
+
+    fetching, release = threading.Event(), threading.Event()
+
+    def slow_page(*args, **kwargs):
+        fetching.set()
+        release.wait(5)
+        return SimpleNamespace(Results=[], ContinuationToken=None)
+
+    client.Streams.getWindowValuesPaged.side_effect = slow_page
+    refresh = threading.Thread(
+        target=manager.refresh, args=("s1", NOW + np.timedelta64(1, "m"))
+    )
+    refresh.start()
+    assert fetching.wait(5)
+    try:
+        result = manager.query(["s1"], START, END, 4)
+    finally:
+        release.set()
+        refresh.join()
+
+    assert result["sources"] == ["rollup"]
+
+
+@pytest.mark.unit
+def test_query_falls_back_for_uncovered_streams(monkeypatch):
+    monkeypatch.setattr(rollups, "ROLLUP_MIN_VIEWS", 1)
+    client = MagicMock()
+    client.Streams.getSummaries.return_value = [
+        {"Summaries": {"Count": {"Value": 3}}},
+        {"Summaries": {"Count": {"Value": 4}}},
+    ]
+    manager = RollupManager(client=client)
+
+    result = manager.query(["s1"], START, END, 2)
+
+    assert result["sources"] == ["adh"]
+    assert result["count"] == [[3.0, 4.0]]
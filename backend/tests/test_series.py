@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from app.series import align_results, events_to_arrays, fill_gaps
+
+RESULTS = {
+    "a": [
+        {"Timestamp": "2024-01-01T00:00:00Z", "Value": 1.0},
+        {"Timestamp": "2024-01-01T00:02:00Z", "Value": 3.0},
+    ],
+    "b": [
+        {"Timestamp": "2024-01-01T00:01:00Z", "Value": 20.0},
+        {"Timestamp": "2024-01-01T00:02:00Z", "Value": 30.0},
+    ],
+}
+
+
+@pytest.mark.unit
+def test_events_to_arrays():
+    timestamps, values = events_to_arrays(
+        [{"Timestamp": "2024-01-01T00:00:00Z", "Temperature": "bad"}]
+    )
+
+    assert str(timestamps[0]) == "2024-01-01T00:00:00.000"
+    assert np.isnan(values[0])
+
+
+@pytest.mark.unit
+def test_align_results_joins_time_index():
+    aligned = align_results(RESULTS)
+
+    assert aligned["timestamps"] == [
+        "2024-01-01T00:00:00.000Z",
+        "2024-01-01T00:01:00.000Z",
+        "2024-01-01T00:02:00.000Z",
+    ]
+    assert aligned["streams"] == ["a", "b"]
+    assert aligned["values"] == [[1.0, None, 3.0], [None, 20.0, 30.0]]
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    "fill, expected",
+    [
+        ("previous", [[1.0, 1.0, 3.0], [None, 20.0, 30.0]]),
+        ("linear", [[1.0, 2.0, 3.0], [20.0, 20.0, 30.0]]),
+        ("zero", [[1.0, 0.0, 3.0], [0.0, 20.0, 30.0]]),
+    ],
+)
+def test_align_results_fill_policies(fill, expected):
+    assert align_results(RESULTS, fill)["values"] == expected
+
+
+@pytest.mark.unit
+def test_fill_gaps_rejects_unknown_policy():
+    with pytest.raises(ValueError):
+        fill_gaps(np.zeros((1, 1)), "mean")
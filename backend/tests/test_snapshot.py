@@ -0,0 +1,124 @@
+import asyncio
+import json
+import time
+from unittest.mock import patch
+
+import pytest
+
+from app import snapshot
+from app.snapshot import SnapshotPublisher, SnapshotReader, read_header
+
+
+@pytest.mark.unit
+def test_reader_sees_published_versions(tmp_path):
+    path = str(tmp_path / "catalog.snapshot")
+    streams = [["s1"]]
+    publisher = SnapshotPublisher(path, {"streams": lambda: streams[0]})
+    reader = SnapshotReader(path)
+
+    assert reader.get("streams") is None
+    publisher.publish_once()
+    assert reader.get("streams") == ["s1"]
+
+    streams[0] = ["s1", "s2"]
+    publisher.publish_once()
+    assert reader.get("streams") == ["s1", "s2"]
+    assert reader.version == 2
+
+
+@pytest.mark.unit
+def test_failed_listing_keeps_previous_value(tmp_path):
+    path = str(tmp_path / "catalog.snapshot")
+    loaders = {"types": lambda: ["t1"]}
+    publisher = SnapshotPublisher(path, loaders)
+    publisher.publish_once()
+
+    loaders["types"] = lambda: 1 / 0
+    publisher.publish_once()
+
+    assert SnapshotReader(path).get("types") == ["t1"]
+
+
+@pytest.mark.unit
+def test_version_survives_publisher_restart(tmp_path):
+    path = str(tmp_path / "catalog.snapshot")
+    loaders = {"types": lambda: []}
+    SnapshotPublisher(path, loaders).publish_once()
+
+    assert SnapshotPublisher(path, loaders).publish_once() == 2
+    assert read_header(path)[0] == 2
+
+
+@pytest.mark.unit
+def test_listings_loaded_before_local_write_are_ignored(tmp_path):
+    path = str(tmp_path / "catalog.snapshot")
+    SnapshotPublisher(path, {"models": lambda: ["m1"]}).publish_once()
+    reader = SnapshotReader(path)
+
+    assert reader.get("models", newer_than=time.time()) is None
+    assert reader.get("models", newer_than=0.0) == ["m1"]
+
+
+@pytest.mark.unit
+def test_failing_listing_ages_out(tmp_path):
+    path = str(tmp_path / "catalog.snapshot")
+    loaders = {"types": lambda: ["t1"], "streams": lambda: ["s1"]}
+    publisher = SnapshotPublisher(path, loaders)
+    with patch("app.snapshot.time.time", return_value=1000.0):
+        publisher.publish_once()
+    loaders["types"] = lambda: 1 / 0
+    with patch("app.snapshot.time.time", return_value=1200.0):
+        publisher.publish_once()
+        reader = SnapshotReader(path, max_age=100)
+
+        assert reader.get("types") is None
+        assert reader.get("streams") == ["s1"]
+
+
+@pytest.mark.unit
+def test_reader_decodes_each_listing_once_per_version(tmp_path):
+    path = str(tmp_path / "catalog.snapshot")
+    publisher = SnapshotPublisher(path, {"types": lambda: ["t1"], "streams": list})
+    publisher.publish_once()
+    reader = SnapshotReader(path)
+
+    with patch("app.snapshot.json.loads", wraps=json.loads) as loads:
+        for _ in range(3):
+            assert reader.get("types") == ["t1"]
+        # The index and the types listing, the streams listing is not decoded
+        assert loads.call_count == 2
+
+        publisher.publish_once()
+        assert reader.get("types") == ["t1"]
+        assert loads.call_count == 4
+
+
+@pytest.mark.unit
+def test_worker_takes_over_when_publisher_exits(tmp_path):
+    fcntl = pytest.importorskip("fcntl")
+    path = str(tmp_path / "catalog.snapshot")
+
+    async def elect():
+        with open(f"{path}.lock", "a+b") as leader:
+            fcntl.flock(leader, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            task = asyncio.create_task(
+                snapshot.run_publisher({"types": lambda: ["t1"]}, interval=0.01)
+            )
+            await asyncio.sleep(0.05)
+            assert read_header(path) is None
+        # Closing the file releases the leader's lock
+        for _ in range(100):
+            await asyncio.sleep(0.01)
+            if read_header(path) is not None:
+                break
+        task.cancel()
+
+    with (
+        patch.object(snapshot, "CATALOG_SNAPSHOT_PATH", path),
+        patch.object(snapshot, "CATALOG_SNAPSHOT_ROLE", "auto"),
+        patch.object(snapshot, "_lock_file", None),
+    ):
+        asyncio.run(elect())
+        snapshot._lock_file.close()
+
+    assert SnapshotReader(path).get("types") == ["t1"]
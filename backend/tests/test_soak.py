@@ -0,0 +1,178 @@
+import os
+import random
+import subprocess
+import sys
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.client
+from app.catalog import invalidate_catalog
+from app.main import app as backend
+from app.soak import (
+    FakeADH,
+    RequestMix,
+    _isolated_env,
+    _stop,
+    drive,
+    find_knee,
+    process_stats,
+    summarize,
+    trend,
+)
+from app.upstream import GuardedClient
+
+
+class TestSession:
+    """Soak session that sends its requests through a TestClient."""
+
+    __test__ = False
+
+    def __init__(self, client: TestClient):
+        self.client = client
+
+    def request(self, method, path, body, headers):
+        response = self.client.request(method, path, json=body, headers=headers)
+        return response.status_code, response.headers.get("etag")
+
+
+@pytest.fixture
+def fake_backend():
+    adh = GuardedClient(FakeADH(streams=12, models=2))
+    invalidate_catalog()
+    with patch.object(app.client, "_adh_client", adh):
+        yield TestClient(backend)
+    invalidate_catalog()
+
+
+@pytest.mark.unit
+def test_backend_runs_on_fake_adh(fake_backend):
+    streams = fake_backend.get("/connect/streams")
+    models = fake_backend.get("/connect/models").json()
+    summaries = fake_backend.get(
+        "/connect/stream_summaries",
+        params={
+            "stream_id": ["soak.stream.0000", "soak.stream.0001"],
+            "start": "2024-01-01T00:00:00Z",
+            "end": "2024-01-01T06:00:00Z",
+            "intervals": 12,
+        },
+    )
+
+    assert streams.status_code == 200
+    assert len(streams.json()) == 12 + 2 * 3
+    assert sorted(m["id"] for m in models) == ["soak.model.000", "soak.model.001"]
+    assert summaries.status_code == 200
+
+
+@pytest.mark.unit
+def test_request_mix_saves_models(fake_backend):
+    models = fake_backend.get("/connect/models").json()
+    mix = RequestMix(["soak.stream.0000"], models, random.Random(0), {"model_save": 1})
+
+    kind, method, path, body, _ = mix.next()
+    response = fake_backend.request(method, path, json=body)
+
+    assert (kind, method, path) == ("model_save", "PUT", "/connect/models")
+    assert response.status_code == 200
+    saved = {m["id"]: m for m in fake_backend.get("/connect/models").json()}
+    assert saved[body["id"]]["description"] == "Soak save 1"
+
+
+@pytest.mark.unit
+def test_drive_reports_throughput_without_errors(fake_backend):
+    streams = [f"soak.stream.{i:04d}" for i in range(12)]
+    models = fake_backend.get("/connect/models").json()
+    samples = []
+
+    level = drive(
+        lambda: TestSession(fake_backend),
+        2,
+        1.0,
+        streams,
+        models,
+        sample=0.3,
+        on_sample=samples.append,
+    )
+
+    assert level["concurrency"] == 2
+    assert level["requests"] > 0
+    assert level["errors"] == 0
+    assert level["p50_ms"] <= level["p99_ms"] <= level["max_ms"]
+    assert samples and all(s["errors"] == 0 for s in samples)
+
+
+@pytest.mark.unit
+def test_find_knee():
+    levels = [
+        {"concurrency": 1, "rps": 50.0},
+        {"concurrency": 2, "rps": 96.0},
+        {"concurrency": 4, "rps": 100.0},
+        {"concurrency": 8, "rps": 90.0},
+    ]
+
+    assert find_knee(levels)["concurrency"] == 2
+    assert find_knee([]) is None
+
+
+@pytest.mark.unit
+def test_knee_ignores_failing_levels():
+    levels = [
+        {"concurrency": 1, "rps": 50.0, "requests": 500, "errors": 0},
+        {"concurrency": 2, "rps": 90.0, "requests": 900, "errors": 5},
+        {"concurrency": 4, "rps": 400.0, "requests": 4000, "errors": 3000},
+    ]
+
+    assert find_knee(levels)["concurrency"] == 2
+    assert find_knee(levels[2:]) is None
+
+
+@pytest.mark.unit
+def test_throughput_counts_successful_requests():
+    summary = summarize([0.01] * 10, 4, 2.0, {})
+
+    assert summary["requests"] == 10
+    assert summary["rps"] == 3.0
+
+
+@pytest.mark.unit
+def test_worker_stores_live_in_the_temporary_directory(tmp_path):
+    with patch.dict(os.environ, {"HISTORY_STORE_PATH": "/data/history.db"}):
+        env = _isolated_env(str(tmp_path))
+
+    for name in ("HISTORY_STORE_PATH", "CATALOG_SNAPSHOT_PATH", "MODEL_REGISTRY_DIR"):
+        assert env[name].startswith(str(tmp_path))
+
+
+@pytest.mark.unit
+def test_trend():
+    growth = trend([0, 1800, 3600], [100, None, 300])
+
+    assert (growth["first"], growth["last"], growth["growth"]) == (100, 300, 200)
+    assert growth["per_hour"] == pytest.approx(200)
+    assert trend([0], [1]) is None
+
+
+@pytest.mark.unit
+def test_process_stats():
+    stats = process_stats(os.getpid())
+
+    if os.path.isdir("/proc"):
+        assert stats["rss_bytes"] > 0
+        assert stats["open_fds"] > 0
+    assert process_stats(None)["rss_bytes"] is None
+
+
+@pytest.mark.unit
+@pytest.mark.skipif(sys.platform == "win32", reason="SIGTERM cannot be ignored")
+def test_stop_kills_a_backend_ignoring_terminate():
+    code = "import signal, time; signal.signal(signal.SIGTERM, signal.SIG_IGN); "
+    code += "print('ready', flush=True); time.sleep(60)"
+    process = subprocess.Popen([sys.executable, "-c", code], stdout=subprocess.PIPE)
+    process.stdout.readline()
+
+    _stop(process, timeout=0.2)
+
+    assert process.returncode is not None
+    process.stdout.close()
@@ -0,0 +1,58 @@
+import pytest
+
+from app.store import HistoryStore
+
+OLD = {
+    "stream_id": "s1",
+    "start": "2020-01-01T00:00:00Z",
+    "end": "2020-01-02T00:00:00Z",
+    "count": 10,
+}
+RECENT = {
+    "stream_id": "s1",
+    "start": "2020-01-01T00:00:00Z",
+    "end": "2999-01-01T00:00:00Z",
+    "count": 10,
+}
+
+
+@pytest.mark.unit
+def test_historical_results_are_read_through(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.db"), horizon=3600)
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return [{"Timestamp": "2020-01-01T00:00:00Z", "Value": 1.0}]
+
+    first = store.fetch("stream_values", OLD, loader)
+    second = store.fetch("stream_values", OLD, loader)
+
+    assert first == second
+    assert len(calls) == 1
+    assert store.stats()["hits"] == 1
+
+
+@pytest.mark.unit
+def test_recent_results_bypass_store(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.db"), horizon=3600)
+    calls = []
+
+    store.fetch("stream_values", RECENT, lambda: calls.append(1) or [])
+    store.fetch("stream_values", RECENT, lambda: calls.append(1) or [])
+
+    assert len(calls) == 2
+    assert store.stats()["rows"] == 0
+
+
+@pytest.mark.unit
+def test_store_survives_restart(tmp_path):
+    path = str(tmp_path / "history.db")
+    store = HistoryStore(path, horizon=3600)
+    store.fetch("stream_values", OLD, lambda: [1, 2, 3])
+    store.close()
+
+    reopened = HistoryStore(path, horizon=3600)
+    values = reopened.fetch("stream_values", OLD, lambda: pytest.fail("refetched"))
+
+    assert values == [1, 2, 3]
@@ -0,0 +1,122 @@
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import numpy as np
+import pytest
+
+from app.series import parse_timestamps
+from app.summaries import (
+    get_summaries,
+    interval_edges,
+    local_summaries,
+    summarize_arrays,
+)
+
+START = "2024-01-01T00:00:00Z"
+END = "2024-01-01T00:04:00Z"
+EVENTS = [
+    {"Timestamp": f"2024-01-01T00:0{minute}:00Z", "Value": value}
+    for minute, value in [(0, 1.0), (1, 3.0), (2, 10.0), (4, 7.0)]
+]
+
+
+@pytest.mark.unit
+def test_summarize_arrays_per_interval():
+    timestamps = parse_timestamps([e["Timestamp"] for e in EVENTS])
+    values = np.array([e["Value"] for e in EVENTS])
+
+    stats = summarize_arrays(timestamps, values, interval_edges(START, END, 2))
+
+    np.testing.assert_array_equal(stats["count"], [2, 2])
+    np.testing.assert_array_equal(stats["min"], [1.0, 7.0])
+    np.testing.assert_array_equal(stats["max"], [3.0, 10.0])
+    np.testing.assert_allclose(stats["mean"], [2.0, 8.5])
+    np.testing.assert_allclose(stats["stddev"], [np.sqrt(2), np.sqrt(4.5)])
+
+
+@pytest.mark.unit
+def test_empty_intervals_have_zero_count():
+    timestamps = parse_timestamps(["2024-01-01T00:00:30Z"])
+
+    stats = summarize_arrays(timestamps, np.array([5.0]), interval_edges(START, END, 4))
+
+    np.testing.assert_array_equal(stats["count"], [1, 0, 0, 0])
+    assert np.isnan(stats["mean"][1])
+
+
+class SdsError(Exception):
+    def __init__(self, status):
+        super().__init__(f"status {status}")
+        self.StatusCode = status
+
+
+def paged_client(events) -> MagicMock:
+    """Fake ADH client serving `events` in pages of the requested size."""
+    client = MagicMock()
+
+    def paged(namespace_id, stream_id, start, end, count, continuation_token, **_):
+        offset = int(continuation_token or 0)
+        token = str(offset + count) if offset + count < len(events) else None
+        return SimpleNamespace(
+            Results=events[offset : offset + count], ContinuationToken=token
+        )
+
+    client.Streams.getWindowValuesPaged.side_effect = paged
+    return client
+
+
+@pytest.mark.unit
+def test_falls_back_to_local_computation():
+    client = paged_client(EVENTS)
+    client.Streams.getSummaries.side_effect = SdsError(400)
+
+    result = get_summaries(["s1"], START, END, 2, client=client)
+
+    assert result["sources"] == ["local"]
+    assert result["streams"] == ["s1"]
+    assert result["timestamps"] == [
+        "2024-01-01T00:00:00.000Z",
+        "2024-01-01T00:02:00.000Z",
+    ]
+    assert result["count"] == [[2.0, 2.0]]
+
+
+@pytest.mark.unit
+def test_uses_adh_summaries():
+    client = MagicMock()
+    client.Streams.getSummaries.return_value = [
+        {"Summaries": {"Minimum": {"Value": 1.0}, "Count": {"Value": 4}}},
+        {"Summaries": {}},
+    ]
+
+    result = get_summaries(["s1"], START, END, 2, source="adh", client=client)
+
+    assert result["sources"] == ["adh"]
+    assert result["min"] == [[1.0, None]]
+    assert result["count"] == [[4.0, None]]
+
+
+@pytest.mark.unit
+def test_unavailable_adh_is_not_computed_locally():
+    client = paged_client(EVENTS)
+    client.Streams.getSummaries.side_effect = SdsError(503)
+
+    with pytest.raises(SdsError):
+        get_summaries(["s1"], START, END, 2, client=client)
+    client.Streams.getWindowValuesPaged.assert_not_called()
+
+
+@pytest.mark.unit
+def test_local_summaries_fold_pages():
+    edges = interval_edges(START, END, 2)
+    timestamps = parse_timestamps([e["Timestamp"] for e in EVENTS])
+    expected = summarize_arrays(
+        timestamps, np.array([e["Value"] for e in EVENTS]), edges
+    )
+
+    stats = local_summaries(paged_client(EVENTS), "s1", edges, START, END, page_size=1)
+
+    for name, values in expected.items():
+        np.testing.assert_allclose(stats[name], values)
+    with pytest.raises(ValueError, match="more than 3 events"):
+        local_summaries(paged_client(EVENTS), "s1", edges, START, END, 2, max_events=3)
@@ -0,0 +1,138 @@
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pytest
+
+from app.registry import ModelRegistry, Predictor, save_predictor
+from app.sweeper import delete_streams, find_orphans, forecast_owner, sweep
+
+NOW = datetime(2024, 1, 1, tzinfo=timezone.utc)
+OLD = NOW - timedelta(days=1)
+
+
+def item(id: str, created=OLD) -> MagicMock:
+    return MagicMock(Id=id, CreatedDate=created)
+
+
+def trained(directory: str, *model_ids: str) -> ModelRegistry:
+    meta = {"target": ["t"], "past": [], "future": [], "lag": 1, "lead": 1}
+    for model_id in model_ids:
+        save_predictor(
+            model_id, Predictor(np.zeros((1, 1)), np.zeros(1), meta), directory
+        )
+    return ModelRegistry(directory)
+
+
+class SdsError(Exception):
+    def __init__(self, status):
+        super().__init__(f"status {status}")
+        self.StatusCode = status
+
+
+@pytest.mark.unit
+def test_forecast_owner():
+    assert forecast_owner("m 1 Forecast") == "m 1"
+    assert forecast_owner("m 1 Forecast Lower") == "m 1"
+    assert forecast_owner("m 1 Forecast Upper") == "m 1"
+    assert forecast_owner("Forecast") is None
+    assert forecast_owner("m 1 Lower") is None
+
+
+@pytest.mark.unit
+def test_find_orphans_skips_live_models_and_young_streams():
+    streams = [
+        item("a Forecast"),
+        item("a Forecast Lower"),
+        item("b Forecast"),
+        item("b Forecast Upper"),
+        item("c Forecast", created=NOW - timedelta(seconds=10)),
+        item("temperature"),
+    ]
+
+    assert find_orphans(streams, ["a"], NOW, 60) == ["b Forecast", "b Forecast Upper"]
+
+
+@pytest.mark.unit
+def test_delete_streams_reports_failures():
+    client = MagicMock()
+    errors = {"gone": SdsError(404), "locked": SdsError(409)}
+
+    def delete(namespace_id, stream_id):
+        if stream_id in errors:
+            raise errors[stream_id]
+
+    client.Streams.deleteStream.side_effect = delete
+    ids = ["a", "gone", "locked", "b", "c"]
+
+    deleted, failed = delete_streams(client, ids, workers=2, batch_size=2)
+
+    assert deleted == ["a", "gone", "b", "c"]
+    assert list(failed) == ["locked"]
+    assert client.Streams.deleteStream.call_count == 5
+
+
+@pytest.mark.unit
+def test_sweep_dry_run_deletes_nothing(tmp_path):
+    client = MagicMock()
+    client.Streams.getStreams.side_effect = [
+        [item("a Forecast"), item("b Forecast")],
+        [item("b Forecast Lower")],
+    ]
+    client.Assets.getAssets.return_value = [item("a")]
+
+    registry = trained(str(tmp_path), "b")
+    report = sweep(
+        dry_run=True, client=client, min_age=0, page_size=2, registry=registry
+    )
+
+    assert report["orphans"] == ["b Forecast", "b Forecast Lower"]
+    assert report["scanned"] == 3
+    assert report["deleted"] == []
+    assert report["weights"] == ["b"]
+    client.Streams.deleteStream.assert_not_called()
+    assert registry.trained() == ["b"]
+
+
+@pytest.mark.unit
+def test_sweep_deletes_orphans(tmp_path):
+    client = MagicMock()
+    client.Streams.getStreams.return_value = [item("a Forecast"), item("b Forecast")]
+    client.Assets.getAssets.return_value = [item("a")]
+    registry = trained(str(tmp_path), "a", "b")
+
+    report = sweep(dry_run=False, client=client, min_age=0, registry=registry)
+
+    assert report["deleted"] == ["b Forecast"]
+    client.Streams.deleteStream.assert_called_once()
+    assert registry.trained() == ["a"]
+
+
+@pytest.mark.unit
+def test_sweep_keeps_recently_trained_parameters(tmp_path):
+    client = MagicMock()
+    client.Streams.getStreams.return_value = []
+    client.Assets.getAssets.return_value = []
+    registry = trained(str(tmp_path), "new")
+
+    report = sweep(dry_run=False, client=client, min_age=3600, registry=registry)
+
+    assert report["weights"] == []
+    assert registry.trained() == ["new"]
+
+
+@pytest.mark.unit
+def test_cascading_delete(client, tmp_path):
+    adh = MagicMock()
+    registry = trained(str(tmp_path), "m")
+    with (
+        patch("app.main.get_adh_client", return_value=adh),
+        patch("app.main.get_model_registry", return_value=registry),
+    ):
+        response = client.delete("/connect/models?asset_id=m&cascade=true")
+
+    assert response.status_code == 200
+    assert registry.trained() == []
+    adh.Assets.deleteAsset.assert_called_once()
+    deleted = {c.args[1] for c in adh.Streams.deleteStream.call_args_list}
+    assert deleted == {"m Forecast", "m Forecast Lower", "m Forecast Upper"}
@@ -0,0 +1,171 @@
+import asyncio
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from app.sync import CatalogSync
+
+MODELS = [{"id": "m2", "name": "B"}, {"id": "m1", "name": "A"}]
+
+
+def synced(history: int = 100) -> CatalogSync:
+    sync = CatalogSync({"models": lambda: MODELS}, history=history)
+    sync.load("models", MODELS)
+    return sync
+
+
+@pytest.mark.unit
+def test_first_load_builds_sorted_listing():
+    sync = CatalogSync({})
+    assert sync.get("models") is None
+
+    sync.load("models", MODELS)
+
+    assert [m["id"] for m in sync.get("models")] == ["m1", "m2"]
+    assert sync.version == 1
+    assert sync.etag("models").startswith('"models-')
+
+
+@pytest.mark.unit
+def test_reload_applies_only_differences():
+    sync = synced()
+    assert sync.load("models", list(MODELS)) == 0
+    assert sync.version == 1
+
+    changed = sync.load(
+        "models", [{"id": "m1", "name": "A2"}, {"id": "m3", "name": "C"}]
+    )
+
+    assert changed == 3
+    assert [m["id"] for m in sync.get("models")] == ["m1", "m3"]
+    feed = sync.changes(1)
+    assert feed["version"] == 4
+    assert sorted((c["op"], c["id"]) for c in feed["changes"]) == [
+        ("delete", "m2"),
+        ("upsert", "m1"),
+        ("upsert", "m3"),
+    ]
+
+
+@pytest.mark.unit
+def test_local_writes_apply_immediately():
+    sync = synced()
+
+    sync.upsert("models", {"id": "m0", "name": "0"})
+    sync.delete("models", "m2")
+    sync.delete("models", "unknown")
+
+    assert [m["id"] for m in sync.get("models")] == ["m0", "m1"]
+    assert sync.version == 3
+    assert sync.changes(3) == {"epoch": sync.epoch, "version": 3, "changes": []}
+
+
+@pytest.mark.unit
+def test_changes_beyond_history_require_reload():
+    sync = synced(history=2)
+    for i in range(3):
+        sync.upsert("models", {"id": f"n{i}", "name": str(i)})
+
+    assert sync.changes(0) is None
+    assert [c["id"] for c in sync.changes(2)["changes"]] == ["n1", "n2"]
+
+
+@pytest.mark.unit
+def test_listing_loaded_before_a_local_write_is_ignored():
+    sync = synced()
+    started = time.monotonic()
+    sync.upsert("models", {"id": "m3", "name": "C"})
+
+    assert sync.load("models", MODELS, started) == 0
+    assert [m["id"] for m in sync.get("models")] == ["m1", "m2", "m3"]
+    assert sync.load("models", MODELS, time.monotonic()) == 1
+
+
+@pytest.mark.unit
+def test_run_wakes_on_request_and_stops_promptly():
+    loads = []
+    sync = CatalogSync({"models": lambda: loads.append(1) or MODELS}, interval=30)
+
+    async def main():
+        task = asyncio.create_task(sync.run())
+        while not loads:
+            await asyncio.sleep(0.01)
+        threading.Thread(target=sync.request_sync).start()
+        for _ in range(100):
+            await asyncio.sleep(0.01)
+            if len(loads) == 2:
+                break
+        task.cancel()
+
+    started = time.monotonic()
+    with patch("app.sync.get_catalog", lambda kind, loader: loader()):
+        asyncio.run(main())
+
+    assert len(loads) == 2
+    # No thread is left waiting out the interval
+    assert time.monotonic() - started < 5
+
+
+@pytest.mark.unit
+def test_etag_follows_content_across_restarts():
+    sync = synced()
+    restarted = CatalogSync({})
+    restarted.load("models", MODELS)
+    changed = CatalogSync({})
+    changed.load("models", [{"id": "m3", "name": "C"}])
+
+    assert restarted.etag("models") == sync.etag("models")
+    assert changed.etag("models") != sync.etag("models")
+
+
+@pytest.mark.unit
+def test_changes_from_another_epoch_require_reload():
+    sync = synced()
+    restarted = synced()
+
+    assert sync.changes(1, sync.epoch) is not None
+    assert restarted.changes(1, sync.epoch) is None
+
+
+@pytest.mark.unit
+def test_catalog_endpoint_uses_etag(client):
+    sync = synced()
+    with patch("app.main.get_catalog_sync", return_value=sync):
+        response = client.get("/connect/models")
+        etag = response.headers["ETag"]
+        not_modified = client.get("/connect/models", headers={"If-None-Match": etag})
+        sync.delete("models", "m1")
+        modified = client.get("/connect/models", headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert [m["id"] for m in response.json()] == ["m1", "m2"]
+    assert not_modified.status_code == 304
+    assert modified.status_code == 200
+    assert modified.json() == [{"id": "m2", "name": "B"}]
+
+
+@pytest.mark.unit
+def test_change_feed_endpoint(client):
+    sync = synced(history=1)
+    sync.upsert("models", {"id": "m3", "name": "C"})
+    with patch("app.main.get_catalog_sync", return_value=sync):
+        assert client.get("/connect/catalog/changes?since=1").json()["version"] == 2
+        assert client.get("/connect/catalog/changes?since=0").status_code == 410
+        stale = client.get("/connect/catalog/changes?since=2&epoch=other")
+        assert stale.status_code == 410
+
+
+@pytest.mark.unit
+def test_restarted_sync_does_not_match_old_etag(client):
+    sync = synced()
+    with patch("app.main.get_catalog_sync", return_value=sync):
+        etag = client.get("/connect/models").headers["ETag"]
+    restarted = CatalogSync({})
+    restarted.load("models", [{"id": "m3", "name": "C"}])
+    with patch("app.main.get_catalog_sync", return_value=restarted):
+        response = client.get("/connect/models", headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.json() == [{"id": "m3", "name": "C"}]
@@ -0,0 +1,298 @@
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app import upstream
+from app.upstream import (
+    AdaptiveLimiter,
+    CircuitBreaker,
+    CircuitOpenError,
+    GuardedClient,
+    OverloadedError,
+    background,
+)
+
+
+class FakeError(Exception):
+    def __init__(self, status):
+        self.StatusCode = status
+
+
+@pytest.mark.unit
+def test_limiter_sheds_when_full():
+    limiter = AdaptiveLimiter(initial=1, minimum=1, queue_timeout=0.01)
+    limiter.acquire()
+
+    with pytest.raises(OverloadedError):
+        limiter.acquire()
+    assert limiter.shed == 1
+
+
+@pytest.mark.unit
+def test_limiter_shrinks_on_slow_calls_and_grows_back():
+    limiter = AdaptiveLimiter(initial=10, minimum=2, maximum=20, window=0)
+    for _ in range(10):
+        limiter.acquire()
+        limiter.release("op", 0.1, True)
+
+    for _ in range(5):
+        limiter.acquire()
+        limiter.release("op", 1.0, True)
+    shrunk = limiter.limit
+    assert shrunk < 10
+
+    for _ in range(50):
+        limiter.acquire()
+        limiter.release("op", 0.1, True)
+    assert limiter.limit > shrunk
+
+
+@pytest.mark.unit
+def test_limiter_holds_under_mixed_latencies():
+    limiter = AdaptiveLimiter(initial=16, maximum=16)
+    for i in range(1000):
+        limiter.acquire()
+        limiter.release("op", 0.05 if i % 2 else 0.3, True)
+        limiter.acquire()
+        limiter.release("op[n5]" if i % 3 else "op[n2]", 0.3 if i % 3 else 0.01, True)
+
+    assert limiter.limit == 16
+
+
+@pytest.mark.unit
+def test_limiter_shrinks_once_per_window():
+    limiter = AdaptiveLimiter(initial=10, window=60)
+    for _ in range(20):
+        limiter.acquire()
+        limiter.release("op", 1.0, False)
+
+    assert limiter.limit == pytest.approx(9)
+
+
+@pytest.mark.unit
+def test_calls_are_keyed_by_size():
+    def read(namespace_id, stream_id, value_class, start, end, count):
+        pass
+
+    day = ("2024-01-01T00:00:00Z", "2024-01-02T00:00:00Z")
+    small = upstream.call_key("op", read, ("ns", "s", None, *day, 10), {})
+    large = upstream.call_key(
+        "op", read, ("ns", "s", None), dict(start=day[0], end=day[1], count=1000)
+    )
+
+    assert small == "op[n2,t8]"
+    assert large == "op[n5,t8]"
+    assert upstream.call_key("op", read, ("ns",), {}) == "op"
+
+
+def wait_for(condition, timeout: float = 2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def contend(limiter: AdaptiveLimiter, priorities) -> list:
+    """Queue one call per priority on a full limiter and return the admission order."""
+    order = []
+
+    def take(priority):
+        limiter.acquire(priority)
+        order.append(priority)
+
+    threads = [threading.Thread(target=take, args=(p,)) for p in priorities]
+    for thread in threads:
+        thread.start()
+    wait_for(lambda: sum(limiter.waiting.values()) == len(priorities))
+    for _ in priorities:
+        count = len(order)
+        limiter.release("op", 0.1, True)
+        wait_for(lambda count=count: len(order) > count)
+    for thread in threads:
+        thread.join()
+    return order
+
+
+@pytest.mark.unit
+def test_interactive_calls_go_ahead_of_background():
+    limiter = AdaptiveLimiter(initial=2, minimum=2, maximum=2, background_min_share=0)
+    limiter.acquire("interactive")
+    limiter.acquire("interactive")
+
+    assert contend(limiter, ["background", "interactive"]) == [
+        "interactive",
+        "background",
+    ]
+
+
+@pytest.mark.unit
+def test_background_keeps_its_reserved_share():
+    limiter = AdaptiveLimiter(initial=2, minimum=2, maximum=2, background_min_share=0.5)
+    limiter.acquire("interactive")
+    limiter.acquire("interactive")
+
+    assert contend(limiter, ["interactive", "background"])[0] == "background"
+
+
+@pytest.mark.unit
+def test_background_is_capped_at_its_share():
+    limiter = AdaptiveLimiter(
+        initial=4, minimum=4, background_max_share=0.5, background_queue_timeout=0.01
+    )
+    limiter.acquire("background")
+    limiter.acquire("background")
+
+    with pytest.raises(OverloadedError):
+        limiter.acquire("background")
+    limiter.acquire("interactive")
+    limiter.acquire("interactive")
+    assert limiter.running == {"interactive": 2, "background": 2}
+
+
+@pytest.mark.unit
+def test_background_context_sets_call_priority():
+    seen = []
+
+    def fn():
+        seen.append(dict(upstream.limiter.running))
+
+    with patch.object(upstream, "limiter", AdaptiveLimiter()):
+        upstream.call(fn)
+        with background():
+            upstream.call(fn)
+
+    assert seen == [
+        {"interactive": 1, "background": 0},
+        {"interactive": 0, "background": 1},
+    ]
+
+
+@pytest.mark.unit
+def test_breaker_opens_and_probes_after_reset():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0)
+    breaker.record(False)
+    breaker.record(False)
+    assert breaker.state == "open"
+
+    breaker.before_call()  # reset timeout elapsed, this call is the probe
+    assert breaker.state == "half-open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    breaker.record(True)
+    assert breaker.state == "closed"
+
+
+@pytest.mark.unit
+def test_client_errors_do_not_open_breaker():
+    assert not upstream.is_upstream_failure(FakeError(404))
+    assert upstream.is_upstream_failure(FakeError(503))
+    assert upstream.is_upstream_failure(ConnectionError())
+
+
+@pytest.mark.unit
+def test_guarded_client_fails_fast_when_open():
+    class FailingStreams:
+        def getStreams(self, namespace_id):
+            raise FakeError(500)
+
+    class Client:
+        Streams = FailingStreams()
+
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    with patch.object(upstream, "breaker", breaker):
+        client = GuardedClient(Client())
+        with pytest.raises(FakeError):
+            client.Streams.getStreams("ns")
+        with pytest.raises(CircuitOpenError):
+            client.Streams.getStreams("ns")
+
+
+@pytest.mark.unit
+def test_unavailable_upstream_returns_503(client):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    breaker.record(False)
+    adh_client = GuardedClient(MagicMock())
+    with (
+        patch.object(upstream, "breaker", breaker),
+        patch("app.main.get_adh_client", return_value=adh_client),
+    ):
+        response = client.get(
+            "/connect/stream_values?stream_id=s&start=a&end=b&count=1"
+        )
+
+    assert response.status_code == 503
+    assert int(response.headers["Retry-After"]) >= 1
+
+
+@pytest.mark.unit
+def test_slow_read_is_hedged():
+    latencies = upstream.LatencyTracker(min_samples=1)
+    latencies.record("op", 0.01)
+    budget = upstream.HedgeBudget(ratio=1.0)
+    calls = []
+
+    def read():
+        calls.append(None)
+        if len(calls) == 1:
+            time.sleep(0.5)
+            return "slow"
+        return "fast"
+
+    with (
+        patch.object(upstream, "latencies", latencies),
+        patch.object(upstream, "hedge_budget", budget),
+    ):
+        assert upstream.hedged_call(read, operation="op") == "fast"
+
+    assert budget.sent == 1
+    assert budget.won == 1
+
+
+@pytest.mark.unit
+def test_hedge_budget_caps_extra_load():
+    budget = upstream.HedgeBudget(ratio=0.05)
+    hedges = 0
+    for _ in range(100):
+        budget.deposit()
+        hedges += budget.withdraw()
+
+    assert hedges <= 5
+
+
+def slow_read(count: int):
+    time.sleep(0.2)
+    return "slow"
+
+
+@pytest.mark.unit
+def test_hedge_delay_is_per_size_class():
+    latencies = upstream.LatencyTracker(min_samples=1)
+    latencies.record("op[n2]", 0.01)
+    budget = upstream.HedgeBudget(ratio=1.0)
+
+    with (
+        patch.object(upstream, "latencies", latencies),
+        patch.object(upstream, "hedge_budget", budget),
+    ):
+        assert upstream.hedged_call(slow_read, operation="op", count=1000) == "slow"
+
+    assert budget.sent == 0
+
+
+@pytest.mark.unit
+def test_no_hedge_while_limiter_is_full():
+    latencies = upstream.LatencyTracker(min_samples=1)
+    latencies.record("op[n2]", 0.01)
+    budget = upstream.HedgeBudget(ratio=1.0)
+
+    with (
+        patch.object(upstream, "latencies", latencies),
+        patch.object(upstream, "hedge_budget", budget),
+        patch.object(upstream, "limiter", AdaptiveLimiter(initial=1, minimum=1)),
+    ):
+        assert upstream.hedged_call(slow_read, operation="op", count=10) == "slow"
+
+    assert budget.sent == 0
@@ -0,0 +1,50 @@
+from unittest.mock import patch
+
+import pytest
+
+from app import catalog, warmup
+
+
+@pytest.mark.unit
+def test_warm_up_prefetches_catalogs():
+    catalog.invalidate_catalog()
+    loaders = {"types": lambda: ["t"], "streams": lambda: ["s"]}
+
+    with patch.object(warmup, "get_adh_client"):
+        warmup.warm_up(loaders)
+
+    state = warmup.startup_state()
+    assert state["status"] == "done"
+    assert set(state["seconds"]) == {"client", "types", "streams", "total"}
+    assert catalog.get_catalog("types", lambda: pytest.fail("refetched")) == ["t"]
+    catalog.invalidate_catalog()
+
+
+@pytest.mark.unit
+def test_warm_up_failure_is_reported():
+    with patch.object(warmup, "get_adh_client", side_effect=ValueError("no env")):
+        warmup.warm_up({})
+
+    state = warmup.startup_state()
+    assert state["status"] == "failed"
+    assert state["error"] == "no env"
+
+
+@pytest.mark.unit
+def test_import_time_is_recorded(client):
+    response = client.get("/api/startup")
+
+    assert response.status_code == 200
+    assert response.json()["import_seconds"] > 0
+
+
+@pytest.mark.unit
+def test_catalog_loads_once_within_ttl():
+    catalog.invalidate_catalog()
+    calls = []
+
+    catalog.get_catalog("types", lambda: calls.append(1) or ["t"], ttl=60)
+    catalog.get_catalog("types", lambda: calls.append(1) or ["t"], ttl=60)
+
+    assert len(calls) == 1
+    catalog.invalidate_catalog()
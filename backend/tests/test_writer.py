@@ -0,0 +1,113 @@
+import json
+from functools import partial
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.writer import ForecastWriter
+
+
+def make_client(failures=0):
+    """Fake ADH client whose updateValues fails `failures` times first."""
+    client = MagicMock()
+    calls = []
+
+    def update_values(namespace_id, stream_id, payload):
+        if len(calls) < failures:
+            calls.append(None)
+            raise RuntimeError("upstream unavailable")
+        calls.append((stream_id, json.loads(payload)))
+
+    client.Streams.updateValues.side_effect = update_values
+    return client, calls
+
+
+@pytest.mark.unit
+def test_flush_writes_bounded_chunks_per_stream():
+    client, calls = make_client()
+    writer = ForecastWriter(client=client, batch_size=2, workers=1)
+    for i in range(5):
+        writer.add("m1", f"2024-01-01T00:0{i}:00Z", i, i - 1, i + 1)
+
+    stats = writer.flush()
+
+    assert stats["points"] == 15
+    assert stats["requests"] == 9  # 3 streams x ceil(5 / 2)
+    assert all(len(events) <= 2 for _, events in calls)
+    forecast = [e for s, events in calls if s == "m1 Forecast" for e in events]
+    assert [e["Value"] for e in forecast] == [0, 1, 2, 3, 4]
+    assert writer.pending == 0
+
+
+@pytest.mark.unit
+def test_duplicate_points_are_written_once():
+    client, calls = make_client()
+    writer = ForecastWriter(client=client)
+    writer.add("m1", "2024-01-01T00:00:00Z", 1.0)
+    writer.add("m1", "2024-01-01T00:00:00Z", 2.0)
+
+    stats = writer.flush()
+
+    assert stats["points"] == 1
+    assert calls == [
+        ("m1 Forecast", [{"Timestamp": "2024-01-01T00:00:00Z", "Value": 2.0}])
+    ]
+
+
+@pytest.mark.unit
+def test_flush_retries_with_backoff():
+    client, _ = make_client(failures=2)
+    writer = ForecastWriter(client=client, retries=2, backoff=0)
+    writer.add("m1", "2024-01-01T00:00:00Z", 1.0)
+
+    stats = writer.flush()
+
+    assert stats["points"] == 1
+    assert stats["retries"] == 2
+    assert stats["failed"] == 0
+
+
+@pytest.mark.unit
+def test_failed_chunks_are_requeued():
+    client, _ = make_client(failures=10)
+    writer = ForecastWriter(client=client, retries=1, backoff=0)
+    writer.add("m1", "2024-01-01T00:00:00Z", 1.0)
+
+    stats = writer.flush()
+
+    assert stats["failed"] == 1
+    assert stats["errors"] == {"m1 Forecast": "upstream unavailable"}
+    assert writer.pending == 1
+
+
+@pytest.mark.unit
+def test_permanently_failing_stream_is_dropped():
+    client, _ = make_client(failures=100)
+    writer = ForecastWriter(client=client, retries=0, backoff=0, max_flushes=2)
+    writer.add("m1", "2024-01-01T00:00:00Z", 1.0)
+
+    first = writer.flush()
+    second = writer.flush()
+
+    assert (first["failed"], first["dropped"]) == (1, 0)
+    assert (second["failed"], second["dropped"]) == (1, 1)
+    assert writer.pending == 0
+    assert writer.flush()["requests"] == 0
+
+
+@pytest.mark.unit
+def test_forecast_values_endpoint_reports_only_its_failures(client):
+    adh, _ = make_client(failures=100)
+    point = {"model_id": "m1", "timestamp": "2024-01-01T00:00:00Z", "forecast": 1.0}
+    with (
+        patch("app.writer.get_adh_client", return_value=adh),
+        patch("app.main.ForecastWriter", partial(ForecastWriter, backoff=0)),
+    ):
+        failed = client.post("/connect/forecast_values", json=[point])
+        adh.Streams.updateValues.side_effect = None
+        ok = client.post("/connect/forecast_values", json=[point | {"model_id": "m2"}])
+
+    assert failed.status_code == 500
+    assert "m1 Forecast: upstream unavailable" in failed.json()["detail"]
+    assert ok.status_code == 200
+    assert ok.json()["points"] == 1
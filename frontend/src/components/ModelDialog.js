@@ -69,7 +69,8 @@ const ModelDialog = ({ open, onClose, onSave, model, streams, mode }) => {
         lead: model.lead || 10,
         update: model.update || '0 */30 * * * *',
         retrain: model.retrain || '0 0 */12 * * *',
-        interval: model.interval || 5
+        interval: model.interval || 5,
+        version: model.version || ''
       });
     } else {
       setFormData({
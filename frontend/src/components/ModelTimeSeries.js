@@ -109,7 +109,8 @@ const ModelTimeSeries = () => {
           asset_id: assetId, 
           start, 
           end, 
-          count
+          count,
+          align: true
         },
         headers: { 'Content-Type': 'application/json' },
         timeout: 10000
@@ -117,31 +118,17 @@ const ModelTimeSeries = () => {
 
       console.log('ModelTimeSeries - API Response:', response.data);
 
-      const streamData = response.data;
+      // The backend aligns all streams on one time index: values[i] belongs to streams[i]
+      const { timestamps = [], streams = [], values = [] } = response.data || {};
 
-      if (streamData && typeof streamData === 'object' && !Array.isArray(streamData)) {
-        // Process the response where each key is a stream name and value is array of {timestamp, value} objects
-        Object.keys(streamData).forEach(streamKey => {
-          const streamValues = streamData[streamKey];
-          
-          if (Array.isArray(streamValues) && streamValues.length > 0) {
-            const values = streamValues.map(item => parseFloat(item.value || 0));
-            const timestamps = streamValues.map(item => item.timestamp);
-            
-            data[streamKey] = values;
-            
-            // Use timestamps from first stream for categories (x-axis)
-            if (categories.length === 0) {
-              timestamps.forEach(timestamp => {
-                const date = new Date(timestamp);
-                categories.push(date.toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' }));
-              });
-            }
-          } else {
-            data[streamKey] = [];
-          }
-        });
-      }
+      streams.forEach((streamKey, index) => {
+        data[streamKey] = values[index] || [];
+      });
+
+      timestamps.forEach(timestamp => {
+        const date = new Date(timestamp);
+        categories.push(date.toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' }));
+      });
 
       // If no valid data, create empty categories based on time range
       if (categories.length === 0) {
@@ -92,7 +92,7 @@ const Models = () => {
     if (window.confirm('Are you sure you want to delete this model?')) {
       try {
         await axios.delete('http://127.0.0.1:8008/connect/models', {
-          params: { asset_id: modelId },
+          params: { asset_id: modelId, cascade: true },
           headers: { 'Content-Type': 'application/json' }
         });
         fetchModels();
@@ -118,6 +118,11 @@ const Models = () => {
       setDialogOpen(false);
     } catch (error) {
       console.error('Error saving model:', error);
+      if (error.response && error.response.status === 409) {
+        alert('This model was changed by someone else. Reload it and apply your changes again.');
+        fetchModels();
+        return;
+      }
       alert('Error saving model. Please try again.');
     }
   };
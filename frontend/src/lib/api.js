@@ -43,7 +43,7 @@ export const modelsAPI = {
   createModel: (modelData) => api.post('/connect/models', null, { params: modelData }),
   
   // Delete a model
-  deleteModel: (assetId) => api.delete('/connect/models', { params: { asset_id: assetId } }),
+  deleteModel: (assetId) => api.delete('/connect/models', { params: { asset_id: assetId, cascade: true } }),
 };
 
 export const streamsAPI = {